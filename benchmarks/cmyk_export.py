@@ -0,0 +1,83 @@
+"""
+Throughput of the CMYK print export at common KDP trim sizes, at 300 DPI with
+0.125" bleed on every edge.
+
+Compares compiling the colour transform for every request with the cached
+transform, and times separating the cover and writing the print PDF. Uses the
+default print profile from the settings, or the profile named as argument.
+
+    PYTHONPATH=. python benchmarks/cmyk_export.py [profile]
+"""
+
+import io
+import sys
+import time
+
+from PIL import Image
+
+from paperback_cover.config import settings
+from paperback_cover.imageedit.format_conversion import print_export
+from paperback_cover.imageedit.format_conversion.pdf_writer import write_image_pdf
+from paperback_cover.imageedit.format_conversion.schema import PrintExport
+
+DPI = 300
+BLEED = 0.125
+# Trim sizes in inches
+TRIM_SIZES = [(5, 8), (5.5, 8.5), (6, 9), (7, 10), (8.5, 11)]
+REPEATS = 3
+
+
+def _best_of(fn) -> float:
+    timings = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def _uncached(image: Image.Image, export: PrintExport):
+    print_export._get_transform.cache_clear()
+    print_export.prepare_for_print(image, export)
+
+
+def main():
+    export = PrintExport(profile=sys.argv[1] if len(sys.argv) > 1 else None)
+    profile_name = (
+        export.profile or settings.imageedit.format_conversion.print.default_profile
+    )
+    if profile_name in print_export.get_missing_profiles():
+        profile_path = settings.imageedit.format_conversion.print.profiles[profile_name]
+        sys.exit(f"Print profile {profile_name} is not installed at {profile_path}")
+    print(
+        f"{'trim':>9} {'pixels':>11} {'uncached ms':>12} {'cached ms':>10} "
+        f"{'MP/s':>6} {'pdf ms':>7}"
+    )
+    for trim_width, trim_height in TRIM_SIZES:
+        width = round((trim_width + 2 * BLEED) * DPI)
+        height = round((trim_height + 2 * BLEED) * DPI)
+        megapixels = width * height / 1_000_000
+        image = Image.linear_gradient("L").resize((width, height)).convert("RGB")
+
+        uncached = _best_of(lambda: _uncached(image, export))
+        cached = _best_of(lambda: print_export.prepare_for_print(image, export))
+        cmyk, profile = print_export.prepare_for_print(image, export)
+        pdf = _best_of(
+            lambda: write_image_pdf(
+                io.BytesIO(),
+                cmyk,
+                DPI,
+                bleed=BLEED * DPI,
+                output_profile=profile,
+            )
+        )
+
+        print(
+            f"{trim_width:>4}x{trim_height:<4} {width:>5}x{height:<5} "
+            f"{uncached * 1000:>12.0f} {cached * 1000:>10.0f} "
+            f"{megapixels / cached:>6.1f} {pdf * 1000:>7.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Cost of blending an inpainted context back onto the canvas, per megapixel.
+
+Compares the plain paste the extension loop used to do with building the
+feathered mask and pasting through it.
+
+    PYTHONPATH=. python benchmarks/seam_blend.py
+"""
+
+import time
+
+from PIL import Image
+
+from paperback_cover.imageedit.extend_image.compositor import ring_blend_mask
+
+SIZES = [(1024, 1024), (2048, 2048), (4096, 2048), (7680, 4320)]
+REPEATS = 5
+
+
+def _best_of(fn) -> float:
+    timings = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    print(f"{'context':>12} {'paste ms/MP':>12} {'mask ms/MP':>11} {'blend ms/MP':>12}")
+    for width, height in SIZES:
+        megapixels = width * height / 1_000_000
+        canvas = Image.new("RGBA", (width, height), (40, 80, 120, 255))
+        inpainted = Image.new("RGBA", (width, height), (200, 160, 120, 255))
+        # A box grown by 10% on every side, with the loop's 5% overlap band.
+        keep_box = [
+            width // 12,
+            height // 12,
+            width - width // 12,
+            height - height // 12,
+        ]
+        band_x = max(5, int((keep_box[2] - keep_box[0]) * 0.05))
+        band_y = max(5, int((keep_box[3] - keep_box[1]) * 0.05))
+        bands = (band_x, band_y, band_x, band_y)
+
+        paste = _best_of(lambda: canvas.paste(inpainted, (0, 0), inpainted))
+        mask = _best_of(lambda: ring_blend_mask((width, height), keep_box, bands))
+        blend_mask = ring_blend_mask((width, height), keep_box, bands)
+        blend = _best_of(lambda: canvas.paste(inpainted, (0, 0), blend_mask))
+
+        print(
+            f"{width:>5}x{height:<6} "
+            f"{paste * 1000 / megapixels:>12.2f} "
+            f"{mask * 1000 / megapixels:>11.2f} "
+            f"{(mask + blend) * 1000 / megapixels:>12.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
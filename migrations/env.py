@@ -8,7 +8,17 @@ from sqlalchemy import pool
 from sqlalchemy.engine import Connection
 from sqlalchemy.ext.asyncio import async_engine_from_config
 
-from paperback_cover.models import asset, auth, credit, dodopayments, feedback, user
+from paperback_cover.models import (
+    asset,
+    auth,
+    credit,
+    dodopayments,
+    extend_image_job,
+    extend_image_run,
+    feedback,
+    inpaint_cache,
+    user,
+)
 from paperback_cover.models.base import DATABASE_URL, Base
 
 
@@ -19,8 +29,11 @@ def random_function_to_avoid_unused_imports():
         asset,
         credit,
         dodopayments,
+        extend_image_job,
+        extend_image_run,
         object,
         feedback,
+        inpaint_cache,
     )
 
 
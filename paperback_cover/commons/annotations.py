@@ -2,6 +2,7 @@ import asyncio
 import logging
 from functools import wraps
 from time import time
+from typing import Callable
 
 from paperback_cover.credit.service import reduce_user_credits
 
@@ -23,10 +24,14 @@ def timing(f):
     return wrap
 
 
-def reduce_credits(credit_amount: int):
+def reduce_credits(credit_amount: int | Callable[..., int], unless=None):
     """
     A decorator that reduces a user's credits by a specified amount.
     The decorated function must receive a `user` keyword argument.
+    `credit_amount` can also be a callable receiving the keyword arguments, for
+    calls charged per item.
+    `unless` is an optional async callable receiving the keyword arguments; when it
+    returns True the call is not charged, e.g. for retries of work already paid for.
     """
 
     def decorator(func):
@@ -37,10 +42,19 @@ def reduce_credits(credit_amount: int):
             if not user:
                 raise ValueError("User parameter missing for credit reduction.")
 
+            if unless is not None and await unless(**kwargs):
+                logger.info(
+                    f"Skipped credit deduction for {func.__name__} | User: {user.id}"
+                )
+                return await func(*args, **kwargs)
+
             # Deduct the specified credits.
-            new_balance = await reduce_user_credits(user, credit_amount)
+            amount = (
+                credit_amount(**kwargs) if callable(credit_amount) else credit_amount
+            )
+            new_balance = await reduce_user_credits(user, amount)
             logger.info(
-                f"Deducted {credit_amount} credits for {func.__name__}. New balance: {new_balance} | User: {user.id}"
+                f"Deducted {amount} credits for {func.__name__}. New balance: {new_balance} | User: {user.id}"
             )
 
             # Continue with the execution of the original function.
@@ -0,0 +1,129 @@
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, TypeVar
+
+from pydantic import BaseModel
+
+from paperback_cover.config import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class PoolStats(BaseModel):
+    workers: int
+    in_flight: int
+    queued: int
+    max_queued: int
+    completed: int
+
+
+class ImageProcessingExecutorStats(BaseModel):
+    thread: PoolStats
+    process: PoolStats
+
+
+class _Pool:
+    def __init__(self, name: str, workers: int):
+        self.name = name
+        self.workers = workers
+        self.executor: Executor | None = None
+        self.in_flight = 0
+        self.max_queued = 0
+        self.completed = 0
+
+    @property
+    def queued(self) -> int:
+        return max(0, self.in_flight - self.workers)
+
+    def stats(self) -> PoolStats:
+        return PoolStats(
+            workers=self.workers,
+            in_flight=self.in_flight,
+            queued=self.queued,
+            max_queued=self.max_queued,
+            completed=self.completed,
+        )
+
+
+class ImageProcessingExecutor:
+    """
+    Runs blocking Pillow work away from the event loop.
+
+    `run` uses a thread pool, which suits most Pillow operations since they release
+    the GIL. `run_in_process` uses a process pool for heavy, long running work such
+    as encoding full size composites; the callable and its arguments must be
+    picklable. Without process workers it falls back to the thread pool.
+    """
+
+    def __init__(self, thread_workers: int, process_workers: int):
+        self._thread_pool = _Pool("thread", thread_workers)
+        self._process_pool = _Pool("process", process_workers)
+
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        pool = self._thread_pool
+        if pool.executor is None:
+            pool.executor = ThreadPoolExecutor(
+                max_workers=pool.workers, thread_name_prefix="image-processing"
+            )
+        return await self._submit(pool, fn, *args, **kwargs)
+
+    async def run_in_process(
+        self, fn: Callable[..., T], *args: Any, **kwargs: Any
+    ) -> T:
+        pool = self._process_pool
+        if pool.workers <= 0:
+            return await self.run(fn, *args, **kwargs)
+        if pool.executor is None:
+            # Forking a process that runs an event loop and other threads is not
+            # safe, so workers start from a clean interpreter.
+            pool.executor = ProcessPoolExecutor(
+                max_workers=pool.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return await self._submit(pool, fn, *args, **kwargs)
+
+    async def _submit(
+        self, pool: _Pool, fn: Callable[..., T], *args: Any, **kwargs: Any
+    ) -> T:
+        assert pool.executor is not None
+        pool.in_flight += 1
+        pool.max_queued = max(pool.max_queued, pool.queued)
+        if pool.queued:
+            logger.info(
+                f"Image processing {pool.name} pool saturated | in flight: {pool.in_flight}, queued: {pool.queued}"
+            )
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                pool.executor, partial(fn, *args, **kwargs)
+            )
+        finally:
+            pool.in_flight -= 1
+            pool.completed += 1
+
+    def stats(self) -> ImageProcessingExecutorStats:
+        return ImageProcessingExecutorStats(
+            thread=self._thread_pool.stats(),
+            process=self._process_pool.stats(),
+        )
+
+    def shutdown(self):
+        for pool in (self._thread_pool, self._process_pool):
+            if pool.executor is not None:
+                pool.executor.shutdown(wait=False, cancel_futures=True)
+                pool.executor = None
+
+
+image_executor = ImageProcessingExecutor(
+    thread_workers=settings.image_processing.thread_workers,
+    process_workers=settings.image_processing.process_workers,
+)
+
+
+def get_image_executor() -> ImageProcessingExecutor:
+    return image_executor
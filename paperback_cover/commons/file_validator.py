@@ -1,26 +1,91 @@
 import logging
 import os
+from io import BytesIO
 
 from fastapi import HTTPException, UploadFile
-from filetype import is_image
+from filetype import guess, is_image
+from PIL import UnidentifiedImageError
+from pydantic import BaseModel
+
+from paperback_cover.commons.pixel_budget import open_image
+from paperback_cover.config import settings
 
 logger = logging.getLogger(__name__)
 
+# `filetype` recognises every format from this many leading bytes.
+HEADER_BYTES = 261
+
+
+class ValidatedImage(BaseModel):
+    """An image upload that passed validation, with what its header tells."""
+
+    content: bytes
+    width: int
+    height: int
+    # As detected from the magic bytes, e.g. "jpg" and "image/jpeg"
+    extension: str
+    mime: str
+
+    @property
+    def size(self) -> tuple[int, int]:
+        return self.width, self.height
+
+    def open(self) -> BytesIO:
+        """A stream over the content. It shares the buffer instead of copying it."""
+        return BytesIO(self.content)
+
 
 def get_file_extension(file_name: str) -> str:
     """Get the file extension from the file name."""
     return os.path.splitext(file_name)[1].lower()
 
 
-async def validate_image_file(file: UploadFile):
-    """Validate the uploaded file using libraries."""
-    # Use the `filetype` library to validate the file type
-    content = await file.read()
-    await file.seek(0)  # Reset the file pointer
-    if not is_image(content):
+def _read_header_size(content: bytes) -> tuple[int, int]:
+    # Opening only parses the header, the pixels are not decoded. Images over the
+    # pixel budget are rejected with a 413 here.
+    with open_image(BytesIO(content)) as image:
+        return image.size
+
+
+async def validate_image_file(file: UploadFile) -> ValidatedImage:
+    """
+    Validate the uploaded file using libraries. Only the header is inspected before
+    the size limit is enforced, and the content is read once and returned, so
+    callers do not read the upload a second time.
+    """
+    max_file_size = settings.image_processing.upload.max_bytes
+    size_error = HTTPException(
+        status_code=400,
+        detail=f"File size exceeds {max_file_size // (1024 * 1024)}MB limit.",
+    )
+
+    # Use the `filetype` library to validate the file type from the magic bytes
+    header = await file.read(HEADER_BYTES)
+    if not is_image(header):
         raise HTTPException(status_code=400, detail="Only image files are allowed.")
+    # The multipart parser knows the size once the upload is spooled.
+    if file.size is not None and file.size > max_file_size:
+        raise size_error
 
-    # Limit file size (e.g., 10MB)
-    max_file_size = 10 * 1024 * 1024  # 5MB
+    # Read in one go, so the content is not copied again to join chunks, but never
+    # more than one byte past the limit.
+    await file.seek(0)
+    content = await file.read(max_file_size + 1)
+    await file.seek(0)  # Reset the file pointer
     if len(content) > max_file_size:
-        raise HTTPException(status_code=400, detail="File size exceeds 10MB limit.")
+        raise size_error
+
+    try:
+        width, height = _read_header_size(content)
+    except (UnidentifiedImageError, OSError) as e:
+        logger.warning(f"Failed to read image header: {e}")
+        raise HTTPException(status_code=400, detail="Only image files are allowed.")
+
+    kind = guess(header)
+    return ValidatedImage(
+        content=content,
+        width=width,
+        height=height,
+        extension=kind.extension,
+        mime=kind.mime,
+    )
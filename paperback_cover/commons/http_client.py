@@ -0,0 +1,126 @@
+import asyncio
+import logging
+from io import BytesIO
+
+import httpx
+
+from paperback_cover.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class DownloadTooLargeError(Exception):
+    pass
+
+
+class DownloadClient:
+    """
+    Application wide client for fetching generated images.
+
+    Connections are pooled and kept alive across requests, bodies are streamed
+    into a size capped buffer and transient failures are retried with
+    exponential backoff.
+    """
+
+    def __init__(
+        self,
+        http2: bool,
+        max_connections: int,
+        max_keepalive_connections: int,
+        keepalive_expiry: float,
+        timeout: float,
+        connect_timeout: float,
+        max_bytes: int,
+        retries: int,
+        backoff_seconds: float,
+    ):
+        self.http2 = http2
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.max_bytes = max_bytes
+        self.retries = retries
+        self.backoff_seconds = backoff_seconds
+        self._client: httpx.AsyncClient | None = None
+
+    def get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                http2=self.http2,
+                limits=self.limits,
+                timeout=self.timeout,
+                follow_redirects=True,
+            )
+        return self._client
+
+    async def download(self, url: str, max_bytes: int | None = None) -> BytesIO:
+        """
+        Downloads `url` into memory, failing once the body exceeds `max_bytes`.
+        """
+        max_bytes = max_bytes or self.max_bytes
+        attempt = 0
+        while True:
+            try:
+                return await self._download_once(url, max_bytes)
+            except (httpx.TransportError, httpx.HTTPStatusError) as e:
+                if not self._is_retryable(e) or attempt >= self.retries:
+                    logger.error(f"Error downloading image from {url}: {e}")
+                    raise
+                delay = self.backoff_seconds * (2**attempt)
+                attempt += 1
+                logger.warning(
+                    f"Download of {url} failed ({e}), retrying in {delay:.1f}s | attempt {attempt}/{self.retries}"
+                )
+                await asyncio.sleep(delay)
+
+    async def _download_once(self, url: str, max_bytes: int) -> BytesIO:
+        async with self.get_client().stream("GET", url) as response:
+            response.raise_for_status()
+
+            content_length = response.headers.get("Content-Length")
+            if content_length and int(content_length) > max_bytes:
+                raise DownloadTooLargeError(
+                    f"Download of {url} is {content_length} bytes, limit is {max_bytes}"
+                )
+
+            buffer = BytesIO()
+            async for chunk in response.aiter_bytes():
+                if buffer.tell() + len(chunk) > max_bytes:
+                    raise DownloadTooLargeError(
+                        f"Download of {url} exceeded the {max_bytes} byte limit"
+                    )
+                buffer.write(chunk)
+
+        buffer.seek(0)
+        return buffer
+
+    def _is_retryable(self, error: Exception) -> bool:
+        if isinstance(error, httpx.HTTPStatusError):
+            status = error.response.status_code
+            return status == 429 or status >= 500
+        return True
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+download_client = DownloadClient(
+    http2=settings.http.download.http2,
+    max_connections=settings.http.download.max_connections,
+    max_keepalive_connections=settings.http.download.max_keepalive_connections,
+    keepalive_expiry=settings.http.download.keepalive_expiry,
+    timeout=settings.http.download.timeout,
+    connect_timeout=settings.http.download.connect_timeout,
+    max_bytes=settings.http.download.max_bytes,
+    retries=settings.http.download.retries,
+    backoff_seconds=settings.http.download.backoff_seconds,
+)
+
+
+def get_download_client() -> DownloadClient:
+    return download_client
@@ -0,0 +1,80 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
+from fastapi import HTTPException
+
+from paperback_cover.config import settings
+
+logger = logging.getLogger(__name__)
+
+RGBA_BYTES_PER_PIXEL = 4
+
+
+def rgba_bytes(width: int, height: int) -> int:
+    return width * height * RGBA_BYTES_PER_PIXEL
+
+
+class MemoryBudget:
+    """
+    Caps the decoded image memory held by concurrent requests.
+
+    Requests reserve their projected peak before decoding anything. A request that
+    could never fit is rejected with a 413, one that only has to wait for others
+    to finish is queued for up to `wait_seconds` before getting a 503.
+    """
+
+    def __init__(self, total_bytes: int, max_request_bytes: int, wait_seconds: float):
+        self.total_bytes = total_bytes
+        self.max_request_bytes = min(max_request_bytes, total_bytes)
+        self.wait_seconds = wait_seconds
+        self.reserved = 0
+        self._condition = asyncio.Condition()
+
+    @asynccontextmanager
+    async def reserve(self, nbytes: int):
+        if nbytes > self.max_request_bytes:
+            logger.warning(
+                f"Rejecting request needing {nbytes} bytes, limit is {self.max_request_bytes}"
+            )
+            raise HTTPException(
+                status_code=413,
+                detail="Image is too large to process. Reduce the target size or the upload resolution.",
+            )
+
+        async with self._condition:
+            if self.reserved + nbytes > self.total_bytes:
+                logger.info(
+                    f"Waiting for {nbytes} bytes of image memory | reserved: {self.reserved}/{self.total_bytes}"
+                )
+            try:
+                await asyncio.wait_for(
+                    self._condition.wait_for(
+                        lambda: self.reserved + nbytes <= self.total_bytes
+                    ),
+                    timeout=self.wait_seconds,
+                )
+            except asyncio.TimeoutError:
+                raise HTTPException(
+                    status_code=503,
+                    detail="Server is busy processing other images, please retry shortly.",
+                )
+            self.reserved += nbytes
+
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self.reserved -= nbytes
+                self._condition.notify_all()
+
+
+memory_budget = MemoryBudget(
+    total_bytes=settings.image_processing.memory_budget.total_bytes,
+    max_request_bytes=settings.image_processing.memory_budget.max_request_bytes,
+    wait_seconds=settings.image_processing.memory_budget.wait_seconds,
+)
+
+
+def get_memory_budget() -> MemoryBudget:
+    return memory_budget
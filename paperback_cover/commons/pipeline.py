@@ -0,0 +1,65 @@
+import asyncio
+import logging
+from time import time
+from typing import Any, Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+
+class Pipeline:
+    """
+    Runs async stages as a small dependency graph.
+
+    Every stage starts as soon as the stages it depends on have finished and
+    receives their results as positional arguments, in the order of `depends_on`.
+    Independent stages therefore run concurrently. If a stage raises, the stages
+    still running are cancelled and `run` re-raises the error.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._stages: dict[str, tuple[Callable[..., Awaitable[Any]], list[str]]] = {}
+        self.timings: dict[str, float] = {}
+
+    def add(
+        self,
+        name: str,
+        fn: Callable[..., Awaitable[Any]],
+        depends_on: list[str] | None = None,
+    ) -> "Pipeline":
+        depends_on = depends_on or []
+        for dependency in depends_on:
+            # Stages must be added after their dependencies, which rules out cycles.
+            if dependency not in self._stages:
+                raise ValueError(f"Unknown dependency {dependency} for stage {name}")
+        self._stages[name] = (fn, depends_on)
+        return self
+
+    async def run(self) -> dict[str, Any]:
+        tasks: dict[str, asyncio.Task] = {}
+
+        async def run_stage(name: str) -> Any:
+            fn, depends_on = self._stages[name]
+            inputs = await asyncio.gather(*(tasks[d] for d in depends_on))
+            ts = time()
+            result = await fn(*inputs)
+            self.timings[name] = time() - ts
+            logger.info(
+                f"pipeline:{self.name} stage:{name} took: {self.timings[name]:.4f} sec"
+            )
+            return result
+
+        ts = time()
+        for name in self._stages:
+            tasks[name] = asyncio.create_task(run_stage(name))
+
+        try:
+            await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            raise
+
+        logger.info(f"pipeline:{self.name} took: {time() - ts:.4f} sec")
+        return {name: task.result() for name, task in tasks.items()}
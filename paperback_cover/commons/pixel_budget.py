@@ -0,0 +1,90 @@
+import logging
+import math
+from io import BytesIO
+from typing import BinaryIO
+
+from fastapi import HTTPException
+from PIL import Image
+
+from paperback_cover.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+# Pillow refuses to open images above twice this many pixels. Tie its limit to
+# the budget, so it never rejects an image the budget allows.
+Image.MAX_IMAGE_PIXELS = settings.image_processing.upload.max_pixels
+
+
+def _pixel_budget_error() -> HTTPException:
+    max_pixels = settings.image_processing.upload.max_pixels
+    return HTTPException(
+        status_code=413,
+        detail=f"Image dimensions exceed the limit of {max_pixels // 1_000_000} megapixels.",
+    )
+
+
+def check_pixel_budget(size: tuple[int, int]) -> None:
+    """
+    Rejects images with more pixels than any request may decode. Only the header
+    is needed, so a small upload that would expand to gigabytes is turned away
+    before it is decoded.
+    """
+    width, height = size
+    if width * height > settings.image_processing.upload.max_pixels:
+        logger.warning(f"Rejected a {width}x{height} image over the pixel budget")
+        raise _pixel_budget_error()
+
+
+def open_image(data: BinaryIO) -> Image.Image:
+    """
+    Opens an image within the pixel budget. Only the header is parsed, the pixels
+    are decoded on first use.
+    """
+    try:
+        image = Image.open(data)
+    except Image.DecompressionBombError as e:
+        # Pillow rejects images far over the budget before the size is known.
+        logger.warning(f"Rejected a decompression bomb: {e}")
+        raise _pixel_budget_error()
+    check_pixel_budget(image.size)
+    return image
+
+
+def get_decode_size(
+    source_size: tuple[int, int], needed_size: tuple[int, int]
+) -> tuple[int, int]:
+    """
+    The size to decode an image of `source_size` at, when it is only ever used at
+    `needed_size` or smaller. Keeps the aspect ratio and never enlarges.
+    """
+    scale = max(needed_size[0] / source_size[0], needed_size[1] / source_size[1])
+    if scale >= 1:
+        return source_size
+    return (
+        min(source_size[0], math.ceil(source_size[0] * scale)),
+        min(source_size[1], math.ceil(source_size[1] * scale)),
+    )
+
+
+def decode_image(
+    data: BytesIO, needed_size: tuple[int, int] | None = None
+) -> Image.Image:
+    """
+    Decodes an image within the pixel budget. With `needed_size`, a larger image
+    is downsampled to it while decoding: JPEGs are decoded straight at a reduced
+    scale in draft mode, so their full resolution is never held in memory.
+    """
+    image = open_image(data)
+    if needed_size is not None:
+        size = get_decode_size(image.size, needed_size)
+        if size != image.size:
+            logger.info(f"Decoding a {image.width}x{image.height} image at {size}")
+            if image.mode in ("P", "PA", "1"):
+                # Pillow can only resample these with NEAREST, which aliases.
+                has_alpha = image.mode == "PA" or "transparency" in image.info
+                image = image.convert("RGBA" if has_alpha else "RGB")
+            # Picks the JPEG draft scale itself, then resamples the rest.
+            image.thumbnail(size, Image.Resampling.LANCZOS)
+    image.load()
+    return image
@@ -0,0 +1,48 @@
+import os
+import tempfile
+from typing import IO, AsyncIterator
+
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import StreamingResponse
+
+from paperback_cover.config import settings
+
+
+def spooled_output() -> IO[bytes]:
+    """
+    A file for an encoder to write its output to. It stays in memory while small
+    and moves to a temporary file on disk once it grows past the spool limit.
+    """
+    return tempfile.SpooledTemporaryFile(
+        max_size=settings.image_processing.output.spool_max_bytes
+    )
+
+
+def _file_size(file: IO[bytes]) -> int:
+    file.seek(0, os.SEEK_END)
+    size = file.tell()
+    file.seek(0)
+    return size
+
+
+async def _iter_file(file: IO[bytes]) -> AsyncIterator[bytes]:
+    chunk_bytes = settings.image_processing.output.chunk_bytes
+    while chunk := await run_in_threadpool(file.read, chunk_bytes):
+        yield chunk
+
+
+def file_response(
+    file: IO[bytes], media_type: str, headers: dict[str, str] | None = None
+) -> StreamingResponse:
+    """
+    Streams `file` in chunks with its Content-Length, and closes it once the
+    response is done, or the client went away.
+    """
+    headers = {**(headers or {}), "Content-Length": str(_file_size(file))}
+    return StreamingResponse(
+        _iter_file(file),
+        media_type=media_type,
+        headers=headers,
+        background=BackgroundTask(file.close),
+    )
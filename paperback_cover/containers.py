@@ -1,9 +1,14 @@
+from paperback_cover.commons.executor import image_executor
+from paperback_cover.commons.http_client import download_client
+from paperback_cover.commons.memory_budget import memory_budget
 from paperback_cover.config import settings
 from paperback_cover.cover_art.replicate_artwork_service import ReplicateArtworkService
 from paperback_cover.imageedit.extend_image.service import ExtendImageService
 from paperback_cover.imageedit.format_conversion.service import (
     ImageFormatConversionService,
 )
+from paperback_cover.imageedit.inpaint_cache import inpaint_cache
+from paperback_cover.imageedit.inpainting_backend import create_inpainting_backend
 from paperback_cover.openai.background_analyser_service import BackgroundAnalyserService
 from paperback_cover.openai.final_prompt_optimiser_service import (
     FinalPromptOptimiserService,
@@ -30,9 +35,21 @@ class Container:
         openai_client=openaiclient,
     )
 
-    extend_image_service = ExtendImageService(
+    inpainting_backend = create_inpainting_backend(
+        settings.imageedit.inpainting.backend,
         replicate_artwork_service=replicate_artwork_service,
         background_analyser_service=background_analyser_service,
+        download_client=download_client,
+        image_executor=image_executor,
+        inpaint_cache=inpaint_cache,
     )
 
-    image_format_conversion_service = ImageFormatConversionService()
+    extend_image_service = ExtendImageService(
+        inpainting_backend=inpainting_backend,
+        image_executor=image_executor,
+        memory_budget=memory_budget,
+    )
+
+    image_format_conversion_service = ImageFormatConversionService(
+        image_executor=image_executor,
+    )
@@ -9,6 +9,10 @@ from paperback_cover.replicate.replicateclient import (
     get_replicate_client,
 )
 
+IDEOGRAM_INPAINT_MODEL = "ideogram-v3-turbo"
+CLARITY_UPSCALER_MODEL = "philz1337x/clarity-upscaler:dfad41707589d68ecdccd1dfa600d55a208f9310748e44bfe35b4a6291453d5e"
+REMOVE_OBJECT_MODEL = "zylim0702/remove-object:0e3a841c913f597c1e4c321560aa69e2bc1f15c65f8c366caafc379240efd8ba"
+
 
 class ReplicateArtworkService:
     replicate_client: ReplicateClient
@@ -103,7 +107,7 @@ class ReplicateArtworkService:
         self,
         image_url: str,
         mask_url: str,
-        model: str = "ideogram-v3-turbo",
+        model: str = IDEOGRAM_INPAINT_MODEL,
         prompt: str = "extend background",
     ) -> str:
         image_link: Any = await self.replicate_client.get_client().async_run(
@@ -229,7 +233,7 @@ class ReplicateArtworkService:
         mask_image_url: str,
     ) -> str:
         image_link: Any = await self.replicate_client.get_client().async_run(
-            "zylim0702/remove-object:0e3a841c913f597c1e4c321560aa69e2bc1f15c65f8c366caafc379240efd8ba",
+            REMOVE_OBJECT_MODEL,
             input={
                 "image": input_image_url,
                 "mask": mask_image_url,
@@ -250,7 +254,7 @@ class ReplicateArtworkService:
         act_creativity = (0.4 - 0.1) * (creativity / 100) + 0.1
 
         image_link: Any = await self.replicate_client.get_client().async_run(
-            "philz1337x/clarity-upscaler:dfad41707589d68ecdccd1dfa600d55a208f9310748e44bfe35b4a6291453d5e",
+            CLARITY_UPSCALER_MODEL,
             input={
                 "seed": seed,
                 "image": input_image_url,
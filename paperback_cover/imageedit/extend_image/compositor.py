@@ -0,0 +1,70 @@
+import numpy as np
+from PIL import Image
+
+
+def _falloff(length: int, inner_start: int, inner_end: int) -> np.ndarray:
+    """
+    Weights for `length` pixels: 1 over [inner_start, inner_end), falling linearly
+    towards 0 across the pixels before and after it.
+    """
+    index = np.arange(length, dtype=np.float32)
+    before = (index + 1) / (inner_start + 1)
+    after = (length - index) / (length - inner_end + 1)
+    return np.clip(np.minimum(before, after), 0, 1)
+
+
+def _to_mask(alpha: np.ndarray) -> Image.Image:
+    return Image.fromarray(np.rint(alpha * 255).astype(np.uint8))
+
+
+def ring_blend_mask(
+    size: tuple[int, int],
+    keep_box: list[int],
+    bands: tuple[int, int, int, int],
+) -> Image.Image:
+    """
+    Paste mask for a context that grows around `keep_box`.
+
+    Everything outside `keep_box` is taken from the inpainted image. Inside it the
+    existing pixels are kept, except for the overlap `bands` (left, top, right,
+    bottom) along its edges, where the inpainted image fades out towards the
+    inside so the seam is spread across the band.
+    """
+    width, height = size
+    x1, y1, x2, y2 = keep_box
+    left, top, right, bottom = bands
+
+    alpha = np.ones((height, width), dtype=np.float32)
+    keep = np.minimum.outer(
+        _falloff(y2 - y1, top, y2 - y1 - bottom),
+        _falloff(x2 - x1, left, x2 - x1 - right),
+    )
+    alpha[y1:y2, x1:x2] = 1 - keep
+    return _to_mask(alpha)
+
+
+def tile_blend_mask(
+    size: tuple[int, int],
+    fill_box: list[int],
+    regenerate_boxes: list[list[int]],
+) -> Image.Image:
+    """
+    Paste mask for a tile, with `fill_box` and `regenerate_boxes` relative to the
+    tile's context.
+
+    The fill area is taken from the inpainted image as is. Where a regenerate box
+    reaches past it into existing pixels, the inpainted image fades out across
+    that overlap.
+    """
+    width, height = size
+    fx1, fy1, fx2, fy2 = fill_box
+
+    alpha = np.zeros((height, width), dtype=np.float32)
+    for x1, y1, x2, y2 in regenerate_boxes:
+        box_alpha = np.minimum.outer(
+            _falloff(y2 - y1, max(0, fy1 - y1), min(y2, fy2) - y1),
+            _falloff(x2 - x1, max(0, fx1 - x1), min(x2, fx2) - x1),
+        )
+        region = alpha[y1:y2, x1:x2]
+        np.maximum(region, box_alpha, out=region)
+    return _to_mask(alpha)
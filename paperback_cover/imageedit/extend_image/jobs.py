@@ -0,0 +1,353 @@
+import asyncio
+import datetime
+import logging
+from abc import ABC, abstractmethod
+from typing import Awaitable, Callable
+from uuid import UUID, uuid4
+
+from fastapi import HTTPException, UploadFile
+from sqlalchemy import select, update
+
+from paperback_cover.commons.db import get_async_session
+from paperback_cover.commons.file_validator import validate_image_file
+from paperback_cover.config import settings
+from paperback_cover.containers import Container
+from paperback_cover.imageedit.extend_image.schema import (
+    ExtendImageJobSchema,
+    ExtendImageJobStatus,
+    ExtendImageProgress,
+    ExtendImageRequest,
+)
+from paperback_cover.imageedit.extend_image.service import ExtendImageService
+from paperback_cover.models.extend_image_job import ExtendImageJob
+from paperback_cover.models.user import User
+from paperback_cover.storage_service.service import (
+    delete_blob_from_bucket,
+    download_blob_from_bucket,
+    upload_blob_to_bucket,
+)
+
+logger = logging.getLogger(__name__)
+
+JobHandler = Callable[[UUID], Awaitable[None]]
+
+
+class JobQueue(ABC):
+    """Hands job ids to a handler. Jobs themselves are persisted by the caller."""
+
+    @abstractmethod
+    async def start(self, handler: JobHandler):
+        """Starts handing queued job ids to `handler`."""
+
+    @abstractmethod
+    async def enqueue(self, job_id: UUID):
+        """Queues `job_id` for the handler."""
+
+    @abstractmethod
+    async def stop(self):
+        """Stops handing out jobs, cancelling the ones running in the background."""
+
+
+class InProcessJobQueue(JobQueue):
+    """Runs jobs on background tasks of the current event loop."""
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._queue: asyncio.Queue[UUID] = asyncio.Queue()
+        self._tasks: list[asyncio.Task] = []
+
+    async def start(self, handler: JobHandler):
+        self._tasks = [
+            asyncio.create_task(self._work(handler)) for _ in range(self.workers)
+        ]
+
+    async def enqueue(self, job_id: UUID):
+        self._queue.put_nowait(job_id)
+
+    async def _work(self, handler: JobHandler):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await handler(job_id)
+            except Exception as e:
+                logger.error(f"Job {job_id} failed: {e}", exc_info=True)
+            finally:
+                self._queue.task_done()
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+
+class InlineJobQueue(JobQueue):
+    """Runs every job to completion inside `enqueue`. Meant for local runs and tests."""
+
+    def __init__(self):
+        self._handler: JobHandler | None = None
+
+    async def start(self, handler: JobHandler):
+        self._handler = handler
+
+    async def enqueue(self, job_id: UUID):
+        if self._handler is None:
+            raise Exception("Job queue has not been started")
+        await self._handler(job_id)
+
+    async def stop(self):
+        self._handler = None
+
+
+def create_job_queue(kind: str, workers: int) -> JobQueue:
+    if kind == "inline":
+        return InlineJobQueue()
+    if kind == "in_process":
+        return InProcessJobQueue(workers=workers)
+    raise ValueError(f"Unknown job queue: {kind}")
+
+
+class ExtendImageJobService:
+    """
+    Runs image extensions in the background.
+
+    Jobs and their progress are stored in Postgres, and the uploaded image is kept
+    in the bucket until the job finishes, so jobs interrupted by a restart are
+    picked up again on startup. Jobs cancelled by a shutdown are queued again
+    right away, ones lost to a crash once they have gone stale.
+    """
+
+    def __init__(
+        self,
+        extend_image_service: ExtendImageService,
+        queue: JobQueue,
+        stale_after_seconds: int,
+    ):
+        self.extend_image_service = extend_image_service
+        self.queue = queue
+        self.stale_after_seconds = stale_after_seconds
+
+    async def start(self):
+        await self.queue.start(self.run_job)
+        await self.requeue_pending_jobs()
+
+    async def stop(self):
+        await self.queue.stop()
+
+    async def create_job(
+        self,
+        request: ExtendImageRequest,
+        file: UploadFile,
+        user: User,
+        idempotency_key: str | None = None,
+    ) -> ExtendImageJobSchema:
+        """
+        Stores the upload and queues the job. Submitting the same `idempotency_key`
+        again returns the existing job instead of queueing another one, unless it
+        failed, in which case it is queued again and resumes from its checkpoint.
+        """
+        job = None
+        if idempotency_key:
+            job = await self.get_job_by_idempotency_key(user, idempotency_key)
+            if job is not None:
+                if job.request != request.model_dump(mode="json"):
+                    raise HTTPException(
+                        status_code=409,
+                        detail="Idempotency key was already used with different parameters.",
+                    )
+                if job.status != ExtendImageJobStatus.FAILED:
+                    return job.to_pydantic()
+
+        try:
+            upload = await validate_image_file(file)
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Failed to process uploaded image: {e}")
+            raise Exception("Failed to process uploaded image") from e
+
+        job_id = job.id if job is not None else uuid4()
+        source_path = f"users/{str(user.id)}/extend_image_jobs/{str(job_id)}/source"
+        if not await upload_blob_to_bucket(upload.content, source_path, {}):
+            raise Exception("Failed to upload image to storage")
+
+        if job is not None:
+            await self._update_job(
+                job_id,
+                {"status": ExtendImageJobStatus.QUEUED, "error": None},
+                status=ExtendImageJobStatus.FAILED,
+            )
+            schema = await self.get_job(job_id, user)
+        else:
+            async with get_async_session() as session:
+                job = ExtendImageJob(
+                    id=job_id,
+                    owner=user.id,
+                    status=ExtendImageJobStatus.QUEUED,
+                    request=request.model_dump(mode="json"),
+                    source_path=source_path,
+                    idempotency_key=idempotency_key,
+                )
+                session.add(job)
+                await session.commit()
+                schema = job.to_pydantic()
+
+        logger.info(f"Queued extend image job {job_id} for user {user.id}")
+        await self.queue.enqueue(job_id)
+        return schema
+
+    async def get_job(self, job_id: UUID, user: User) -> ExtendImageJobSchema | None:
+        async with get_async_session() as session:
+            job = await session.get(ExtendImageJob, job_id)
+            if not job or not job.is_authorised(user):
+                return None
+            return job.to_pydantic()
+
+    async def get_job_by_idempotency_key(
+        self, user: User, idempotency_key: str
+    ) -> ExtendImageJob | None:
+        async with get_async_session() as session:
+            result = await session.execute(
+                select(ExtendImageJob).where(
+                    ExtendImageJob.owner == user.id,
+                    ExtendImageJob.idempotency_key == idempotency_key,
+                )
+            )
+            return result.scalar_one_or_none()
+
+    async def run_job(self, job_id: UUID):
+        # Claim the job first, so a job queued twice only runs once.
+        if not await self._update_job(
+            job_id,
+            {"status": ExtendImageJobStatus.RUNNING},
+            status=ExtendImageJobStatus.QUEUED,
+        ):
+            logger.info(f"Extend image job {job_id} is no longer queued, skipping")
+            return
+
+        try:
+            await self._run_claimed_job(job_id)
+        except asyncio.CancelledError:
+            # Shutting down: hand the job back, with its upload and checkpoint,
+            # so the next start resumes it instead of waiting for it to go stale.
+            logger.info(f"Extend image job {job_id} interrupted, queueing it again")
+            await self._update_job(
+                job_id,
+                {"status": ExtendImageJobStatus.QUEUED},
+                status=ExtendImageJobStatus.RUNNING,
+            )
+            raise
+
+    async def _run_claimed_job(self, job_id: UUID):
+        async with get_async_session() as session:
+            job = await session.get(ExtendImageJob, job_id)
+            user = await session.get(User, job.owner)
+            request = ExtendImageRequest.model_validate(job.request)
+            source_path = job.source_path
+            # Runs are checkpointed under this key, so a job picked up again after
+            # a restart, or resubmitted after failing, continues where it stopped.
+            # The job id is kept on resubmission, and unlike the client's key it
+            # never matches the key of a synchronous request.
+            idempotency_key = f"job:{job.id}"
+
+        logger.info(f"Running extend image job {job_id}")
+
+        async def on_progress(progress: ExtendImageProgress):
+            await self._update_job(
+                job_id,
+                {
+                    "stage": progress.stage.value,
+                    "step": progress.step,
+                    "total_steps": progress.total_steps,
+                },
+            )
+
+        try:
+            file_content = await download_blob_from_bucket(source_path)
+            if file_content is None:
+                raise Exception("Failed to download uploaded image")
+            result = await self.extend_image_service.extend_image_content(
+                request,
+                file_content,
+                user,
+                on_progress=on_progress,
+                idempotency_key=idempotency_key,
+            )
+            if result is None:
+                raise Exception("Image could not be extended")
+        except Exception as e:
+            logger.error(f"Extend image job {job_id} failed: {e}", exc_info=True)
+            await self._update_job(
+                job_id, {"status": ExtendImageJobStatus.FAILED, "error": str(e)}
+            )
+        else:
+            logger.info(f"Extend image job {job_id} succeeded")
+            await self._update_job(
+                job_id,
+                {
+                    "status": ExtendImageJobStatus.SUCCEEDED,
+                    "result": result.model_dump(mode="json"),
+                },
+            )
+
+        await delete_blob_from_bucket(source_path)
+
+    async def requeue_pending_jobs(self):
+        """
+        Queues jobs left over from a previous process. Running jobs only count as
+        interrupted once their progress has not moved for `stale_after_seconds`,
+        so jobs owned by another live worker are left alone.
+        """
+        stale_before = datetime.datetime.now() - datetime.timedelta(
+            seconds=self.stale_after_seconds
+        )
+        async with get_async_session() as session:
+            async with session.begin():
+                await session.execute(
+                    update(ExtendImageJob)
+                    .where(
+                        ExtendImageJob.status == ExtendImageJobStatus.RUNNING,
+                        ExtendImageJob.updated_at < stale_before,
+                    )
+                    .values(status=ExtendImageJobStatus.QUEUED)
+                )
+            result = await session.execute(
+                select(ExtendImageJob.id)
+                .where(ExtendImageJob.status == ExtendImageJobStatus.QUEUED)
+                .order_by(ExtendImageJob.created_at)
+            )
+            job_ids = result.scalars().all()
+
+        if job_ids:
+            logger.info(f"Requeueing {len(job_ids)} extend image jobs")
+        for job_id in job_ids:
+            await self.queue.enqueue(job_id)
+
+    async def _update_job(
+        self,
+        job_id: UUID,
+        values: dict,
+        status: ExtendImageJobStatus | None = None,
+    ) -> bool:
+        """Updates the job, only if it is in `status` when given."""
+        query = update(ExtendImageJob).where(ExtendImageJob.id == job_id)
+        if status is not None:
+            query = query.where(ExtendImageJob.status == status)
+        async with get_async_session() as session:
+            async with session.begin():
+                result = await session.execute(query.values(**values))
+                return result.rowcount > 0
+
+
+extend_image_job_service = ExtendImageJobService(
+    extend_image_service=Container.extend_image_service,
+    queue=create_job_queue(
+        settings.imageedit.extend.jobs.queue,
+        workers=settings.imageedit.extend.jobs.workers,
+    ),
+    stale_after_seconds=settings.imageedit.extend.jobs.stale_after_seconds,
+)
+
+
+def get_extend_image_job_service() -> ExtendImageJobService:
+    return extend_image_job_service
@@ -0,0 +1,596 @@
+import logging
+import math
+
+from paperback_cover.book_cover.schema import BoundingBoxSchema
+from paperback_cover.commons.memory_budget import rgba_bytes
+from paperback_cover.config import settings
+from paperback_cover.imageedit.extend_image.schema import (
+    ExtendImageRequest,
+    ExtensionMode,
+    ExtensionPlan,
+    ExtensionPlanStep,
+    ExtensionTile,
+    ResolutionMode,
+)
+
+logger = logging.getLogger(__name__)
+
+MAX_ITERATIONS = 20
+# Each step may add at most this fraction of the original image area.
+MAX_EXTENSION_AREA_RATIO = 0.6
+
+# Aspect ratios (width, height) accepted by the Ideogram inpainting models.
+IDEOGRAM_ASPECT_RATIOS = [
+    (1, 3),
+    (3, 1),
+    (1, 2),
+    (2, 1),
+    (9, 16),
+    (16, 9),
+    (10, 16),
+    (16, 10),
+    (2, 3),
+    (3, 2),
+    (3, 4),
+    (4, 3),
+    (4, 5),
+    (5, 4),
+    (1, 1),
+]
+
+
+def get_initial_box(request: ExtendImageRequest) -> list[int]:
+    return [
+        request.original_box.x,
+        request.original_box.y,
+        request.original_box.x + request.original_box.width,
+        request.original_box.y + request.original_box.height,
+    ]
+
+
+def get_max_extension_area(request: ExtendImageRequest) -> int:
+    original_image_area = request.original_box.width * request.original_box.height
+    return int(original_image_area * MAX_EXTENSION_AREA_RATIO)
+
+
+def is_target_reached(box: list[int], target_w: int, target_h: int) -> bool:
+    return box[0] <= 0 and box[1] <= 0 and box[2] >= target_w and box[3] >= target_h
+
+
+def get_filled_box(box: list[int], fill_boxes: list[list[int]]) -> list[int]:
+    """
+    Returns the bounding box of `box` and `fill_boxes` if together they cover it
+    completely, otherwise `box`. Side strips alone span the next box but leave
+    its corners empty, so they do not grow the filled area.
+    """
+    boxes = [box, *fill_boxes]
+    bounds = [
+        min(b[0] for b in boxes),
+        min(b[1] for b in boxes),
+        max(b[2] for b in boxes),
+        max(b[3] for b in boxes),
+    ]
+    xs = sorted({x for b in boxes for x in (b[0], b[2])})
+    ys = sorted({y for b in boxes for y in (b[1], b[3])})
+    for left, right in zip(xs, xs[1:]):
+        for top, bottom in zip(ys, ys[1:]):
+            covered = any(
+                b[0] <= left and right <= b[2] and b[1] <= top and bottom <= b[3]
+                for b in boxes
+            )
+            if not covered:
+                return list(box)
+    return bounds
+
+
+def get_working_request(request: ExtendImageRequest) -> ExtendImageRequest:
+    """
+    Returns `request` scaled down so its canvas fits the working resolution, or
+    `request` itself when it runs at full resolution, already fits, or needs no
+    extension at all.
+    """
+    if request.resolution != ResolutionMode.WORKING:
+        return request
+    if is_target_reached(
+        get_initial_box(request), request.target_width, request.target_height
+    ):
+        return request
+
+    max_side = settings.imageedit.extend.working_resolution.max_side
+    scale = max_side / max(request.target_width, request.target_height)
+    if scale >= 1:
+        return request
+
+    # Round the box outwards so the scaled original is never cropped.
+    box = request.original_box
+    x1 = math.floor(box.x * scale)
+    y1 = math.floor(box.y * scale)
+    x2 = math.ceil((box.x + box.width) * scale)
+    y2 = math.ceil((box.y + box.height) * scale)
+    return request.model_copy(
+        update={
+            "target_width": max(1, round(request.target_width * scale)),
+            "target_height": max(1, round(request.target_height * scale)),
+            "original_box": BoundingBoxSchema(
+                x=x1, y=y1, width=max(1, x2 - x1), height=max(1, y2 - y1)
+            ),
+            "resolution": ResolutionMode.FULL,
+        }
+    )
+
+
+def get_derivation_box(
+    base: ExtendImageRequest, request: ExtendImageRequest
+) -> tuple[float, float, float, float] | None:
+    """
+    Returns the area of `base`'s extended canvas that, scaled down to the target
+    size of `request`, places the original exactly where `request` wants it. None
+    when `request` needs pixels outside that canvas, a different text treatment or
+    an upscale.
+    """
+    if base.remove_text != request.remove_text:
+        return None
+
+    scale_x = request.original_box.width / base.original_box.width
+    scale_y = request.original_box.height / base.original_box.height
+    tolerance = settings.imageedit.extend.batch.scale_tolerance
+    if abs(scale_x - scale_y) > tolerance * max(scale_x, scale_y):
+        return None
+    if max(scale_x, scale_y) > 1 + tolerance:
+        return None
+
+    x1 = base.original_box.x - request.original_box.x / scale_x
+    y1 = base.original_box.y - request.original_box.y / scale_y
+    x2 = x1 + request.target_width / scale_x
+    y2 = y1 + request.target_height / scale_y
+    # Allow for the rounding of whole pixel boxes.
+    if (
+        x1 < -0.5
+        or y1 < -0.5
+        or x2 > base.target_width + 0.5
+        or y2 > base.target_height + 0.5
+    ):
+        return None
+    return (
+        max(0.0, x1),
+        max(0.0, y1),
+        min(float(base.target_width), x2),
+        min(float(base.target_height), y2),
+    )
+
+
+def estimate_peak_bytes(
+    request: ExtendImageRequest, source_size: tuple[int, int]
+) -> int:
+    """
+    Projects the largest decoded RGBA footprint of extending an upload of
+    `source_size` for `request`.
+    """
+    working_request = get_working_request(request)
+    # The decoded upload and its text free copy.
+    source = 2 * rgba_bytes(*source_size)
+    working_canvas = rgba_bytes(
+        working_request.target_width, working_request.target_height
+    )
+    # The canvas and its checkpoint snapshot, plus the crops, masks and results
+    # in flight, which together never exceed the canvas twice over.
+    extending = source + 4 * working_canvas
+
+    # The final canvas and the copy handed to the encoder process, and while
+    # upscaling also the working canvas and the decoded upscaler output.
+    full_canvas = rgba_bytes(request.target_width, request.target_height)
+    finalising = source + 2 * full_canvas
+    if working_request is not request:
+        finalising += working_canvas + full_canvas
+    return max(extending, finalising)
+
+
+def _grow_box(box: list[int], growth: int, target_w: int, target_h: int) -> list[int]:
+    """Grows every side of `box` by `growth` pixels, clipped to the canvas."""
+    x1, y1, x2, y2 = box
+    return [
+        min(x1, max(0, x1 - growth)),
+        min(y1, max(0, y1 - growth)),
+        max(x2, min(target_w, x2 + growth)),
+        max(y2, min(target_h, y2 + growth)),
+    ]
+
+
+def _max_uniform_growth(
+    box: list[int], target_w: int, target_h: int, max_area: int
+) -> int:
+    """
+    Returns the largest growth `s` such that growing every side of `box` by `s`
+    (clipped to the canvas) adds at most `max_area` pixels.
+
+    Clipping makes the added area piecewise quadratic in `s`, with breakpoints at
+    each side's distance to the canvas edge, so we solve the quadratic directly on
+    the segment where the budget runs out.
+    """
+    x1, y1, x2, y2 = box
+    width, height = x2 - x1, y2 - y1
+    limits_x = [max(0, x1), max(0, target_w - x2)]
+    limits_y = [max(0, y1), max(0, target_h - y2)]
+    max_growth = max(limits_x + limits_y)
+    if max_growth == 0:
+        return 0
+
+    budget = width * height + max_area
+    breakpoints = sorted({0, *limits_x, *limits_y})
+    for start, end in zip(breakpoints, breakpoints[1:]):
+        # Between two breakpoints each axis grows linearly with `s`.
+        grow_x = sum(1 for limit in limits_x if limit > start)
+        grow_y = sum(1 for limit in limits_y if limit > start)
+        base_w = width + sum(limit for limit in limits_x if limit <= start)
+        base_h = height + sum(limit for limit in limits_y if limit <= start)
+
+        def area(s: int) -> int:
+            return (base_w + grow_x * s) * (base_h + grow_y * s)
+
+        if area(end) <= budget:
+            continue
+
+        # Largest root of (base_w + grow_x * s) * (base_h + grow_y * s) = budget
+        a = grow_x * grow_y
+        b = grow_x * base_h + grow_y * base_w
+        c = base_w * base_h - budget
+        root = -c / b if a == 0 else (-b + math.sqrt(b * b - 4 * a * c)) / (2 * a)
+        growth = min(end, int(math.floor(root)))
+        # Guard against floating point error at the boundary
+        while growth > start and area(growth) > budget:
+            growth -= 1
+        # Always make some progress, even if a single pixel exceeds the budget.
+        return max(1, growth)
+
+    return max_growth
+
+
+def _nearest_aspect_ratio(width: int, height: int) -> float:
+    ratio = width / height
+    return min(
+        (w / h for w, h in IDEOGRAM_ASPECT_RATIOS),
+        key=lambda candidate: abs(math.log(ratio / candidate)),
+    )
+
+
+def _align_to_model(current_box: list[int], expansion_box: list[int]) -> list[int]:
+    """
+    Trims the growth of `expansion_box` on its longer axis so that the context
+    box matches the closest aspect ratio supported by the inpainting model.
+
+    The box is left untouched when aligning would keep less than half of the
+    growth on that axis.
+    """
+    width = expansion_box[2] - expansion_box[0]
+    height = expansion_box[3] - expansion_box[1]
+    ratio = _nearest_aspect_ratio(width, height)
+
+    if width / height > ratio:
+        excess = width - round(height * ratio)
+        first, second = 0, 2
+    else:
+        excess = height - round(width / ratio)
+        first, second = 1, 3
+
+    growth_first = current_box[first] - expansion_box[first]
+    growth_second = expansion_box[second] - current_box[second]
+    growth = growth_first + growth_second
+    if excess <= 0 or excess * 2 > growth:
+        return expansion_box
+
+    trim_first = round(excess * growth_first / growth)
+    aligned = list(expansion_box)
+    aligned[first] += trim_first
+    aligned[second] -= excess - trim_first
+    return aligned
+
+
+def _plan_boxes(
+    initial_box: list[int],
+    target_w: int,
+    target_h: int,
+    max_area: int,
+    max_steps: int,
+    align: bool,
+) -> list[list[int]]:
+    box = list(initial_box)
+    boxes: list[list[int]] = []
+
+    for _ in range(max_steps):
+        if is_target_reached(box, target_w, target_h):
+            break
+        growth = _max_uniform_growth(box, target_w, target_h, max_area)
+        if growth == 0:
+            break
+        expansion_box = _grow_box(box, growth, target_w, target_h)
+        if align:
+            expansion_box = _align_to_model(box, expansion_box)
+        boxes.append(expansion_box)
+        box = expansion_box
+    return boxes
+
+
+def plan_sequential_extension(
+    initial_box: list[int],
+    target_w: int,
+    target_h: int,
+    max_area: int,
+    max_steps: int = MAX_ITERATIONS,
+) -> list[list[int]]:
+    """
+    Returns the expansion box of every step needed to reach the target.
+
+    Steps are aligned to the aspect ratios of the inpainting model only when that
+    takes no more steps than growing them freely, as every step is a paid call.
+    """
+
+    def reaches_target(boxes: list[list[int]]) -> bool:
+        final_box = boxes[-1] if boxes else initial_box
+        return is_target_reached(final_box, target_w, target_h)
+
+    boxes = _plan_boxes(initial_box, target_w, target_h, max_area, max_steps, False)
+    aligned = _plan_boxes(initial_box, target_w, target_h, max_area, max_steps, True)
+    if len(aligned) <= len(boxes) and (
+        reaches_target(aligned) or not reaches_target(boxes)
+    ):
+        boxes = aligned
+
+    logger.info(f"Planned sequential extension: {len(boxes)} steps")
+    return boxes
+
+
+def _overlap(length: int) -> int:
+    # Same heuristic as the sequential loop: 5% of the existing box, at least 5px.
+    return max(5, int(length * 0.05))
+
+
+def _side_tiles(box: list[int], depths: dict[str, int]) -> list[ExtensionTile]:
+    """
+    Builds the strips directly left, right, above and below `box`.
+
+    Each strip only borrows context from its own half of the existing box, so
+    opposite strips never overlap. Perpendicular strips do: the overlap band a
+    strip regenerates at the edge of the box lies in the context of the strips
+    beside it. Filling them concurrently is only safe because every tile of a
+    phase is cropped from the canvas before any of them is pasted back.
+    """
+    x1, y1, x2, y2 = box
+    width, height = x2 - x1, y2 - y1
+    overlap_x, overlap_y = _overlap(width), _overlap(height)
+    tiles = []
+
+    if depths["left"] > 0:
+        depth = depths["left"]
+        band = min(width // 2, max(depth, overlap_x))
+        tiles.append(
+            ExtensionTile(
+                side="left",
+                fill_box=[x1 - depth, y1, x1, y2],
+                context_box=[x1 - depth, y1, x1 + band, y2],
+                regenerate_boxes=[[0, 0, depth + min(overlap_x, band), height]],
+            )
+        )
+    if depths["right"] > 0:
+        depth = depths["right"]
+        band = min(width // 2, max(depth, overlap_x))
+        tiles.append(
+            ExtensionTile(
+                side="right",
+                fill_box=[x2, y1, x2 + depth, y2],
+                context_box=[x2 - band, y1, x2 + depth, y2],
+                regenerate_boxes=[
+                    [band - min(overlap_x, band), 0, band + depth, height]
+                ],
+            )
+        )
+    if depths["top"] > 0:
+        depth = depths["top"]
+        band = min(height // 2, max(depth, overlap_y))
+        tiles.append(
+            ExtensionTile(
+                side="top",
+                fill_box=[x1, y1 - depth, x2, y1],
+                context_box=[x1, y1 - depth, x2, y1 + band],
+                regenerate_boxes=[[0, 0, width, depth + min(overlap_y, band)]],
+            )
+        )
+    if depths["bottom"] > 0:
+        depth = depths["bottom"]
+        band = min(height // 2, max(depth, overlap_y))
+        tiles.append(
+            ExtensionTile(
+                side="bottom",
+                fill_box=[x1, y2, x2, y2 + depth],
+                context_box=[x1, y2 - band, x2, y2 + depth],
+                regenerate_boxes=[
+                    [0, band - min(overlap_y, band), width, band + depth]
+                ],
+            )
+        )
+    return tiles
+
+
+def _corner_tiles(box: list[int], depths: dict[str, int]) -> list[ExtensionTile]:
+    """
+    Builds the corner patches left over once the side strips have been filled.
+
+    A corner uses the two neighbouring strips as context, which is why corners run
+    in a second phase after the strips.
+    """
+    x1, y1, x2, y2 = box
+    width, height = x2 - x1, y2 - y1
+    overlap_x, overlap_y = _overlap(width), _overlap(height)
+    tiles = []
+
+    for horizontal in ("left", "right"):
+        for vertical in ("top", "bottom"):
+            dx, dy = depths[horizontal], depths[vertical]
+            if dx <= 0 or dy <= 0:
+                continue
+
+            band_x = min(width // 2, max(dx, overlap_x))
+            band_y = min(height // 2, max(dy, overlap_y))
+            ov_x, ov_y = min(overlap_x, band_x), min(overlap_y, band_y)
+
+            if horizontal == "left":
+                fill_x = [x1 - dx, x1]
+                context_x = [x1 - dx, x1 + band_x]
+                local_x = [0, dx]
+                grown_x = [0, dx + ov_x]
+            else:
+                fill_x = [x2, x2 + dx]
+                context_x = [x2 - band_x, x2 + dx]
+                local_x = [band_x, band_x + dx]
+                grown_x = [band_x - ov_x, band_x + dx]
+
+            if vertical == "top":
+                fill_y = [y1 - dy, y1]
+                context_y = [y1 - dy, y1 + band_y]
+                local_y = [0, dy]
+                grown_y = [0, dy + ov_y]
+            else:
+                fill_y = [y2, y2 + dy]
+                context_y = [y2 - band_y, y2 + dy]
+                local_y = [band_y, band_y + dy]
+                grown_y = [band_y - ov_y, band_y + dy]
+
+            tiles.append(
+                ExtensionTile(
+                    side=f"{vertical}_{horizontal}",
+                    fill_box=[fill_x[0], fill_y[0], fill_x[1], fill_y[1]],
+                    context_box=[
+                        context_x[0],
+                        context_y[0],
+                        context_x[1],
+                        context_y[1],
+                    ],
+                    # Blend into both neighbouring strips, but not into the box itself.
+                    regenerate_boxes=[
+                        [grown_x[0], local_y[0], grown_x[1], local_y[1]],
+                        [local_x[0], grown_y[0], local_x[1], grown_y[1]],
+                    ],
+                )
+            )
+    return tiles
+
+
+def plan_parallel_extension(
+    initial_box: list[int],
+    target_w: int,
+    target_h: int,
+    max_area: int,
+    max_inpaint_calls: int = MAX_ITERATIONS,
+) -> list[list[ExtensionTile]]:
+    """
+    Splits the missing area around `initial_box` into phases of tiles that can be
+    inpainted concurrently.
+
+    Every round extends each side by as much as `max_area` allows for a strip along
+    that side, filling all strips in one phase and the resulting corners in a second
+    one. Rounds stop before the plan would exceed `max_inpaint_calls` tiles, the
+    same number of paid calls the sequential plan is limited to, even if the
+    target is not reached then.
+    """
+    box = list(initial_box)
+    phases: list[list[ExtensionTile]] = []
+    inpaint_calls = 0
+
+    while True:
+        x1, y1, x2, y2 = box
+        width, height = x2 - x1, y2 - y1
+        if width <= 0 or height <= 0:
+            break
+
+        remaining = {
+            "left": max(0, x1),
+            "right": max(0, target_w - x2),
+            "top": max(0, y1),
+            "bottom": max(0, target_h - y2),
+        }
+        if not any(remaining.values()):
+            break
+
+        depths = {
+            "left": min(remaining["left"], max(1, max_area // height)),
+            "right": min(remaining["right"], max(1, max_area // height)),
+            "top": min(remaining["top"], max(1, max_area // width)),
+            "bottom": min(remaining["bottom"], max(1, max_area // width)),
+        }
+
+        sides = _side_tiles(box, depths)
+        corners = _corner_tiles(box, depths)
+        if inpaint_calls + len(sides) + len(corners) > max_inpaint_calls:
+            break
+        inpaint_calls += len(sides) + len(corners)
+        phases.append(sides)
+        if corners:
+            phases.append(corners)
+
+        box = [
+            x1 - depths["left"],
+            y1 - depths["top"],
+            x2 + depths["right"],
+            y2 + depths["bottom"],
+        ]
+
+    logger.info(
+        f"Planned parallel extension: {len(phases)} phases, "
+        f"{sum(len(phase) for phase in phases)} tiles"
+    )
+    return phases
+
+
+def build_extension_plan(request: ExtendImageRequest) -> ExtensionPlan:
+    """Predicts the inpainting calls needed for `request` without running them."""
+    working_request = get_working_request(request)
+    upscale = working_request is not request
+    request = working_request
+
+    initial_box = get_initial_box(request)
+    max_area = get_max_extension_area(request)
+    final_box = list(initial_box)
+
+    steps = []
+    if request.mode == ExtensionMode.PARALLEL:
+        phases = plan_parallel_extension(
+            initial_box, request.target_width, request.target_height, max_area
+        )
+        for index, tiles in enumerate(phases, start=1):
+            steps.append(
+                ExtensionPlanStep(
+                    index=index, boxes=[tile.context_box for tile in tiles]
+                )
+            )
+            for tile in tiles:
+                final_box = [
+                    min(final_box[0], tile.fill_box[0]),
+                    min(final_box[1], tile.fill_box[1]),
+                    max(final_box[2], tile.fill_box[2]),
+                    max(final_box[3], tile.fill_box[3]),
+                ]
+    else:
+        boxes = plan_sequential_extension(
+            initial_box, request.target_width, request.target_height, max_area
+        )
+        for index, box in enumerate(boxes, start=1):
+            steps.append(ExtensionPlanStep(index=index, boxes=[box]))
+        if boxes:
+            final_box = boxes[-1]
+
+    estimated_seconds = len(steps) * settings.imageedit.extend.seconds_per_inpaint
+    if upscale:
+        estimated_seconds += settings.imageedit.extend.seconds_per_upscale
+
+    return ExtensionPlan(
+        mode=request.mode,
+        working_width=request.target_width,
+        working_height=request.target_height,
+        upscale=upscale,
+        steps=steps,
+        inpaint_calls=sum(len(step.boxes) for step in steps),
+        round_trips=len(steps) + (1 if upscale else 0),
+        reaches_target=is_target_reached(
+            final_box, request.target_width, request.target_height
+        ),
+        estimated_seconds=estimated_seconds,
+    )
@@ -1,14 +1,41 @@
+import asyncio
 import logging
+from uuid import UUID
 
-from fastapi import APIRouter, Depends, File, Form, UploadFile
+from fastapi import (
+    APIRouter,
+    Depends,
+    File,
+    Form,
+    Header,
+    HTTPException,
+    Request,
+    UploadFile,
+)
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
 
-from paperback_cover.auth.service import verify_active_user
+from paperback_cover.auth.service import verify_active_user, verify_superuser
 from paperback_cover.commons.annotations import reduce_credits, timing
-from paperback_cover.imageedit.extend_image.schema import ExtendImageRequest
+from paperback_cover.config import settings
+from paperback_cover.cover_art.schema import CoverArtSchema
+from paperback_cover.imageedit.extend_image.jobs import (
+    ExtendImageJobService,
+    get_extend_image_job_service,
+)
+from paperback_cover.imageedit.extend_image.runs import get_run
+from paperback_cover.imageedit.extend_image.schema import (
+    ExtendImageBatchRequest,
+    ExtendImageJobSchema,
+    ExtendImageJobStatus,
+    ExtendImageRequest,
+    ExtensionPlan,
+)
 from paperback_cover.imageedit.extend_image.service import (
     ExtendImageService,
     get_extend_image_service,
 )
+from paperback_cover.imageedit.inpaint_cache import InpaintCache, get_inpaint_cache
 from paperback_cover.models.user import User
 
 logger = logging.getLogger(__name__)
@@ -19,14 +46,38 @@ router = APIRouter(
 )
 
 
+async def _is_known_run(
+    user: User, idempotency_key: str | None = None, **kwargs
+) -> bool:
+    # Retries resume a run that was already charged for.
+    return bool(idempotency_key) and await get_run(user, idempotency_key) is not None
+
+
+async def _is_known_job(
+    user: User,
+    extend_image_job_service: ExtendImageJobService,
+    idempotency_key: str | None = None,
+    **kwargs,
+) -> bool:
+    # Resubmitting a job, even a failed one that is queued again, is not charged.
+    return (
+        bool(idempotency_key)
+        and await extend_image_job_service.get_job_by_idempotency_key(
+            user, idempotency_key
+        )
+        is not None
+    )
+
+
 @router.post("")
 @timing
-@reduce_credits(1)
+@reduce_credits(1, unless=_is_known_run)
 async def extend_image_api(
     data: str = Form(..., description="JSON string containing extension parameters"),
     file: UploadFile = File(...),
     user: User = Depends(verify_active_user),
     extend_image_service: ExtendImageService = Depends(get_extend_image_service),
+    idempotency_key: str | None = Header(None, alias="Idempotency-Key"),
 ):
     """
     Extend an image to target dimensions using AI inpainting.
@@ -37,11 +88,189 @@ async def extend_image_api(
         - original_box: Bounding box of original image within target canvas
         - invert_text: Whether to invert mask for text processing (default: true)
         - remove_text: Whether to remove text before extending (default: false)
+        - mode: "sequential" (default) or "parallel" to fill all sides concurrently
+        - resolution: "full" (default) outpaints on a canvas of the target size.
+          "working" outpaints on a canvas scaled down to the model's working
+          resolution, upscales it once and pastes the original back at full
+          resolution: faster, lighter round-trips for large targets at the cost
+          of one upscaling call, with softer detail in the generated areas
     - **file**: The image file to extend
+    - **Idempotency-Key** header (optional): checkpoints the run under this key.
+      Resubmitting with the same key resumes after the last completed step, or
+      returns the finished result, without charging again. Reusing a key with
+      other parameters or another image is rejected with a 409.
     """
     extend_image_request = ExtendImageRequest.parse_raw(data)
     return await extend_image_service.extend_image(
         extend_image_request,
         file,
         user,
+        idempotency_key=idempotency_key,
     )
+
+
+def get_batch_request(
+    data: str = Form(
+        ..., description="JSON string with the list of extension parameters"
+    ),
+) -> ExtendImageBatchRequest:
+    # Runs as a dependency, so an invalid batch is rejected before it is charged.
+    try:
+        batch_request = ExtendImageBatchRequest.parse_raw(data)
+    except ValidationError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid batch request: {e}")
+
+    max_targets = settings.imageedit.extend.batch.max_targets
+    if not batch_request.targets or len(batch_request.targets) > max_targets:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Provide between 1 and {max_targets} targets.",
+        )
+    return batch_request
+
+
+def _count_targets(batch_request: ExtendImageBatchRequest, **kwargs) -> int:
+    return len(batch_request.targets)
+
+
+@router.post("/batch")
+@timing
+@reduce_credits(_count_targets)
+async def extend_image_batch_api(
+    batch_request: ExtendImageBatchRequest = Depends(get_batch_request),
+    file: UploadFile = File(...),
+    user: User = Depends(verify_active_user),
+    extend_image_service: ExtendImageService = Depends(get_extend_image_service),
+) -> list[CoverArtSchema | None]:
+    """
+    Extend one image to several target sizes, e.g. ebook, paperback and hardcover.
+
+    - **data**: JSON string of the form `{"targets": [...]}`, each target taking
+      the same parameters as the `data` field of the extend endpoint
+    - **file**: The image file to extend
+
+    The image is analysed once for all targets, and targets that fit inside a
+    larger extended canvas are cut and scaled from it. One credit is charged per
+    target. Results are returned in the order of the targets.
+    """
+    return await extend_image_service.extend_images(batch_request.targets, file, user)
+
+
+@router.post("/plan")
+async def plan_extend_image_api(
+    extend_image_request: ExtendImageRequest,
+    user: User = Depends(verify_active_user),
+    extend_image_service: ExtendImageService = Depends(get_extend_image_service),
+) -> ExtensionPlan:
+    """
+    Predict the inpainting steps for an extension without running it or charging
+    credits. Accepts the same parameters as the `data` field of the extend endpoint.
+    """
+    return extend_image_service.plan_extension(extend_image_request)
+
+
+@router.post("/jobs")
+@timing
+@reduce_credits(1, unless=_is_known_job)
+async def create_extend_image_job_api(
+    data: str = Form(..., description="JSON string containing extension parameters"),
+    file: UploadFile = File(...),
+    user: User = Depends(verify_active_user),
+    extend_image_job_service: ExtendImageJobService = Depends(
+        get_extend_image_job_service
+    ),
+    idempotency_key: str | None = Header(None, alias="Idempotency-Key"),
+) -> ExtendImageJobSchema:
+    """
+    Queue an image extension and return immediately. Takes the same parameters as
+    the extend endpoint; poll the job or subscribe to its events for progress.
+    Resubmitting with the same Idempotency-Key header returns the existing job, or
+    queues it again to resume if it failed.
+    """
+    extend_image_request = ExtendImageRequest.parse_raw(data)
+    return await extend_image_job_service.create_job(
+        extend_image_request,
+        file,
+        user,
+        idempotency_key=idempotency_key,
+    )
+
+
+@router.get("/jobs/{job_id}")
+async def get_extend_image_job_api(
+    job_id: UUID,
+    user: User = Depends(verify_active_user),
+    extend_image_job_service: ExtendImageJobService = Depends(
+        get_extend_image_job_service
+    ),
+) -> ExtendImageJobSchema:
+    job = await extend_image_job_service.get_job(job_id, user)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.get("/jobs/{job_id}/events")
+async def stream_extend_image_job_api(
+    job_id: UUID,
+    request: Request,
+    user: User = Depends(verify_active_user),
+    extend_image_job_service: ExtendImageJobService = Depends(
+        get_extend_image_job_service
+    ),
+):
+    """
+    Server-sent events with the job state, sent whenever it changes. The stream
+    ends once the job has succeeded or failed.
+    """
+    job = await extend_image_job_service.get_job(job_id, user)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def events():
+        nonlocal job
+        last_event = None
+        while job is not None:
+            event = job.model_dump_json()
+            if event != last_event:
+                yield f"event: job\ndata: {event}\n\n"
+                last_event = event
+            if job.status in (
+                ExtendImageJobStatus.SUCCEEDED,
+                ExtendImageJobStatus.FAILED,
+            ):
+                break
+            if await request.is_disconnected():
+                break
+            await asyncio.sleep(settings.imageedit.extend.jobs.events_poll_seconds)
+            job = await extend_image_job_service.get_job(job_id, user)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"},
+    )
+
+
+@router.post(
+    "/cache/evict",
+    tags=["admin"],
+    dependencies=[Depends(verify_superuser)],
+    status_code=200,
+)
+async def evict_inpaint_cache_api(
+    inpaint_cache: InpaintCache = Depends(get_inpaint_cache),
+):
+    """
+    Evicts expired inpaint cache entries and trims the cache to its size limit
+    right away. Eviction also runs on a schedule, this only triggers it manually.
+    """
+    try:
+        evicted = await inpaint_cache.evict()
+        return {"message": f"Evicted {evicted} cache entries"}
+    except Exception as e:
+        logger.error(f"Error during inpaint cache eviction: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail="An internal error occurred during cache eviction.",
+        )
@@ -0,0 +1,190 @@
+import asyncio
+import hashlib
+import logging
+from io import BytesIO
+from uuid import UUID
+
+from fastapi import HTTPException
+from PIL import Image
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+
+from paperback_cover.commons.db import get_async_session
+from paperback_cover.commons.executor import ImageProcessingExecutor
+from paperback_cover.commons.image_encoding import EncodingProfile, encode_image
+from paperback_cover.cover_art.schema import CoverArtSchema, TextRegion
+from paperback_cover.imageedit.extend_image.schema import ExtendImageRequest
+from paperback_cover.models.extend_image_run import ExtendImageRun
+from paperback_cover.models.user import User
+from paperback_cover.storage_service.service import (
+    delete_blob_from_bucket,
+    download_blob_from_bucket,
+    upload_blob_to_bucket,
+)
+
+logger = logging.getLogger(__name__)
+
+
+async def get_run(user: User, idempotency_key: str) -> ExtendImageRun | None:
+    async with get_async_session() as session:
+        result = await session.execute(
+            select(ExtendImageRun).where(
+                ExtendImageRun.owner == user.id,
+                ExtendImageRun.idempotency_key == idempotency_key,
+            )
+        )
+        return result.scalar_one_or_none()
+
+
+async def get_or_create_run(
+    user: User, idempotency_key: str, request: ExtendImageRequest, file_content: bytes
+) -> ExtendImageRun:
+    """
+    Returns the run for `idempotency_key`, creating it on first use. A key can only
+    be reused with the same extension parameters and the same uploaded image.
+    """
+    request_json = request.model_dump(mode="json")
+    source_sha256 = hashlib.sha256(file_content).hexdigest()
+    run = await get_run(user, idempotency_key)
+    if run is None:
+        try:
+            async with get_async_session() as session:
+                run = ExtendImageRun(
+                    owner=user.id,
+                    idempotency_key=idempotency_key,
+                    request=request_json,
+                    source_sha256=source_sha256,
+                )
+                session.add(run)
+                await session.commit()
+                return run
+        except IntegrityError:
+            # A concurrent submission with the same key created it first.
+            run = await get_run(user, idempotency_key)
+
+    if run.request != request_json:
+        raise HTTPException(
+            status_code=409,
+            detail="Idempotency key was already used with different parameters.",
+        )
+    if run.source_sha256 != source_sha256:
+        raise HTTPException(
+            status_code=409,
+            detail="Idempotency key was already used with a different image.",
+        )
+    return run
+
+
+async def update_run(run_id: UUID, **values):
+    async with get_async_session() as session:
+        async with session.begin():
+            await session.execute(
+                update(ExtendImageRun)
+                .where(ExtendImageRun.id == run_id)
+                .values(**values)
+            )
+
+
+async def save_run_analysis(
+    run_id: UUID, background_prompt: str, text_regions: list[TextRegion]
+):
+    await update_run(
+        run_id,
+        background_prompt=background_prompt,
+        text_regions=[region.model_dump(mode="json") for region in text_regions],
+    )
+
+
+async def complete_run(run_id: UUID, result: CoverArtSchema):
+    await update_run(run_id, result=result.model_dump(mode="json"))
+
+
+class RunCheckpointer:
+    """
+    Persists the canvas and filled box after every inpainting step of a run.
+
+    Each checkpoint is encoded and uploaded in the background from a snapshot of
+    the canvas, so the next inpainting call does not wait for it. Checkpoints are
+    written in order and the previous canvas is deleted once the run points at
+    the new one.
+    """
+
+    def __init__(
+        self,
+        run: ExtendImageRun,
+        image_executor: ImageProcessingExecutor,
+    ):
+        self.run_id = run.id
+        self.prefix = f"users/{str(run.owner)}/extend_image_runs/{str(run.id)}"
+        self.image_executor = image_executor
+        self.step = run.step
+        self.box = run.current_box
+        self.canvas_path = run.canvas_path
+        self._pending: asyncio.Task | None = None
+
+    @property
+    def has_checkpoint(self) -> bool:
+        return self.canvas_path is not None and self.box is not None
+
+    async def load_canvas(self) -> Image.Image:
+        data = await download_blob_from_bucket(self.canvas_path)
+        if data is None:
+            raise Exception(f"Failed to download checkpoint {self.canvas_path}")
+        return await self.image_executor.run(_decode_checkpoint, data)
+
+    async def save(self, canvas: Image.Image, box: list[int], step: int):
+        snapshot = await self.image_executor.run(canvas.copy)
+        previous = self._pending
+        self._pending = asyncio.create_task(
+            self._save(previous, snapshot, list(box), step)
+        )
+
+    async def flush(self):
+        """Waits for the checkpoint in flight."""
+        if self._pending is not None:
+            await self._pending
+            self._pending = None
+
+    async def discard(self):
+        """Deletes the stored canvas once the run no longer needs it."""
+        await self.flush()
+        if self.canvas_path is not None:
+            await delete_blob_from_bucket(self.canvas_path)
+            await update_run(self.run_id, canvas_path=None)
+            self.canvas_path = None
+
+    async def _save(
+        self,
+        previous: asyncio.Task | None,
+        snapshot: Image.Image,
+        box: list[int],
+        step: int,
+    ):
+        # Checkpoints are best effort: a failed one leaves the previous checkpoint
+        # in place, which a resume simply continues from.
+        if previous is not None:
+            await previous
+        try:
+            encoded = await self.image_executor.run(
+                encode_image, snapshot, EncodingProfile.INTERMEDIATE
+            )
+            path = f"{self.prefix}/canvas-{step}{encoded.suffix}"
+            if not await upload_blob_to_bucket(encoded.data, path, {}):
+                raise Exception(f"Failed to upload checkpoint {path}")
+            await update_run(self.run_id, step=step, current_box=box, canvas_path=path)
+        except Exception as e:
+            logger.error(
+                f"Failed to checkpoint run {self.run_id} at step {step}: {e}",
+                exc_info=True,
+            )
+            return
+
+        stale_path, self.canvas_path = self.canvas_path, path
+        self.step, self.box = step, box
+        if stale_path is not None and stale_path != path:
+            await delete_blob_from_bucket(stale_path)
+        logger.info(f"Checkpointed run {self.run_id} at step {step}")
+
+
+def _decode_checkpoint(data: bytes) -> Image.Image:
+    return Image.open(BytesIO(data)).convert("RGBA")
@@ -1,6 +1,26 @@
+import enum
+from datetime import datetime
+from uuid import UUID
+
 from pydantic import BaseModel
 
 from paperback_cover.book_cover.schema import BoundingBoxSchema
+from paperback_cover.cover_art.schema import CoverArtSchema
+
+
+class ExtensionMode(enum.Enum):
+    # Grow the box ring by ring, one inpainting call per step.
+    SEQUENTIAL = "sequential"
+    # Fill independent side strips (and then corners) concurrently.
+    PARALLEL = "parallel"
+
+
+class ResolutionMode(enum.Enum):
+    # Outpaint on a canvas of the target size.
+    FULL = "full"
+    # Outpaint on a canvas scaled down to the model's working resolution, upscale
+    # the result once and paste the original back at full resolution.
+    WORKING = "working"
 
 
 class ExtendImageRequest(BaseModel):
@@ -9,3 +29,72 @@ class ExtendImageRequest(BaseModel):
     original_box: BoundingBoxSchema
     invert_text: bool = True
     remove_text: bool = False
+    mode: ExtensionMode = ExtensionMode.SEQUENTIAL
+    resolution: ResolutionMode = ResolutionMode.FULL
+
+
+class ExtendImageBatchRequest(BaseModel):
+    # Every target is extended from the same upload, results keep this order.
+    targets: list[ExtendImageRequest]
+
+
+class ExtensionTile(BaseModel):
+    """A region of the canvas that can be inpainted independently of its siblings."""
+
+    side: str
+    # Area of the canvas that is missing and will be generated.
+    fill_box: list[int]
+    # Area of the canvas cropped and sent to the inpainting model.
+    context_box: list[int]
+    # Rectangles, relative to `context_box`, that the model should regenerate.
+    # This is the fill area plus a thin overlap band into existing pixels.
+    regenerate_boxes: list[list[int]]
+
+
+class ExtensionPlanStep(BaseModel):
+    index: int
+    # Context boxes sent to the inpainting model in this round-trip.
+    boxes: list[list[int]]
+
+
+class ExtensionPlan(BaseModel):
+    mode: ExtensionMode
+    # Size of the canvas the steps run on, and whether it is upscaled afterwards.
+    working_width: int
+    working_height: int
+    upscale: bool
+    steps: list[ExtensionPlanStep]
+    inpaint_calls: int
+    round_trips: int
+    reaches_target: bool
+    estimated_seconds: float
+
+
+class ExtendImageStage(enum.Enum):
+    ANALYSING = "analysing"
+    EXTENDING = "extending"
+    FINALISING = "finalising"
+
+
+class ExtendImageProgress(BaseModel):
+    stage: ExtendImageStage
+    # Inpainting round-trips completed out of the planned total.
+    step: int = 0
+    total_steps: int = 0
+
+
+class ExtendImageJobStatus(enum.Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
+class ExtendImageJobSchema(BaseModel):
+    id: UUID
+    status: ExtendImageJobStatus
+    progress: ExtendImageProgress | None = None
+    result: CoverArtSchema | None = None
+    error: str | None = None
+    created_at: datetime
+    updated_at: datetime
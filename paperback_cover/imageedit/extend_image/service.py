@@ -1,35 +1,140 @@
-import datetime
+import asyncio
 import logging
 import uuid
+from functools import partial
 from io import BytesIO
+from typing import Awaitable, Callable
 
-import httpx
-from fastapi import Depends, UploadFile
-from PIL import Image, ImageDraw
+from fastapi import Depends, HTTPException, UploadFile
+from PIL import Image, ImageDraw, ImageOps
+from pydantic import BaseModel, ConfigDict
 
 from paperback_cover.commons.db import get_async_session
+from paperback_cover.commons.executor import (
+    ImageProcessingExecutor,
+    get_image_executor,
+)
 from paperback_cover.commons.file_validator import validate_image_file
-from paperback_cover.cover_art.replicate_artwork_service import (
-    ReplicateArtworkService,
-    get_replicate_artwork_service,
+from paperback_cover.commons.image_encoding import EncodingProfile, encode_image
+from paperback_cover.commons.memory_budget import (
+    MemoryBudget,
+    get_memory_budget,
+    rgba_bytes,
+)
+from paperback_cover.commons.pipeline import Pipeline
+from paperback_cover.commons.pixel_budget import decode_image, get_decode_size
+from paperback_cover.config import settings
+from paperback_cover.cover_art.schema import CoverArtSchema, OcrResult, TextRegion
+from paperback_cover.imageedit.extend_image.compositor import (
+    ring_blend_mask,
+    tile_blend_mask,
+)
+from paperback_cover.imageedit.extend_image.planner import (
+    build_extension_plan,
+    estimate_peak_bytes,
+    get_derivation_box,
+    get_filled_box,
+    get_initial_box,
+    get_max_extension_area,
+    get_working_request,
+    plan_parallel_extension,
+    plan_sequential_extension,
+)
+from paperback_cover.imageedit.extend_image.runs import (
+    RunCheckpointer,
+    complete_run,
+    get_or_create_run,
+    save_run_analysis,
+)
+from paperback_cover.imageedit.extend_image.schema import (
+    ExtendImageProgress,
+    ExtendImageRequest,
+    ExtendImageStage,
+    ExtensionMode,
+    ExtensionPlan,
+    ExtensionTile,
+)
+from paperback_cover.imageedit.extend_image.text_regions import TextRegionMasks
+from paperback_cover.imageedit.inpainting_backend import (
+    InpaintingBackend,
+    get_inpainting_backend,
 )
-from paperback_cover.cover_art.schema import CoverArtSchema, OcrResult
-from paperback_cover.imageedit.extend_image.schema import ExtendImageRequest
 from paperback_cover.models.asset import UserAsset
+from paperback_cover.models.extend_image_run import ExtendImageRun
 from paperback_cover.models.user import User
-from paperback_cover.openai.background_analyser_service import (
-    BackgroundAnalyserService,
-    get_background_analyser_service,
-)
+from paperback_cover.storage_service.intermediate import IntermediateImageTransport
 from paperback_cover.storage_service.schema import UploadMetadata
 from paperback_cover.storage_service.service import (
     get_user_generated_url_for_object,
     upload_image_to_bucket,
-    upload_temp_file_to_bucket,
 )
 
 logger = logging.getLogger(__name__)
 
+ProgressCallback = Callable[[ExtendImageProgress], Awaitable[None]]
+
+
+def _decode_rgba(data: BytesIO) -> Image.Image:
+    return Image.open(data).convert("RGBA")
+
+
+def _decode_source(data: BytesIO, needed_size: tuple[int, int]) -> Image.Image:
+    return decode_image(data, needed_size).convert("RGBA")
+
+
+def _get_placed_size(requests: list[ExtendImageRequest]) -> tuple[int, int]:
+    """The largest size the upload is pasted at across `requests`."""
+    return (
+        max(request.original_box.width for request in requests),
+        max(request.original_box.height for request in requests),
+    )
+
+
+def _read_image_size(data: bytes) -> tuple[int, int]:
+    # Opening only parses the header, the pixels are not decoded.
+    with Image.open(BytesIO(data)) as image:
+        return image.size
+
+
+def _is_opaque(image: Image.Image) -> bool:
+    return image.getchannel("A").getextrema()[0] == 255
+
+
+async def _report_progress(
+    on_progress: ProgressCallback | None, progress: ExtendImageProgress
+):
+    if on_progress is None:
+        return
+    try:
+        await on_progress(progress)
+    except Exception as e:
+        # Progress is informational, it must never fail the extension itself.
+        logger.warning(f"Failed to report extension progress: {e}")
+
+
+def _grow_filled_box(
+    box: list[int], fill_boxes: list[list[int]]
+) -> tuple[list[int], list[list[int]]]:
+    """
+    Returns the filled box and the fill boxes it does not include yet, which is
+    all of them until they cover the bounding box together with `box`.
+    """
+    filled_box = get_filled_box(box, fill_boxes)
+    return (filled_box, []) if filled_box != box else (box, fill_boxes)
+
+
+class SourceAnalysis(BaseModel):
+    """What an extension needs from the upload, independent of the target size."""
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    background_prompt: str
+    text_regions: list[TextRegion] = []
+    # Text cut from the upload, restored on top of the extended canvas
+    text_patches: list[dict] = []
+    # The upload with its text removed, or the upload itself
+    text_free_image: Image.Image
+
 
 def map_model_to_schema(cover_artwork: UserAsset) -> CoverArtSchema:
     return CoverArtSchema(
@@ -66,129 +171,297 @@ async def add_extended_image(
 class ExtendImageService:
     def __init__(
         self,
-        replicate_artwork_service: ReplicateArtworkService,
-        background_analyser_service: BackgroundAnalyserService,
+        inpainting_backend: InpaintingBackend,
+        image_executor: ImageProcessingExecutor,
+        memory_budget: MemoryBudget,
     ):
-        self.replicate_artwork_service = replicate_artwork_service
-        self.background_analyser_service = background_analyser_service
+        self.inpainting_backend = inpainting_backend
+        self.image_executor = image_executor
+        self.memory_budget = memory_budget
+
+    def plan_extension(self, request: ExtendImageRequest) -> ExtensionPlan:
+        """Returns the inpainting schedule `extend_image` would run for `request`."""
+        return build_extension_plan(request)
 
     async def extend_image(
-        self, request: ExtendImageRequest, file: UploadFile, user: User
+        self,
+        request: ExtendImageRequest,
+        file: UploadFile,
+        user: User,
+        idempotency_key: str | None = None,
     ) -> CoverArtSchema | None:
+        try:
+            upload = await validate_image_file(file)
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Failed to process uploaded image: {e}")
+            raise Exception("Failed to process uploaded image") from e
+
+        return await self.extend_image_content(
+            request, upload.content, user, idempotency_key=idempotency_key
+        )
+
+    async def extend_image_content(
+        self,
+        request: ExtendImageRequest,
+        file_content: bytes,
+        user: User,
+        on_progress: ProgressCallback | None = None,
+        idempotency_key: str | None = None,
+    ) -> CoverArtSchema | None:
+        """
+        Extends an already validated upload. `on_progress` is awaited whenever the
+        run moves to another stage or completes an inpainting round-trip.
+
+        With an `idempotency_key` every step is checkpointed: a repeated call
+        resumes after the last completed step, or returns the earlier result once
+        the run has finished.
+        """
         logger.info(f"Starting image extension request: {request.model_dump()}")
 
-        # First, upload the input image to get a URL for background analysis
-        try:
-            await validate_image_file(file)
-            file_content = await file.read()
-            original_image = Image.open(BytesIO(file_content)).convert("RGBA")
+        run = None
+        checkpointer = None
+        if idempotency_key:
+            run = await get_or_create_run(user, idempotency_key, request, file_content)
+            if run.result is not None:
+                logger.info(f"Run {run.id} already completed, returning its result")
+                return CoverArtSchema(**run.result)
+            checkpointer = RunCheckpointer(run, self.image_executor)
 
-            # Upload the original image to get a URL for background analysis
-            uploaded_image = await self._upload_image_to_storage(original_image)
-            image_url_for_analysis = uploaded_image.image_url
+        try:
+            header_size = await self.image_executor.run(_read_image_size, file_content)
         except Exception as e:
             logger.error(f"Failed to process uploaded image: {e}")
             raise Exception("Failed to process uploaded image") from e
 
-        background_prompt = await self.background_analyser_service.anlayse_background(
-            image_url_for_analysis
-        )
+        # Reserve the projected peak before decoding anything, so concurrent large
+        # extensions queue up instead of exhausting memory together.
+        source_size = get_decode_size(header_size, _get_placed_size([request]))
+        peak_bytes = estimate_peak_bytes(request, source_size)
+        logger.info(f"Projected peak image memory: {peak_bytes} bytes")
+        # Intermediate images only live for this request, so they are passed to the
+        # providers inline when small, deduplicated when published twice, and
+        # deleted from the bucket once the request is done.
+        async with (
+            self.memory_budget.reserve(peak_bytes),
+            IntermediateImageTransport(self.image_executor) as transport,
+        ):
+            return await self._run_extension(
+                transport, request, file_content, user, on_progress, run, checkpointer
+            )
 
-        if background_prompt is None:
-            logger.error("Failed to analyse background")
-            return None
+    async def extend_images(
+        self,
+        requests: list[ExtendImageRequest],
+        file: UploadFile,
+        user: User,
+    ) -> list[CoverArtSchema | None]:
+        """
+        Extends one upload to several targets. The upload is analysed once, and a
+        target that fits inside a larger canvas already extended is cut and scaled
+        from it instead of being outpainted again. Results follow `requests`.
+        """
+        max_targets = settings.imageedit.extend.batch.max_targets
+        if not requests or len(requests) > max_targets:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Provide between 1 and {max_targets} targets.",
+            )
 
-        # --- Text handling ---
-        original_image_with_text = original_image.copy()
-        saved_text_patches = []
-        if request.remove_text:
-            try:
-                ocr_result: OcrResult = (
-                    await self.replicate_artwork_service.detect_text_with_region(
-                        image_url=image_url_for_analysis
-                    )
-                )
-                logger.info(f"Detected {len(ocr_result.regions)} text regions.")
-            except Exception as e:
-                logger.error(f"Failed to detect text regions: {e}", exc_info=True)
-                ocr_result = OcrResult(regions=[])
-
-            if ocr_result.regions:
-                # First, save all the text patches that need to be restored later.
-                for region in ocr_result.regions:
-                    poly_bbox = self._get_bounding_box_for_polygon(region.bounding_box)
-                    mask = Image.new("L", original_image.size, 0)
-                    ImageDraw.Draw(mask).polygon(region.bounding_box, fill=255)
-                    cropped_mask = mask.crop(poly_bbox)
-                    patch = original_image_with_text.crop(poly_bbox)
-                    final_patch = Image.new("RGBA", patch.size, (0, 0, 0, 0))
-                    final_patch.paste(patch, (0, 0), cropped_mask)
-                    saved_text_patches.append({"patch": final_patch, "box": poly_bbox})
-
-                # Now, attempt to remove the text using the AI inpainting service.
-                try:
-                    logger.info("Attempting to remove text using AI inpainting.")
-                    combined_mask = Image.new("L", original_image.size, 0)
-                    draw_mask = ImageDraw.Draw(combined_mask)
-                    for region in ocr_result.regions:
-                        draw_mask.polygon(region.bounding_box, fill=255)
-
-                    image_to_inpaint_rgb = original_image.convert("RGB")
-                    image_to_inpaint_url_obj = await self._upload_image_to_storage(
-                        image_to_inpaint_rgb
-                    )
-                    mask_url_obj = await self._upload_image_to_storage(combined_mask)
+        try:
+            upload = await validate_image_file(file)
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Failed to process uploaded image: {e}")
+            raise Exception("Failed to process uploaded image") from e
 
-                    removed_text_image_url = (
-                        await self.replicate_artwork_service.remove_object_using_mask(
-                            input_image_url=image_to_inpaint_url_obj.image_url,
-                            mask_image_url=mask_url_obj.image_url,
-                        )
-                    )
+        source_size = get_decode_size(upload.size, _get_placed_size(requests))
+        # One target is extended at a time, but the extended canvases are kept for
+        # deriving the smaller targets.
+        peak_bytes = max(
+            estimate_peak_bytes(request, source_size) for request in requests
+        ) + sum(
+            rgba_bytes(request.target_width, request.target_height)
+            for request in requests
+        )
+        logger.info(f"Projected peak image memory: {peak_bytes} bytes")
+        async with (
+            self.memory_budget.reserve(peak_bytes),
+            IntermediateImageTransport(self.image_executor) as transport,
+        ):
+            return await self._run_batch(transport, requests, upload.content, user)
+
+    async def _run_batch(
+        self,
+        transport: IntermediateImageTransport,
+        requests: list[ExtendImageRequest],
+        file_content: bytes,
+        user: User,
+    ) -> list[CoverArtSchema | None]:
+        logger.info(f"Starting batch image extension for {len(requests)} targets")
+        original_image, is_opaque = await self._decode_upload(
+            file_content, _get_placed_size(requests)
+        )
 
-                    removed_text_image_bytes = await self._download_image(
-                        removed_text_image_url
+        analysis = await self._analyse_source(
+            transport,
+            original_image,
+            is_opaque,
+            remove_text=any(request.remove_text for request in requests),
+            extract_patches=True,
+        )
+        if analysis is None:
+            return [None] * len(requests)
+
+        results: list[CoverArtSchema | None] = [None] * len(requests)
+        # Extended canvases smaller targets can be derived from, largest first.
+        bases: list[tuple[ExtendImageRequest, Image.Image]] = []
+        order = sorted(
+            range(len(requests)),
+            key=lambda index: requests[index].target_width
+            * requests[index].target_height,
+            reverse=True,
+        )
+        for index in order:
+            request = requests[index]
+            for base_request, base_image in bases:
+                box = get_derivation_box(base_request, request)
+                if box is not None:
+                    logger.info(
+                        f"Deriving target {index} from the {base_request.target_width}x{base_request.target_height} canvas"
                     )
-                    original_image = Image.open(removed_text_image_bytes).convert(
-                        "RGBA"
+                    image = await self.image_executor.run(
+                        base_image.resize,
+                        (request.target_width, request.target_height),
+                        Image.Resampling.LANCZOS,
+                        box,
                     )
-                    logger.info("Successfully removed text using AI.")
+                    break
+            else:
+                logger.info(f"Extending target {index}")
+                image = await self._extend_target(
+                    transport, analysis, original_image, request
+                )
+                bases.append((request, image))
+            results[index] = await self._store_extended_image(image, user)
+        return results
 
-                except Exception as e:
-                    logger.error(
-                        "Failed to remove text using AI, falling back to average color fill: %s",
-                        e,
-                        exc_info=True,
-                    )
-                    # Fallback: Fill the text area in the main image with the average color.
-                    avg_color = self._get_average_color(original_image)
-                    draw = ImageDraw.Draw(original_image)
-                    for region in ocr_result.regions:
-                        draw.polygon(region.bounding_box, fill=avg_color)
-        # --- End of text handling ---
+    async def _extend_target(
+        self,
+        transport: IntermediateImageTransport,
+        analysis: SourceAnalysis,
+        original_image: Image.Image,
+        full_request: ExtendImageRequest,
+    ) -> Image.Image:
+        """Extends the analysed upload to one target of a batch."""
+        request = get_working_request(full_request)
+        source_image = original_image
+        text_patches = []
+        if request.remove_text:
+            source_image = analysis.text_free_image
+            text_patches = analysis.text_patches
 
-        # Resize original image to the size of the bounding box
-        original_image = original_image.resize(
-            (request.original_box.width, request.original_box.height)
+        canvas = await self.image_executor.run(
+            self._compose_canvas, source_image, request
         )
+        if self._is_target_dimension_reached(
+            get_initial_box(request), request.target_width, request.target_height
+        ):
+            return await self.image_executor.run(
+                canvas.crop, (0, 0, request.target_width, request.target_height)
+            )
 
-        # Create a new canvas with target dimensions
-        canvas = Image.new(
-            "RGBA", (request.target_width, request.target_height), (0, 0, 0, 0)
+        await self._extend_canvas(
+            transport, canvas, request, analysis.background_prompt
         )
-        # Paste the original image into the bounding box, using the image's alpha channel as a mask
-        canvas.paste(
-            original_image,
-            (request.original_box.x, request.original_box.y),
+        return await self._finalise_canvas(
+            transport,
+            canvas,
             original_image,
+            text_patches,
+            original_image.size,
+            request,
+            full_request,
         )
 
-        initial_box = [
-            request.original_box.x,
-            request.original_box.y,
-            request.original_box.x + request.original_box.width,
-            request.original_box.y + request.original_box.height,
-        ]
+    async def _run_extension(
+        self,
+        transport: IntermediateImageTransport,
+        request: ExtendImageRequest,
+        file_content: bytes,
+        user: User,
+        on_progress: ProgressCallback | None,
+        run: ExtendImageRun | None,
+        checkpointer: RunCheckpointer | None,
+    ) -> CoverArtSchema | None:
+        # In working resolution mode everything up to the final upscale runs on a
+        # scaled down canvas, and `full_request` keeps the requested output size.
+        full_request = request
+        request = get_working_request(full_request)
+        upscale = request is not full_request
+        if upscale:
+            logger.info(
+                f"Extending at {request.target_width}x{request.target_height} before upscaling"
+            )
+
+        await _report_progress(
+            on_progress, ExtendImageProgress(stage=ExtendImageStage.ANALYSING)
+        )
+
+        original_image, is_opaque = await self._decode_upload(
+            file_content, _get_placed_size([full_request])
+        )
+        source_size = original_image.size
+
+        if checkpointer is not None and checkpointer.has_checkpoint:
+            # The analysis results are stored with the run, so a resume goes
+            # straight back to the last checkpointed canvas.
+            logger.info(f"Resuming run {run.id} after step {checkpointer.step}")
+            prompt = run.background_prompt
+            text_regions = [TextRegion(**region) for region in run.text_regions or []]
+            saved_text_patches = []
+            if not upscale:
+                text_masks = await self._build_text_masks(
+                    original_image.size, OcrResult(regions=text_regions)
+                )
+                saved_text_patches = await self._extract_text_patches(
+                    original_image, text_masks
+                )
+            canvas = await checkpointer.load_canvas()
+        else:
+            # The upscaled canvas gets the whole original pasted back, text
+            # included, so only a full resolution run restores patches.
+            analysis = await self._analyse_source(
+                transport,
+                original_image,
+                is_opaque,
+                remove_text=request.remove_text,
+                extract_patches=not upscale,
+            )
+            if analysis is None:
+                return None
+            prompt = analysis.background_prompt
+            text_regions = analysis.text_regions
+            saved_text_patches = analysis.text_patches
+
+            # The extension continues from the text free image.
+            source_image = (
+                analysis.text_free_image if request.remove_text else original_image
+            )
+            del analysis
+            canvas = await self.image_executor.run(
+                self._compose_canvas, source_image, request
+            )
+            del source_image
+
+        # The text patches hold everything a full resolution run still needs from
+        # the upload, only the upscaled canvas pastes the original back.
+        if not upscale:
+            original_image = None
+
+        initial_box = get_initial_box(request)
 
         # If the initial image already covers the target area, just crop and return.
         if self._is_target_dimension_reached(
@@ -197,94 +470,352 @@ class ExtendImageService:
             logger.info(
                 "Initial image already covers target dimensions. Cropping and returning."
             )
-            cropped_canvas = canvas.crop(
-                (0, 0, request.target_width, request.target_height)
+            cropped_canvas = await self.image_executor.run(
+                canvas.crop, (0, 0, request.target_width, request.target_height)
             )
-            return await self._upload_image_to_storage(cropped_canvas)
+            result = await self._store_extended_image(cropped_canvas, user)
+            if run is not None and result is not None:
+                await complete_run(run.id, result)
+            return result
 
-        current_box = initial_box
-        original_image_area = request.original_box.width * request.original_box.height
-        max_extension_area = int(original_image_area * 0.6)
+        if checkpointer is not None and not checkpointer.has_checkpoint:
+            await save_run_analysis(run.id, prompt, text_regions)
+            await checkpointer.save(canvas, initial_box, 0)
 
         current_image = canvas
-        max_iterations = 20
-        iterations = 0
+        del canvas
+        reached = await self._extend_canvas(
+            transport, current_image, request, prompt, on_progress, checkpointer
+        )
+        if (
+            not reached
+            and checkpointer is not None
+            and build_extension_plan(request).reaches_target
+        ):
+            # A step failed. Rather than settling for a partial canvas, let the
+            # client retry, which resumes after the last completed step.
+            raise HTTPException(
+                status_code=503,
+                detail=f"Image extension stopped after step {checkpointer.step}. Retry with the same idempotency key to resume.",
+            )
 
-        logger.info(
-            f"Starting extension loop. Max iterations: {max_iterations}, Max extension area per step: {max_extension_area}px"
+        await _report_progress(
+            on_progress, ExtendImageProgress(stage=ExtendImageStage.FINALISING)
         )
 
-        while (
-            not self._is_target_dimension_reached(
-                current_box, request.target_width, request.target_height
+        current_image = await self._finalise_canvas(
+            transport,
+            current_image,
+            original_image,
+            saved_text_patches,
+            source_size,
+            request,
+            full_request,
+        )
+        original_image = None
+
+        result = await self._store_extended_image(current_image, user)
+        if run is not None and result is not None:
+            await complete_run(run.id, result)
+            await checkpointer.discard()
+        return result
+
+    async def _decode_upload(
+        self, file_content: bytes, needed_size: tuple[int, int]
+    ) -> tuple[Image.Image, bool]:
+        """
+        Decodes the upload once, returning it as RGBA and whether it is opaque. An
+        upload larger than `needed_size` is decoded downsampled to it, since the
+        extension never uses more of it.
+        """
+        try:
+            original_image = await self.image_executor.run(
+                _decode_source, BytesIO(file_content), needed_size
             )
-            and iterations < max_iterations
+            is_opaque = await self.image_executor.run(_is_opaque, original_image)
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Failed to process uploaded image: {e}")
+            raise Exception("Failed to process uploaded image") from e
+        return original_image, is_opaque
+
+    async def _analyse_source(
+        self,
+        transport: IntermediateImageTransport,
+        original_image: Image.Image,
+        is_opaque: bool,
+        remove_text: bool,
+        extract_patches: bool,
+    ) -> SourceAnalysis | None:
+        """
+        Runs the analysis stages an extension needs from the upload. Returns None
+        when the background could not be analysed.
+        """
+        # Background analysis and OCR only need the published source image, and
+        # the RGB copy for text removal only needs the decoded one, so these
+        # stages run concurrently and each later stage waits for its own inputs.
+        pipeline = Pipeline("extend_image")
+        pipeline.add(
+            "source_url",
+            partial(self._publish_source, transport, original_image, is_opaque),
+        )
+        pipeline.add(
+            "background_prompt",
+            self.inpainting_backend.analyse_background,
+            depends_on=["source_url"],
+        )
+        if remove_text:
+            pipeline.add("ocr", self._detect_text, depends_on=["source_url"])
+            pipeline.add(
+                "text_masks",
+                partial(self._build_text_masks, original_image.size),
+                depends_on=["ocr"],
+            )
+            if extract_patches:
+                pipeline.add(
+                    "text_patches",
+                    partial(self._extract_text_patches, original_image),
+                    depends_on=["text_masks"],
+                )
+            # An opaque image looks the same in RGB, so the published source
+            # image doubles as the text removal input.
+            if is_opaque:
+                inpaint_source = "source_url"
+            else:
+                inpaint_source = "inpaint_source_url"
+                pipeline.add(
+                    inpaint_source,
+                    partial(self._publish_rgb, transport, original_image),
+                )
+            pipeline.add(
+                "text_free_image",
+                partial(self._remove_text, transport, original_image),
+                depends_on=["text_masks", inpaint_source],
+            )
+
+        results = await pipeline.run()
+
+        background_prompt = results["background_prompt"]
+        if background_prompt is None:
+            logger.error("Failed to analyse background")
+            return None
+
+        # The text patches are cut from the untouched upload. Only the returned
+        # images outlive the stages, which also hold masks and published copies.
+        return SourceAnalysis(
+            background_prompt=background_prompt,
+            text_regions=results["ocr"].regions if "ocr" in results else [],
+            text_patches=results.get("text_patches", []),
+            text_free_image=results.get("text_free_image", original_image),
+        )
+
+    async def _extend_canvas(
+        self,
+        transport: IntermediateImageTransport,
+        canvas: Image.Image,
+        request: ExtendImageRequest,
+        prompt: str,
+        on_progress: ProgressCallback | None = None,
+        checkpointer: RunCheckpointer | None = None,
+    ) -> bool:
+        """
+        Outpaints `canvas` in place, continuing after the checkpoint if there is
+        one. Returns whether the target was reached.
+        """
+        initial_box = get_initial_box(request)
+        start_step, start_box = 0, initial_box
+        if checkpointer is not None and checkpointer.has_checkpoint:
+            start_step, start_box = checkpointer.step, checkpointer.box
+
+        extend = (
+            self._extend_parallel
+            if request.mode == ExtensionMode.PARALLEL
+            else self._extend_sequential
+        )
+        try:
+            current_box, iterations = await extend(
+                transport,
+                canvas,
+                initial_box,
+                request,
+                get_max_extension_area(request),
+                prompt,
+                on_progress,
+                checkpointer,
+                start_step,
+                start_box,
+            )
+        finally:
+            if checkpointer is not None:
+                await checkpointer.flush()
+
+        if self._is_target_dimension_reached(
+            current_box, request.target_width, request.target_height
         ):
+            logger.info(
+                f"Successfully extended image to target dimensions in {iterations} iterations."
+            )
+            return True
+        logger.warning(
+            f"Failed to extend image to full target dimensions after {iterations} iterations."
+        )
+        return False
+
+    async def _finalise_canvas(
+        self,
+        transport: IntermediateImageTransport,
+        canvas: Image.Image,
+        original_image: Image.Image | None,
+        text_patches: list[dict],
+        source_size: tuple[int, int],
+        request: ExtendImageRequest,
+        full_request: ExtendImageRequest,
+    ) -> Image.Image:
+        """
+        Brings an extended working canvas to the requested size and puts the
+        original text back.
+        """
+        if request is not full_request:
+            # The original goes back over the upscaled canvas at full resolution,
+            # text included, so only the outpainted surroundings are upscaled.
+            canvas = await self._upscale_canvas(transport, canvas, full_request)
+            await self.image_executor.run(
+                self._paste_original, canvas, original_image, full_request
+            )
+        # --- Restore Text ---
+        elif text_patches:
+            logger.info(f"Restoring {len(text_patches)} text patches.")
+            await self.image_executor.run(
+                self._restore_text_patches,
+                canvas,
+                text_patches,
+                source_size,
+                request,
+            )
+        # --- End of Restore Text ---
+        return canvas
+
+    async def _store_extended_image(
+        self, image: Image.Image, user: User
+    ) -> CoverArtSchema | None:
+        # Save the final image to permanent storage. Encoding a full size canvas is
+        # the heaviest step, so it runs in the process pool.
+        final_image = await self.image_executor.run_in_process(
+            encode_image, image, EncodingProfile.FINAL
+        )
+
+        image_id = uuid.uuid4()
+        metadata = UploadMetadata(
+            artwork_type="extended_image",
+            user_id=str(user.id),
+            artwork_status="final",
+            artwork_width=str(image.width),
+            artwork_height=str(image.height),
+        )
+
+        image_path = f"users/{str(user.id)}/extended_image/{str(image_id)}"
+        image_url = await upload_image_to_bucket(final_image.data, image_path, metadata)
+
+        if not image_url:
+            raise ValueError("Image could not be uploaded")
+
+        return await add_extended_image(
+            image_url=image_path,
+            user=user,
+        )
+
+    async def _extend_sequential(
+        self,
+        transport: IntermediateImageTransport,
+        current_image: Image.Image,
+        initial_box: list[int],
+        request: ExtendImageRequest,
+        max_extension_area: int,
+        prompt: str,
+        on_progress: ProgressCallback | None = None,
+        checkpointer: RunCheckpointer | None = None,
+        start_step: int = 0,
+        start_box: list[int] | None = None,
+    ) -> tuple[list[int], int]:
+        """
+        Grows the box one ring at a time. Returns the final box and step count.
+        When resuming, the first `start_step` planned steps are skipped.
+        """
+        current_box = start_box or initial_box
+        iterations = start_step
+        expansion_boxes = plan_sequential_extension(
+            initial_box,
+            request.target_width,
+            request.target_height,
+            max_extension_area,
+        )
+
+        logger.info(
+            f"Starting extension loop. Planned steps: {len(expansion_boxes)}, Max extension area per step: {max_extension_area}px"
+        )
+
+        await _report_progress(
+            on_progress,
+            ExtendImageProgress(
+                stage=ExtendImageStage.EXTENDING,
+                step=start_step,
+                total_steps=len(expansion_boxes),
+            ),
+        )
+
+        for expansion_box in expansion_boxes[start_step:]:
             iterations += 1
             logger.info(
-                f"Iteration {iterations}/{max_iterations} | Current box: {current_box}"
+                f"Iteration {iterations}/{len(expansion_boxes)} | Current box: {current_box} | Expansion box: {expansion_box}"
             )
 
             (
                 expansion_box,
                 mask_for_inpaint,
                 context_image_for_inpaint,
-            ) = self._prepare_iteration(
+                blend_mask,
+            ) = await self.image_executor.run(
+                self._prepare_iteration,
                 current_box,
-                request.target_width,
-                request.target_height,
-                max_extension_area,
+                expansion_box,
                 current_image,
                 request.invert_text,
             )
 
-            logger.info(f"Expansion box for iteration {iterations}: {expansion_box}")
-
-            if expansion_box == current_box:
-                logger.warning(
-                    "Expansion stalled as expansion box is same as current box. Exiting loop."
-                )
-                break
-
             try:
-                mask_url = await self._upload_image_to_storage(mask_for_inpaint)
-                image_url = await self._upload_image_to_storage(
-                    context_image_for_inpaint
+                inpainted_image = await self._inpaint_region(
+                    transport, context_image_for_inpaint, mask_for_inpaint, prompt
                 )
 
-                logger.info("Invoking inpainting service...")
-                inpainted_image_url = (
-                    await self.replicate_artwork_service.inpaint_image_using_ideogram(
-                        image_url=image_url.image_url,
-                        mask_url=mask_url.image_url,
-                        prompt=background_prompt.background_prompt,
-                    )
-                )
-                inpainted_image_bytes = await self._download_image(inpainted_image_url)
-                inpainted_image = Image.open(inpainted_image_bytes).convert("RGBA")
-
-                # The inpainted image should be the same size as the context image for inpainting
-                if inpainted_image.size != context_image_for_inpaint.size:
-                    logger.warning(
-                        f"Inpainted image size {inpainted_image.size} does not match context size {context_image_for_inpaint.size}. Resizing."
-                    )
-                    inpainted_image = inpainted_image.resize(
-                        context_image_for_inpaint.size
-                    )
-
-                # Paste the inpainted part onto the main canvas
-                current_image.paste(
+                # Paste the inpainted part onto the main canvas, fading it into
+                # the existing pixels across the overlap band.
+                await self.image_executor.run(
+                    current_image.paste,
                     inpainted_image,
                     (expansion_box[0], expansion_box[1]),
-                    inpainted_image,
+                    blend_mask,
                 )
 
+                del inpainted_image, context_image_for_inpaint, mask_for_inpaint
+                del blend_mask
+
                 current_box = self._calculate_new_bounding_box(
                     current_box, expansion_box
                 )
                 logger.info(
                     f"Iteration {iterations} successful. New box: {current_box}"
                 )
+                if checkpointer is not None:
+                    await checkpointer.save(current_image, current_box, iterations)
+                await _report_progress(
+                    on_progress,
+                    ExtendImageProgress(
+                        stage=ExtendImageStage.EXTENDING,
+                        step=iterations,
+                        total_steps=len(expansion_boxes),
+                    ),
+                )
 
             except Exception as e:
                 logger.error(
@@ -292,68 +823,359 @@ class ExtendImageService:
                 )
                 break
 
-        if self._is_target_dimension_reached(
-            current_box, request.target_width, request.target_height
-        ):
+        return current_box, iterations
+
+    async def _extend_parallel(
+        self,
+        transport: IntermediateImageTransport,
+        current_image: Image.Image,
+        initial_box: list[int],
+        request: ExtendImageRequest,
+        max_extension_area: int,
+        prompt: str,
+        on_progress: ProgressCallback | None = None,
+        checkpointer: RunCheckpointer | None = None,
+        start_step: int = 0,
+        start_box: list[int] | None = None,
+    ) -> tuple[list[int], int]:
+        """
+        Fills independent strips and corners concurrently, phase by phase.
+        Returns the final box and the number of phases that completed. When
+        resuming, the first `start_step` phases are skipped and the filled box
+        is rebuilt from them, so `start_box` is not needed.
+        """
+        phases = plan_parallel_extension(
+            initial_box,
+            request.target_width,
+            request.target_height,
+            max_extension_area,
+        )
+
+        # Fill boxes of the phases since `current_box` last grew: strips only
+        # grow it once the corners between them are filled as well.
+        current_box, pending = list(initial_box), []
+        for tiles in phases[:start_step]:
+            current_box, pending = _grow_filled_box(
+                current_box, pending + [tile.fill_box for tile in tiles]
+            )
+        completed = start_step
+        await _report_progress(
+            on_progress,
+            ExtendImageProgress(
+                stage=ExtendImageStage.EXTENDING,
+                step=start_step,
+                total_steps=len(phases),
+            ),
+        )
+        for index, tiles in enumerate(phases[start_step:], start=start_step + 1):
             logger.info(
-                f"Successfully extended image to target dimensions in {iterations} iterations."
+                f"Phase {index}/{len(phases)} | Inpainting {len(tiles)} tiles concurrently: {[tile.side for tile in tiles]}"
             )
-        else:
-            logger.warning(
-                f"Failed to extend image to full target dimensions after {iterations} iterations. Returning current result."
+            prepared = [
+                (
+                    tile,
+                    *await self.image_executor.run(
+                        self._prepare_tile, tile, current_image, request.invert_text
+                    ),
+                )
+                for tile in tiles
+            ]
+            results = await asyncio.gather(
+                *(
+                    self._inpaint_region(transport, context_image, mask, prompt)
+                    for _, context_image, mask, _ in prepared
+                ),
+                return_exceptions=True,
             )
 
-        # --- Restore Text ---
-        if saved_text_patches:
-            logger.info(f"Restoring {len(saved_text_patches)} text patches.")
-            scale_x = request.original_box.width / original_image_with_text.width
-            scale_y = request.original_box.height / original_image_with_text.height
+            failed = False
+            for (tile, _, _, paste_mask), result in zip(prepared, results):
+                if isinstance(result, BaseException):
+                    logger.error(
+                        f"Error inpainting {tile.side} tile in phase {index}: {result}",
+                        exc_info=result,
+                    )
+                    failed = True
+                    continue
+                await self.image_executor.run(
+                    current_image.paste,
+                    result,
+                    (tile.context_box[0], tile.context_box[1]),
+                    paste_mask,
+                )
 
-            for item in saved_text_patches:
-                patch_img = item["patch"]
-                original_box = item["box"]
+            # Pasted tiles are not needed anymore.
+            del prepared, results
 
-                new_width = int(patch_img.width * scale_x)
-                new_height = int(patch_img.height * scale_y)
+            if failed:
+                # Later phases rely on this one, so stop with what we have.
+                break
+            # Only complete phases count, so a canvas with a missing tile is
+            # never reported as reaching the target.
+            current_box, pending = _grow_filled_box(
+                current_box, pending + [tile.fill_box for tile in tiles]
+            )
+            completed = index
+            if checkpointer is not None:
+                await checkpointer.save(current_image, current_box, completed)
+            await _report_progress(
+                on_progress,
+                ExtendImageProgress(
+                    stage=ExtendImageStage.EXTENDING,
+                    step=completed,
+                    total_steps=len(phases),
+                ),
+            )
 
-                if new_width == 0 or new_height == 0:
-                    continue
+        return current_box, completed
 
-                resized_patch = patch_img.resize((new_width, new_height))
+    def _prepare_tile(
+        self,
+        tile: ExtensionTile,
+        current_image: Image.Image,
+        invert_mask: bool = False,
+    ) -> tuple[Image.Image, Image.Image, Image.Image]:
+        """
+        Crops the tile context and builds its inpainting mask.
+        Also returns the mask used to paste the result back, which fades the
+        result into the existing pixels across the tile's overlap.
+        """
+        context_image = current_image.crop(tile.context_box)
+
+        regenerate_mask = Image.new("L", context_image.size, 0)
+        draw = ImageDraw.Draw(regenerate_mask)
+        for box in tile.regenerate_boxes:
+            draw.rectangle(box, fill=255)
+
+        # Same convention as `_prepare_iteration`: when inverted the preserved
+        # area is white and the area to fill is black.
+        mask = ImageOps.invert(regenerate_mask) if invert_mask else regenerate_mask
+
+        context_x, context_y = tile.context_box[0], tile.context_box[1]
+        paste_mask = tile_blend_mask(
+            context_image.size,
+            [
+                tile.fill_box[0] - context_x,
+                tile.fill_box[1] - context_y,
+                tile.fill_box[2] - context_x,
+                tile.fill_box[3] - context_y,
+            ],
+            tile.regenerate_boxes,
+        )
+        return context_image, mask, paste_mask
 
-                # Calculate final position on the canvas
-                paste_x = int(original_box[0] * scale_x) + request.original_box.x
-                paste_y = int(original_box[1] * scale_y) + request.original_box.y
+    async def _inpaint_region(
+        self,
+        transport: IntermediateImageTransport,
+        context_image: Image.Image,
+        mask: Image.Image,
+        prompt: str,
+    ) -> Image.Image:
+        """Runs one inpainting call and returns the result at the context size."""
+        inpainted_image_bytes = await self.inpainting_backend.inpaint(
+            transport, context_image, mask, prompt
+        )
+        inpainted_image = await self.image_executor.run(
+            _decode_rgba, inpainted_image_bytes
+        )
 
-                current_image.paste(resized_patch, (paste_x, paste_y), resized_patch)
-        # --- End of Restore Text ---
+        # The inpainted image should be the same size as the context image for inpainting
+        if inpainted_image.size != context_image.size:
+            logger.warning(
+                f"Inpainted image size {inpainted_image.size} does not match context size {context_image.size}. Resizing."
+            )
+            inpainted_image = await self.image_executor.run(
+                inpainted_image.resize, context_image.size
+            )
+        return inpainted_image
 
-        # Save the final image to permanent storage
-        final_image_io = BytesIO()
-        current_image.save(final_image_io, format="PNG")
-        final_image_io.seek(0)
+    async def _upscale_canvas(
+        self,
+        transport: IntermediateImageTransport,
+        canvas: Image.Image,
+        request: ExtendImageRequest,
+    ) -> Image.Image:
+        """
+        Upscales the working canvas to the target size of `request`. Falls back to
+        a plain resize if the upscaler fails, the result is still usable.
+        """
+        target_size = (request.target_width, request.target_height)
+        resemblance = settings.imageedit.extend.working_resolution.upscale_resemblance
+        try:
+            rgb_canvas = await self.image_executor.run(canvas.convert, "RGB")
+            upscaled_image_bytes = await self.inpainting_backend.upscale(
+                transport, rgb_canvas, resemblance
+            )
+            upscaled_image = await self.image_executor.run(
+                _decode_rgba, upscaled_image_bytes
+            )
+        except Exception as e:
+            logger.error(
+                f"Failed to upscale canvas, falling back to resizing: {e}",
+                exc_info=True,
+            )
+            upscaled_image = canvas
 
-        image_id = uuid.uuid4()
-        metadata = UploadMetadata(
-            artwork_type="extended_image",
-            user_id=str(user.id),
-            artwork_status="final",
-            artwork_width=str(current_image.width),
-            artwork_height=str(current_image.height),
+        return await self.image_executor.run(
+            self._fit_upscaled_canvas, upscaled_image, canvas, target_size
         )
 
-        image_path = f"users/{str(user.id)}/extended_image/{str(image_id)}"
-        image_url = await upload_image_to_bucket(
-            final_image_io.getvalue(), image_path, metadata
+    def _fit_upscaled_canvas(
+        self,
+        upscaled_image: Image.Image,
+        canvas: Image.Image,
+        target_size: tuple[int, int],
+    ) -> Image.Image:
+        # The upscaler works in fixed factors and drops the alpha channel, so the
+        # result is resized to the exact target and gets the canvas alpha back.
+        if upscaled_image.size != target_size:
+            upscaled_image = upscaled_image.resize(
+                target_size, Image.Resampling.LANCZOS
+            )
+        if not _is_opaque(canvas):
+            upscaled_image.putalpha(
+                canvas.getchannel("A").resize(target_size, Image.Resampling.LANCZOS)
+            )
+        return upscaled_image
+
+    async def _publish_source(
+        self,
+        transport: IntermediateImageTransport,
+        image: Image.Image,
+        is_opaque: bool,
+    ) -> str:
+        try:
+            if is_opaque:
+                return await self._publish_rgb(transport, image)
+            return await self.inpainting_backend.publish(transport, image)
+        except Exception as e:
+            logger.error(f"Failed to process uploaded image: {e}")
+            raise Exception("Failed to process uploaded image") from e
+
+    async def _publish_rgb(
+        self, transport: IntermediateImageTransport, image: Image.Image
+    ) -> str:
+        return await self.inpainting_backend.publish(
+            transport, await self.image_executor.run(image.convert, "RGB")
         )
 
-        if not image_url:
-            raise ValueError("Image could not be uploaded")
+    async def _detect_text(self, image_url: str) -> OcrResult:
+        try:
+            ocr_result = await self.inpainting_backend.detect_text(image_url)
+            logger.info(f"Detected {len(ocr_result.regions)} text regions.")
+            return ocr_result
+        except Exception as e:
+            logger.error(f"Failed to detect text regions: {e}", exc_info=True)
+            return OcrResult(regions=[])
 
-        return await add_extended_image(
-            image_url=image_path,
-            user=user,
+    async def _build_text_masks(
+        self, size: tuple[int, int], ocr_result: OcrResult
+    ) -> TextRegionMasks | None:
+        if not ocr_result.regions:
+            return None
+        # Rasterise all regions once; the combined mask is shared by the patch
+        # extraction and the text removal.
+        return await self.image_executor.run(TextRegionMasks, size, ocr_result.regions)
+
+    async def _extract_text_patches(
+        self, image: Image.Image, text_masks: TextRegionMasks | None
+    ) -> list[dict]:
+        if text_masks is None:
+            return []
+        return await self.image_executor.run(text_masks.extract_patches, image)
+
+    async def _remove_text(
+        self,
+        transport: IntermediateImageTransport,
+        image: Image.Image,
+        text_masks: TextRegionMasks | None,
+        image_url: str,
+    ) -> Image.Image:
+        """Returns `image` with its text removed, leaving `image` itself untouched."""
+        if text_masks is None:
+            return image
+        try:
+            logger.info("Attempting to remove text using AI inpainting.")
+            removed_text_image_bytes = await self.inpainting_backend.remove_objects(
+                transport, image, text_masks.combined_mask, image_url
+            )
+            text_free_image = await self.image_executor.run(
+                _decode_rgba, removed_text_image_bytes
+            )
+            logger.info("Successfully removed text using AI.")
+            return text_free_image
+        except Exception as e:
+            logger.error(
+                "Failed to remove text using AI, falling back to average color fill: %s",
+                e,
+                exc_info=True,
+            )
+            # Fallback: Fill the text area with the average color.
+            text_free_image = await self.image_executor.run(image.copy)
+            await self.image_executor.run(
+                self._fill_text_with_average_color, text_free_image, text_masks
+            )
+            return text_free_image
+
+    def _fill_text_with_average_color(
+        self, image: Image.Image, text_masks: TextRegionMasks
+    ):
+        text_masks.fill(image, self._get_average_color(image))
+
+    def _compose_canvas(
+        self, original_image: Image.Image, request: ExtendImageRequest
+    ) -> Image.Image:
+        # Create a new canvas with target dimensions
+        canvas = Image.new(
+            "RGBA", (request.target_width, request.target_height), (0, 0, 0, 0)
+        )
+        self._paste_original(canvas, original_image, request)
+        return canvas
+
+    def _paste_original(
+        self,
+        canvas: Image.Image,
+        original_image: Image.Image,
+        request: ExtendImageRequest,
+    ):
+        # Resize original image to the size of the bounding box
+        original_image = original_image.resize(
+            (request.original_box.width, request.original_box.height)
         )
+        # Paste the original image into the bounding box, using the image's alpha channel as a mask
+        canvas.paste(
+            original_image,
+            (request.original_box.x, request.original_box.y),
+            original_image,
+        )
+
+    def _restore_text_patches(
+        self,
+        canvas: Image.Image,
+        saved_text_patches: list[dict],
+        source_size: tuple[int, int],
+        request: ExtendImageRequest,
+    ):
+        scale_x = request.original_box.width / source_size[0]
+        scale_y = request.original_box.height / source_size[1]
+
+        for item in saved_text_patches:
+            patch_img = item["patch"]
+            original_box = item["box"]
+
+            new_width = int(patch_img.width * scale_x)
+            new_height = int(patch_img.height * scale_y)
+
+            if new_width == 0 or new_height == 0:
+                continue
+
+            resized_patch = patch_img.resize((new_width, new_height))
+
+            # Calculate final position on the canvas
+            paste_x = int(original_box[0] * scale_x) + request.original_box.x
+            paste_y = int(original_box[1] * scale_y) + request.original_box.y
+
+            canvas.paste(resized_patch, (paste_x, paste_y), resized_patch)
 
     def _get_average_color(self, image: Image.Image) -> tuple[int, int, int, int]:
         """Calculates the average color of a PIL image."""
@@ -375,18 +1197,6 @@ class ExtendImageService:
             # Fallback for unexpected formats
             return (0, 0, 0, 0)
 
-    def _get_bounding_box_for_polygon(
-        self, polygon_coords: list[float]
-    ) -> tuple[int, int, int, int]:
-        """Calculates the bounding box for a polygon given as a list of coordinates."""
-        x_coords = polygon_coords[0::2]
-        y_coords = polygon_coords[1::2]
-        min_x = int(min(x_coords))
-        min_y = int(min(y_coords))
-        max_x = int(max(x_coords))
-        max_y = int(max(y_coords))
-        return min_x, min_y, max_x, max_y
-
     def _is_target_dimension_reached(self, box, target_width, target_height):
         return (
             box[0] <= 0
@@ -398,45 +1208,10 @@ class ExtendImageService:
     def _prepare_iteration(
         self,
         current_box,
-        target_w,
-        target_h,
-        max_area,
+        expansion_box,
         current_image,
         invert_mask: bool = False,
     ):
-        step = 10
-        expansion_box = list(current_box)
-        area_at_start = (current_box[2] - current_box[0]) * (
-            current_box[3] - current_box[1]
-        )
-
-        # Greedily expand the box by `step` pixels on all sides until the new area added
-        # exceeds `max_area`.
-        while True:
-            # Calculate next potential expansion
-            next_x1 = max(0, expansion_box[0] - step)
-            next_y1 = max(0, expansion_box[1] - step)
-            next_x2 = min(target_w, expansion_box[2] + step)
-            next_y2 = min(target_h, expansion_box[3] + step)
-            next_box = [next_x1, next_y1, next_x2, next_y2]
-
-            # If the box cannot expand further, we've hit the canvas edges.
-            if next_box == expansion_box:
-                break
-
-            new_area = (next_box[2] - next_box[0]) * (next_box[3] - next_box[1])
-
-            # If this expansion is too large, we stop here.
-            # expansion_box has the last valid value.
-            if area_at_start > 0 and (new_area - area_at_start) > max_area:
-                break
-
-            expansion_box = next_box
-
-            # If we've reached the target dimensions, expansion is complete.
-            if expansion_box == [0, 0, target_w, target_h]:
-                break
-
         context_image_for_inpaint = current_image.crop(expansion_box)
 
         # Per the requirement: Black will be ignored (preserved), and White will be filled.
@@ -483,51 +1258,32 @@ class ExtendImageService:
         ):
             draw.rectangle(preserved_area, fill=preserved_area_fill_color)
 
-        return expansion_box, mask, context_image_for_inpaint
+        # 6. Paste mask that keeps the existing pixels and blends the inpainted
+        # image into them across the overlap band.
+        blend_mask = ring_blend_mask(
+            context_image_for_inpaint.size,
+            [
+                current_box[0] - expansion_box[0],
+                current_box[1] - expansion_box[1],
+                current_box[2] - expansion_box[0],
+                current_box[3] - expansion_box[1],
+            ],
+            (overlap_left, overlap_top, overlap_right, overlap_bottom),
+        )
+
+        return expansion_box, mask, context_image_for_inpaint, blend_mask
 
     def _calculate_new_bounding_box(self, current_box, expansion_box):
         return expansion_box
 
-    async def _upload_image_to_storage(self, image: Image.Image) -> CoverArtSchema:
-        buffer = BytesIO()
-        image.save(buffer, format="PNG")
-        buffer.seek(0)
-
-        object_name = await upload_temp_file_to_bucket(buffer.getvalue(), suffix=".png")
-        if not object_name:
-            raise Exception("Failed to upload image to storage")
-        url = get_user_generated_url_for_object(object_name)
-
-        # Create a temporary CoverArtSchema for the intermediate upload
-        return CoverArtSchema(
-            id=str(uuid.uuid4()),
-            book_id="",  # This is temporary and will be replaced
-            image_url=url,
-            image_width=image.width,
-            image_height=image.height,
-            created_at=datetime.datetime.now(),
-        )
-
-    async def _download_image(self, url: str) -> BytesIO:
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.get(url, timeout=60.0)
-                response.raise_for_status()
-                return BytesIO(response.content)
-            except httpx.RequestError as e:
-                logger.error(f"Error downloading image from {url}: {e}")
-                raise
-
 
 def get_extend_image_service(
-    replicate_artwork_service: ReplicateArtworkService = Depends(
-        get_replicate_artwork_service
-    ),
-    background_analyser_service: BackgroundAnalyserService = Depends(
-        get_background_analyser_service
-    ),
+    inpainting_backend: InpaintingBackend = Depends(get_inpainting_backend),
+    image_executor: ImageProcessingExecutor = Depends(get_image_executor),
+    memory_budget: MemoryBudget = Depends(get_memory_budget),
 ) -> ExtendImageService:
     return ExtendImageService(
-        replicate_artwork_service=replicate_artwork_service,
-        background_analyser_service=background_analyser_service,
+        inpainting_backend=inpainting_backend,
+        image_executor=image_executor,
+        memory_budget=memory_budget,
     )
@@ -0,0 +1,57 @@
+import logging
+
+from PIL import Image, ImageChops, ImageDraw
+
+from paperback_cover.cover_art.schema import TextRegion
+
+logger = logging.getLogger(__name__)
+
+
+def get_bounding_box_for_polygon(
+    polygon_coords: list[float],
+) -> tuple[int, int, int, int]:
+    """Calculates the bounding box for a polygon given as a list of coordinates."""
+    x_coords = polygon_coords[0::2]
+    y_coords = polygon_coords[1::2]
+    min_x = int(min(x_coords))
+    min_y = int(min(y_coords))
+    max_x = int(max(x_coords))
+    max_y = int(max(y_coords))
+    return min_x, min_y, max_x, max_y
+
+
+class TextRegionMasks:
+    """
+    Rasterises every OCR region into a single mask in one drawing pass.
+
+    The combined mask is what the text removal model receives, and per region
+    patches are cut from it using only the region's bounding box. Where two
+    regions overlap, a patch also keeps its neighbour's pixels, which are restored
+    from the same source anyway.
+    """
+
+    def __init__(self, size: tuple[int, int], regions: list[TextRegion]):
+        self.regions = regions
+        self.combined_mask = Image.new("L", size, 0)
+        draw = ImageDraw.Draw(self.combined_mask)
+        for region in regions:
+            draw.polygon(region.bounding_box, fill=255)
+        self.boxes = [
+            get_bounding_box_for_polygon(region.bounding_box) for region in regions
+        ]
+
+    def extract_patches(self, image: Image.Image) -> list[dict]:
+        """Cuts every text region out of `image`, transparent outside the text."""
+        patches = []
+        for box in self.boxes:
+            patch = image.crop(box).convert("RGBA")
+            alpha = ImageChops.multiply(
+                patch.getchannel("A"), self.combined_mask.crop(box)
+            )
+            patch.putalpha(alpha)
+            patches.append({"patch": patch, "box": box})
+        return patches
+
+    def fill(self, image: Image.Image, color: tuple[int, int, int, int]):
+        """Paints every text region of `image` with `color`, in place."""
+        image.paste(color, (0, 0, *image.size), self.combined_mask)
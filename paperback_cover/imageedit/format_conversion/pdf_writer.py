@@ -0,0 +1,265 @@
+"""
+A PDF writer for a single image, shown on one or more pages.
+
+The image is embedded once as an image XObject, and every page shows its own
+region of it, e.g. the back cover, spine and front cover of a print wrap. A JPEG
+is embedded as it is, other images are compressed with Flate band by band, so
+the pixels are never re-encoded or held twice. The PDF is written to the output
+as it is produced.
+"""
+
+import datetime
+import uuid
+import zlib
+from typing import IO
+
+from PIL import Image
+
+# Rows compressed at a time when embedding raw pixels
+BAND_ROWS = 256
+
+# PDF colour space, and the Pillow mode the pixels are written in
+_COLOR_SPACES = {
+    "L": ("DeviceGray", "L"),
+    "LA": ("DeviceGray", "L"),
+    "RGB": ("DeviceRGB", "RGB"),
+    "RGBA": ("DeviceRGB", "RGB"),
+    "CMYK": ("DeviceCMYK", "CMYK"),
+}
+
+
+def _num(value: float) -> str:
+    return f"{value:.4f}".rstrip("0").rstrip(".")
+
+
+def _has_transparency(image: Image.Image) -> bool:
+    if image.mode not in ("RGBA", "LA"):
+        return False
+    return image.getchannel("A").getextrema()[0] < 255
+
+
+class _PdfFile:
+    """Writes numbered objects, keeping the offsets for the cross-reference table."""
+
+    def __init__(self, output: IO[bytes]):
+        self.output = output
+        self.position = 0
+        self.offsets: dict[int, int] = {}
+        self.object_count = 0
+
+    def reserve(self) -> int:
+        self.object_count += 1
+        return self.object_count
+
+    def write(self, data: bytes):
+        self.output.write(data)
+        self.position += len(data)
+
+    def begin(self, number: int):
+        self.offsets[number] = self.position
+        self.write(f"{number} 0 obj\n".encode())
+
+    def end(self):
+        self.write(b"\nendobj\n")
+
+    def add(self, number: int, body: str):
+        self.begin(number)
+        self.write(body.encode())
+        self.end()
+
+    def add_stream(self, number: int, dictionary: str, chunks) -> int:
+        """
+        Writes a stream whose length is only known once written, as an indirect
+        object following it.
+        """
+        length_number = self.reserve()
+        self.begin(number)
+        self.write(f"<< {dictionary} /Length {length_number} 0 R >>\nstream\n".encode())
+        length = 0
+        for chunk in chunks:
+            if chunk:
+                self.write(chunk)
+                length += len(chunk)
+        self.write(b"\nendstream")
+        self.end()
+        self.add(length_number, str(length))
+        return length
+
+    def finish(self, root: int, info: int | None = None):
+        xref = self.position
+        lines = [f"xref\n0 {self.object_count + 1}\n", "0000000000 65535 f \n"]
+        lines += [
+            f"{self.offsets[number]:010d} 00000 n \n"
+            for number in range(1, self.object_count + 1)
+        ]
+        trailer = f"/Size {self.object_count + 1} /Root {root} 0 R"
+        if info is not None:
+            document_id = uuid.uuid4().hex
+            trailer += f" /Info {info} 0 R /ID [<{document_id}> <{document_id}>]"
+        lines.append(f"trailer\n<< {trailer} >>\nstartxref\n{xref}\n%%EOF\n")
+        self.write("".join(lines).encode())
+
+
+def _deflate_bands(image: Image.Image, mode: str, channel: str | None = None):
+    """Yields the Flate compressed pixels of `image`, a band of rows at a time."""
+    compressor = zlib.compressobj()
+    for top in range(0, image.height, BAND_ROWS):
+        band = image.crop((0, top, image.width, min(image.height, top + BAND_ROWS)))
+        band = band.getchannel(channel) if channel else band.convert(mode)
+        yield compressor.compress(band.tobytes())
+    yield compressor.flush()
+
+
+def _pdf_string(value: str) -> str:
+    escaped = value.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+    return f"({escaped.encode('ascii', 'replace').decode()})"
+
+
+def _trim_box(
+    page: tuple[int, int, int, int], size: tuple[int, int], bleed: float
+) -> tuple[float, float, float, float]:
+    """
+    The part of `page` inside the trim of the whole image, as (left, bottom,
+    right, top) in pixels from the page's bottom left corner.
+    """
+    x, y, width, height = page
+    left = max(x, bleed) - x
+    right = max(left, min(x + width, size[0] - bleed) - x)
+    top = max(y, bleed) - y
+    bottom = max(top, min(y + height, size[1] - bleed) - y)
+    return left, height - bottom, right, height - top
+
+
+def _jpeg_chunks(jpeg: bytes, chunk_bytes: int = 1024 * 1024):
+    view = memoryview(jpeg)
+    for start in range(0, len(view), chunk_bytes):
+        yield view[start : start + chunk_bytes]
+
+
+def write_image_pdf(
+    output: IO[bytes],
+    image: Image.Image,
+    dpi: int,
+    pages: list[tuple[int, int, int, int]] | None = None,
+    jpeg: bytes | None = None,
+    bleed: float = 0,
+    output_profile: bytes | None = None,
+    title: str = "",
+):
+    """
+    Writes a PDF showing `image` at `dpi` to `output`.
+
+    Args:
+        output: File the PDF is written to
+        image: The image; only its size and mode are read when `jpeg` is given
+        dpi: Resolution the page size is derived from
+        pages: Pixel boxes (x, y, width, height) of `image`, one page each. Defaults
+            to a single page showing the whole image.
+        jpeg: The encoded JPEG `image` was opened from, embedded without decoding
+            it. Must be a baseline or progressive JPEG in L, RGB or CMYK.
+        bleed: Pixels of bleed on every edge of `image`. Pages get a trim box
+            excluding them, and a bleed box.
+        output_profile: The CMYK ICC profile `image` was separated for. Makes the
+            document a print export, with this profile as its PDF/X output intent;
+            `image` must be CMYK without transparency then.
+    """
+    if pages is None:
+        pages = [(0, 0, image.width, image.height)]
+    if image.mode not in _COLOR_SPACES:
+        image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+    color_space, pixel_mode = _COLOR_SPACES[image.mode]
+    scale = 72 / dpi
+
+    pdf = _PdfFile(output)
+    catalog = pdf.reserve()
+    page_tree = pdf.reserve()
+    image_number = pdf.reserve()
+    page_numbers = [(pdf.reserve(), pdf.reserve()) for _ in pages]
+
+    # Binary comment, so transfer tools treat the file as binary.
+    pdf.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    info = None
+    if output_profile is None:
+        pdf.add(catalog, f"<< /Type /Catalog /Pages {page_tree} 0 R >>")
+    else:
+        info = pdf.reserve()
+        output_intent = pdf.reserve()
+        profile_number = pdf.reserve()
+        pdf.add(
+            catalog,
+            f"<< /Type /Catalog /Pages {page_tree} 0 R "
+            f"/OutputIntents [{output_intent} 0 R] >>",
+        )
+        now = datetime.datetime.now(datetime.timezone.utc).strftime("D:%Y%m%d%H%M%SZ")
+        pdf.add(
+            info,
+            f"<< /Title {_pdf_string(title)} /CreationDate ({now}) /ModDate ({now}) "
+            "/Trapped /False /GTS_PDFXVersion (PDF/X-3:2003) >>",
+        )
+        pdf.add(
+            output_intent,
+            "<< /Type /OutputIntent /S /GTS_PDFX /OutputConditionIdentifier (Custom) "
+            f"/DestOutputProfile {profile_number} 0 R >>",
+        )
+        pdf.add_stream(
+            profile_number,
+            "/N 4 /Filter /FlateDecode",
+            [zlib.compress(output_profile)],
+        )
+    kids = " ".join(f"{page} 0 R" for page, _ in page_numbers)
+    pdf.add(page_tree, f"<< /Type /Pages /Kids [{kids}] /Count {len(pages)} >>")
+
+    image_dictionary = (
+        f"/Type /XObject /Subtype /Image /Width {image.width} "
+        f"/Height {image.height} /ColorSpace /{color_space} /BitsPerComponent 8"
+    )
+    if jpeg is not None:
+        if image.mode == "CMYK" and "adobe" in image.info:
+            # Adobe applications store CMYK JPEGs inverted.
+            image_dictionary += " /Decode [1 0 1 0 1 0 1 0]"
+        pdf.add_stream(
+            image_number,
+            f"{image_dictionary} /Filter /DCTDecode",
+            _jpeg_chunks(jpeg),
+        )
+    else:
+        if _has_transparency(image):
+            soft_mask = pdf.reserve()
+            image_dictionary += f" /SMask {soft_mask} 0 R"
+            pdf.add_stream(
+                soft_mask,
+                f"/Type /XObject /Subtype /Image /Width {image.width} "
+                f"/Height {image.height} /ColorSpace /DeviceGray "
+                "/BitsPerComponent 8 /Filter /FlateDecode",
+                _deflate_bands(image, "L", channel="A"),
+            )
+        pdf.add_stream(
+            image_number,
+            f"{image_dictionary} /Filter /FlateDecode",
+            _deflate_bands(image, pixel_mode),
+        )
+
+    for (x, y, width, height), (page, contents) in zip(pages, page_numbers):
+        # The whole image is placed so that the page box shows this region; the
+        # rest falls outside the media box.
+        offset_x = -x * scale
+        offset_y = -(image.height - y - height) * scale
+        content = (
+            f"q {_num(image.width * scale)} 0 0 {_num(image.height * scale)} "
+            f"{_num(offset_x)} {_num(offset_y)} cm /Im0 Do Q"
+        ).encode()
+        media_box = f"[0 0 {_num(width * scale)} {_num(height * scale)}]"
+        trim_box = " ".join(
+            _num(edge * scale)
+            for edge in _trim_box((x, y, width, height), image.size, bleed)
+        )
+        pdf.add(
+            page,
+            f"<< /Type /Page /Parent {page_tree} 0 R /MediaBox {media_box} "
+            f"/BleedBox {media_box} /TrimBox [{trim_box}] "
+            f"/Resources << /XObject << /Im0 {image_number} 0 R >> >> "
+            f"/Contents {contents} 0 R >>",
+        )
+        pdf.add_stream(contents, "", [content])
+
+    pdf.finish(catalog, info)
@@ -0,0 +1,107 @@
+import logging
+import os
+from functools import lru_cache
+from io import BytesIO
+
+from fastapi import HTTPException
+from PIL import Image, ImageCms
+
+from paperback_cover.config import settings
+from paperback_cover.imageedit.format_conversion.schema import PrintExport
+
+logger = logging.getLogger(__name__)
+
+
+def get_missing_profiles() -> list[str]:
+    """Names of the configured print profiles whose file is not installed."""
+    profiles = settings.imageedit.format_conversion.print.profiles
+    return [name for name, path in profiles.items() if not os.path.isfile(path)]
+
+
+def warn_missing_profiles():
+    """Logs the print profiles that are configured but not installed, on startup."""
+    missing = get_missing_profiles()
+    if missing:
+        logger.warning(
+            f"Print profiles not installed: {', '.join(missing)}. Print exports "
+            f"using them are rejected until their ICC files are in place."
+        )
+
+
+@lru_cache(maxsize=None)
+def _load_output_profile(name: str) -> tuple[ImageCms.ImageCmsProfile, bytes]:
+    """The CMYK profile configured as `name`, and its bytes for embedding."""
+    profiles = settings.imageedit.format_conversion.print.profiles
+    if name not in profiles:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown print profile {name}. Available: {', '.join(profiles)}.",
+        )
+    if not os.path.isfile(profiles[name]):
+        # The profiles are licensed separately, a server may not have them.
+        raise HTTPException(
+            status_code=501,
+            detail=f"Print export with profile {name} is not configured on this server.",
+        )
+    try:
+        with open(profiles[name], "rb") as profile_file:
+            data = profile_file.read()
+        profile = ImageCms.ImageCmsProfile(BytesIO(data))
+    except (OSError, ImageCms.PyCMSError) as e:
+        logger.error(f"Failed to load print profile {name}: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=500, detail=f"Print profile {name} is not available."
+        )
+    return profile, data
+
+
+@lru_cache(maxsize=settings.imageedit.format_conversion.print.transform_cache_size)
+def _get_transform(
+    input_profile: bytes | None,
+    output_profile_name: str,
+    intent: ImageCms.Intent,
+) -> ImageCms.ImageCmsTransform:
+    """
+    Compiles the transform from `input_profile`, or sRGB, to the named CMYK
+    profile. Compiling takes far longer than applying it to a cover, so transforms
+    are kept per process and shared by all requests.
+    """
+    logger.info(f"Building print transform to {output_profile_name}")
+    source = (
+        ImageCms.ImageCmsProfile(BytesIO(input_profile))
+        if input_profile is not None
+        else ImageCms.createProfile("sRGB")
+    )
+    output_profile, _ = _load_output_profile(output_profile_name)
+    return ImageCms.buildTransform(source, output_profile, "RGB", "CMYK", intent)
+
+
+def prepare_for_print(
+    image: Image.Image, print_export: PrintExport
+) -> tuple[Image.Image, bytes]:
+    """
+    Converts `image` to CMYK through the requested profile, flattening any
+    transparency onto white first, as print has none. Returns the CMYK image and
+    the profile to embed. A CMYK image is taken as already separated for print
+    and kept as it is.
+    """
+    profile_name = (
+        print_export.profile
+        or settings.imageedit.format_conversion.print.default_profile
+    )
+    _, profile_data = _load_output_profile(profile_name)
+    if image.mode == "CMYK":
+        return image, image.info.get("icc_profile") or profile_data
+
+    input_profile = image.info.get("icc_profile") or None
+    if image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info:
+        rgba = image.convert("RGBA")
+        image = Image.new("RGB", rgba.size, (255, 255, 255))
+        image.paste(rgba, mask=rgba.getchannel("A"))
+    elif image.mode != "RGB":
+        image = image.convert("RGB")
+
+    transform = _get_transform(
+        input_profile, profile_name, ImageCms.Intent[print_export.intent.name]
+    )
+    return ImageCms.applyTransform(image, transform), profile_data
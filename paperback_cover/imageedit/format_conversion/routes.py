@@ -1,11 +1,15 @@
 import logging
 
-from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile
+from fastapi import APIRouter, Depends, File, Form, UploadFile
 from fastapi.responses import StreamingResponse
 
 from paperback_cover.auth.service import verify_active_user
 from paperback_cover.commons.annotations import timing
-from paperback_cover.imageedit.format_conversion.schema import ConversionRequest
+from paperback_cover.commons.streaming import file_response
+from paperback_cover.imageedit.format_conversion.schema import (
+    BulkConversionRequest,
+    ConversionRequest,
+)
 from paperback_cover.imageedit.format_conversion.service import (
     ImageFormatConversionService,
     get_image_format_conversion_service,
@@ -38,27 +42,71 @@ async def convert_image_format_api(
         - output_format: Target format (JPEG, PNG, PDF)
         - dpi: DPI for output (72-600, default: 300)
         - quality: JPEG quality 1-100 (default: 95, only for JPEG)
+        - pages: Regions of the image, each shown on its own PDF page, as a list
+          of {"x", "y", "width", "height"} in pixels, e.g. the back cover, spine
+          and front cover of a wrap (only for PDF, default: one page with the
+          whole image). The image is embedded once and shared by all pages.
+        - print_export: Export for print in CMYK (only for JPEG and PDF), with
+            - profile: Name of the configured CMYK ICC profile, e.g.
+              "us_web_coated_swop" or "coated_fogra39" (default: the configured
+              default profile)
+            - intent: Rendering intent, "perceptual", "relative_colorimetric"
+              (default), "saturation" or "absolute_colorimetric"
+            - bleed: Bleed included on every edge of the image, in inches
+              (0-1, default: 0.125)
+          The image is converted to CMYK through the profile, with transparency
+          flattened onto white; CMYK uploads are kept as they are. JPEGs embed
+          the profile. PDFs carry it as their PDF/X output intent, and every page
+          gets a trim box excluding the bleed and a bleed box.
     - **file**: The image file to convert
 
     Examples:
     - For ebook: {"book_id": "123", "output_format": "JPEG", "dpi": 300, "quality": 95}
     - For print: {"book_id": "123", "output_format": "PDF", "dpi": 300, "quality": 100}
     - For web: {"book_id": "123", "output_format": "PNG", "dpi": 72}
+    - For a wrap split into pages: {"output_format": "PDF", "pages": [{"x": 0,
+      "y": 0, "width": 1838, "height": 2775}, {"x": 1838, "y": 0, "width": 124,
+      "height": 2775}, {"x": 1962, "y": 0, "width": 1838, "height": 2775}]}
+    - For a KDP print PDF: {"output_format": "PDF", "dpi": 300, "print_export":
+      {"profile": "us_web_coated_swop", "bleed": 0.125}}
     """
     conversion_request = ConversionRequest.parse_raw(data)
-    result = await format_conversion_service.convert_image(
+    output_file, filename, media_type = await format_conversion_service.convert_image(
         file=file,
         conversion_request=conversion_request,
         user=user,
     )
-    if result is None:
-        raise HTTPException(
-            status_code=400,
-            detail="Failed to convert image. Please check the file and parameters.",
-        )
-
-    file_buffer, filename, media_type = result
     headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
-    return StreamingResponse(
-        content=file_buffer, media_type=media_type, headers=headers
+    return file_response(output_file, media_type=media_type, headers=headers)
+
+
+@router.post("/convert/bulk")
+@timing
+async def convert_image_formats_api(
+    data: str = Form(
+        ..., description="JSON string with the list of conversion parameters"
+    ),
+    file: UploadFile = File(...),
+    user: User = Depends(verify_active_user),
+    format_conversion_service: ImageFormatConversionService = Depends(
+        get_image_format_conversion_service
+    ),
+) -> StreamingResponse:
+    """
+    Convert an image file to several formats in one call, returned as a ZIP file.
+
+    - **data**: JSON string of the form `{"conversions": [...]}`, each conversion
+      taking the same parameters as the `data` field of the convert endpoint
+    - **file**: The image file to convert
+
+    Example, for ebook, web and print at once:
+    {"conversions": [{"output_format": "JPEG", "dpi": 300}, {"output_format": "PNG", "dpi": 72}, {"output_format": "PDF", "dpi": 300}]}
+    """
+    bulk_request = BulkConversionRequest.parse_raw(data)
+    output_file, filename, media_type = await format_conversion_service.convert_images(
+        file=file,
+        conversion_requests=bulk_request.conversions,
+        user=user,
     )
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    return file_response(output_file, media_type=media_type, headers=headers)
@@ -11,6 +11,40 @@ class OutputFormat(str, Enum):
     PDF = "PDF"
 
 
+class PdfPage(BaseModel):
+    """Region of the image shown on one PDF page, in pixels"""
+
+    x: int = Field(ge=0)
+    y: int = Field(ge=0)
+    width: int = Field(gt=0)
+    height: int = Field(gt=0)
+
+
+class RenderingIntent(str, Enum):
+    """How colours outside the print gamut are mapped into it"""
+
+    PERCEPTUAL = "perceptual"
+    RELATIVE_COLORIMETRIC = "relative_colorimetric"
+    SATURATION = "saturation"
+    ABSOLUTE_COLORIMETRIC = "absolute_colorimetric"
+
+
+class PrintExport(BaseModel):
+    """Print export: CMYK through an ICC profile, with trim and bleed boxes in PDFs"""
+
+    profile: str | None = Field(
+        default=None,
+        description="Name of the CMYK ICC profile (default: the configured default profile)",
+    )
+    intent: RenderingIntent = RenderingIntent.RELATIVE_COLORIMETRIC
+    bleed: float = Field(
+        default=0.125,
+        ge=0,
+        le=1,
+        description="Bleed included on every edge of the image, in inches (default: 0.125, as KDP expects)",
+    )
+
+
 class ConversionRequest(BaseModel):
     """Generic request schema for image format conversion"""
 
@@ -24,6 +58,20 @@ class ConversionRequest(BaseModel):
         le=100,
         description="JPEG quality (1-100, only for JPEG format)",
     )
+    pages: list[PdfPage] | None = Field(
+        default=None,
+        description="Pages of the PDF, e.g. back cover, spine and front cover of a wrap (only for PDF format, default: one page with the whole image)",
+    )
+    print_export: PrintExport | None = Field(
+        default=None,
+        description="Export for print in CMYK (only for JPEG and PDF formats)",
+    )
+
+
+class BulkConversionRequest(BaseModel):
+    """Request schema for converting one image to several formats"""
+
+    conversions: list[ConversionRequest]
 
 
 class FormatConversionResponse(BaseModel):
@@ -1,33 +1,139 @@
+import asyncio
 import logging
-from io import BytesIO
-from typing import Optional, Tuple
+import os
+import shutil
+import zipfile
+from typing import IO, Tuple
 
-from fastapi import UploadFile
-from PIL import Image, UnidentifiedImageError
-from reportlab.lib.utils import ImageReader
-from reportlab.pdfgen import canvas
+from fastapi import Depends, HTTPException, UploadFile
+from PIL import Image
 
+from paperback_cover.commons.executor import (
+    ImageProcessingExecutor,
+    get_image_executor,
+)
+from paperback_cover.commons.file_validator import ValidatedImage, validate_image_file
+from paperback_cover.commons.streaming import spooled_output
+from paperback_cover.config import settings
+from paperback_cover.imageedit.format_conversion.pdf_writer import write_image_pdf
+from paperback_cover.imageedit.format_conversion.print_export import (
+    prepare_for_print,
+)
 from paperback_cover.imageedit.format_conversion.schema import (
     ConversionRequest,
     OutputFormat,
 )
 from paperback_cover.models.user import User
+from paperback_cover.storage_service.service import S3ContentType
 
 logger = logging.getLogger(__name__)
 
 
+def _encode_image(
+    image: Image.Image,
+    conversion_request: ConversionRequest,
+    output: IO[bytes],
+    icc_profile: bytes | None = None,
+) -> None:
+    # Convert to appropriate mode for output format; print exports are separated
+    # into CMYK already and keep it.
+    if (
+        conversion_request.output_format == OutputFormat.JPEG
+        and image.mode != "RGB"
+        and icc_profile is None
+    ):
+        image = image.convert("RGB")
+    elif conversion_request.output_format == OutputFormat.PNG and image.mode not in [
+        "RGB",
+        "RGBA",
+    ]:
+        image = image.convert("RGBA")
+
+    # Save the image with specified parameters
+    save_kwargs = {
+        "format": conversion_request.output_format.value,
+        "dpi": (conversion_request.dpi, conversion_request.dpi),
+        "optimize": True,
+    }
+
+    # Add quality parameter only for JPEG
+    if conversion_request.output_format == OutputFormat.JPEG:
+        save_kwargs["quality"] = conversion_request.quality
+    if icc_profile is not None:
+        save_kwargs["icc_profile"] = icc_profile
+
+    image.save(output, **save_kwargs)
+    output.seek(0)
+
+
+def _render_pdf(
+    image: Image.Image,
+    conversion_request: ConversionRequest,
+    jpeg: bytes | None,
+    output_profile: bytes | None,
+    title: str,
+    output: IO[bytes],
+) -> None:
+    pages = None
+    if conversion_request.pages:
+        pages = [
+            (page.x, page.y, page.width, page.height)
+            for page in conversion_request.pages
+        ]
+    bleed = 0.0
+    if conversion_request.print_export is not None:
+        bleed = conversion_request.print_export.bleed * conversion_request.dpi
+    write_image_pdf(
+        output,
+        image,
+        conversion_request.dpi,
+        pages=pages,
+        jpeg=jpeg,
+        bleed=bleed,
+        output_profile=output_profile,
+        title=title,
+    )
+    output.seek(0)
+
+
+def _get_embeddable_jpeg(upload: ValidatedImage, image: Image.Image) -> bytes | None:
+    """The upload itself, when the PDF can embed it without decoding it."""
+    if upload.mime == "image/jpeg" and image.mode in ("L", "RGB", "CMYK"):
+        return upload.content
+    return None
+
+
+def _decode_image(data: IO[bytes]) -> Image.Image:
+    image = Image.open(data)
+    image.load()
+    return image
+
+
+def _write_zip(entries: list[Tuple[IO[bytes], str]], archive: IO[bytes]) -> None:
+    # The outputs are compressed already, so they are stored as they are.
+    with zipfile.ZipFile(archive, "w", zipfile.ZIP_STORED) as zip_file:
+        for output, name in entries:
+            with output, zip_file.open(name, "w") as entry:
+                shutil.copyfileobj(output, entry)
+    archive.seek(0)
+
+
+def _get_filename_stem(file: UploadFile) -> str:
+    return os.path.splitext(file.filename or "image")[0] or "image"
+
+
 class ImageFormatConversionService:
     """Service for converting images to different formats and specifications"""
 
-    def __init__(self):
-        pass
+    def __init__(self, image_executor: ImageProcessingExecutor):
+        self.image_executor = image_executor
 
     async def convert_image(
         self,
         file: UploadFile,
         conversion_request: ConversionRequest,
         user: User,
-    ) -> Optional[Tuple[BytesIO, str, str]]:
+    ) -> Tuple[IO[bytes], str, str]:
         """
         Convert an image to the specified format with given parameters.
 
@@ -37,68 +143,136 @@ class ImageFormatConversionService:
             user: The authenticated user
 
         Returns:
-            A tuple containing the file buffer, filename, and media type, or None on failure.
+            A tuple containing the output file, filename, and media type.
+            The output file is positioned at its start; the caller closes it.
         """
 
-        # Read the uploaded file
-        file_content = await file.read()
-        try:
-            image = Image.open(BytesIO(file_content))
-        except UnidentifiedImageError:
-            return None
+        # Validate and read the uploaded file; only its header is parsed here
+        upload = await validate_image_file(file)
+        image = Image.open(upload.open())
+
+        stem = _get_filename_stem(file)
+        buffer, extension, media_type = await self._convert(
+            image, conversion_request, stem, _get_embeddable_jpeg(upload, image)
+        )
+        new_filename = f"{stem}{extension}"
+
+        return buffer, new_filename, media_type
 
-        original_filename = file.filename or "image"
-        filename_no_ext, _ = original_filename.rsplit(".", 1)
+    async def convert_images(
+        self,
+        file: UploadFile,
+        conversion_requests: list[ConversionRequest],
+        user: User,
+    ) -> Tuple[IO[bytes], str, str]:
+        """
+        Convert an image to several formats at once, e.g. JPEG for ebooks, PNG for
+        the web and PDF for print. The image is decoded once and the outputs are
+        encoded in parallel.
+
+        Returns:
+            A tuple containing a ZIP file of the outputs, its filename, and media type.
+            The ZIP file is positioned at its start; the caller closes it.
+        """
+        max_outputs = settings.imageedit.format_conversion.bulk.max_outputs
+        if not conversion_requests or len(conversion_requests) > max_outputs:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Provide between 1 and {max_outputs} conversions.",
+            )
+
+        upload = await validate_image_file(file)
+        image = await self.image_executor.run(_decode_image, upload.open())
+        jpeg = _get_embeddable_jpeg(upload, image)
+        stem = _get_filename_stem(file)
+
+        # `save` keeps per call state on the Image, so JPEG and PNG encodes running
+        # alongside the first one get a copy. PDFs only read the pixels and share it.
+        images = []
+        encoding_shared = False
+        for conversion_request in conversion_requests:
+            if conversion_request.output_format == OutputFormat.PDF:
+                images.append(image)
+            elif not encoding_shared:
+                images.append(image)
+                encoding_shared = True
+            else:
+                images.append(await self.image_executor.run(image.copy))
+
+        outputs = await asyncio.gather(
+            *(
+                self._convert(converted_image, conversion_request, stem, jpeg)
+                for converted_image, conversion_request in zip(
+                    images, conversion_requests
+                )
+            )
+        )
+        del images
+        del image
+
+        entries = []
+        for output, extension, _ in outputs:
+            name = f"{stem}{extension}"
+            if any(entry_name == name for _, entry_name in entries):
+                name = f"{stem}-{len(entries) + 1}{extension}"
+            entries.append((output, name))
+
+        archive = spooled_output()
+        await self.image_executor.run(_write_zip, entries, archive)
+        return archive, f"{stem}.zip", S3ContentType.APPLICATION_ZIP.value
+
+    async def _convert(
+        self,
+        image: Image.Image,
+        conversion_request: ConversionRequest,
+        title: str,
+        jpeg: bytes | None = None,
+    ) -> Tuple[IO[bytes], str, str]:
+        """
+        Convert based on output format, returning the file, extension and media type.
+        `jpeg` is the upload `image` was opened from, if a PDF may embed it as is.
+        """
+        icc_profile = None
+        if conversion_request.print_export is not None:
+            if conversion_request.output_format == OutputFormat.PNG:
+                raise HTTPException(
+                    status_code=400,
+                    detail="Print export is only available for JPEG and PDF.",
+                )
+            print_image, icc_profile = await self.image_executor.run(
+                prepare_for_print, image, conversion_request.print_export
+            )
+            if print_image is not image:
+                # The upload was separated here, it cannot be embedded as it is.
+                image, jpeg = print_image, None
 
-        # Convert based on output format
         if conversion_request.output_format == OutputFormat.PDF:
-            buffer, extension = await self._convert_to_pdf(image, conversion_request)
+            buffer, extension = await self._convert_to_pdf(
+                image, conversion_request, title, jpeg, icc_profile
+            )
             media_type = "application/pdf"
         else:
-            buffer, extension = await self._convert_to_image(image, conversion_request)
+            buffer, extension = await self._convert_to_image(
+                image, conversion_request, icc_profile
+            )
             media_type = (
                 "image/jpeg"
                 if conversion_request.output_format == OutputFormat.JPEG
                 else "image/png"
             )
-
-        new_filename = f"{filename_no_ext}{extension}"
-
-        return buffer, new_filename, media_type
+        return buffer, extension, media_type
 
     async def _convert_to_image(
         self,
         image: Image.Image,
         conversion_request: ConversionRequest,
-    ) -> Tuple[BytesIO, str]:
+        icc_profile: bytes | None = None,
+    ) -> Tuple[IO[bytes], str]:
         """Convert image to JPEG or PNG format"""
-
-        # Convert to appropriate mode for output format
-        if (
-            conversion_request.output_format == OutputFormat.JPEG
-            and image.mode != "RGB"
-        ):
-            image = image.convert("RGB")
-        elif (
-            conversion_request.output_format == OutputFormat.PNG
-            and image.mode not in ["RGB", "RGBA"]
-        ):
-            image = image.convert("RGBA")
-
-        # Save the image with specified parameters
-        output_buffer = BytesIO()
-        save_kwargs = {
-            "format": conversion_request.output_format.value,
-            "dpi": (conversion_request.dpi, conversion_request.dpi),
-            "optimize": True,
-        }
-
-        # Add quality parameter only for JPEG
-        if conversion_request.output_format == OutputFormat.JPEG:
-            save_kwargs["quality"] = conversion_request.quality
-
-        image.save(output_buffer, **save_kwargs)
-        output_buffer.seek(0)
+        output_buffer = spooled_output()
+        await self.image_executor.run(
+            _encode_image, image, conversion_request, output_buffer, icc_profile
+        )
 
         file_extension = (
             ".jpg" if conversion_request.output_format == OutputFormat.JPEG else ".png"
@@ -110,43 +284,34 @@ class ImageFormatConversionService:
         self,
         image: Image.Image,
         conversion_request: ConversionRequest,
-    ) -> Tuple[BytesIO, str]:
-        """Convert image to PDF format"""
-
-        # Convert to RGB if necessary
-        if image.mode not in ["RGB", "RGBA"]:
-            image = image.convert("RGB")
-
-        # Get image dimensions
-        img_width, img_height = image.size
-
-        # Create PDF buffer
-        pdf_buffer = BytesIO()
-
-        # Create PDF with exact image dimensions (in points)
-        # Convert pixels to points (1 inch = 72 points)
-        pdf_width = (img_width / conversion_request.dpi) * 72
-        pdf_height = (img_height / conversion_request.dpi) * 72
-
-        # Create canvas with custom page size
-        c = canvas.Canvas(pdf_buffer, pagesize=(pdf_width, pdf_height))
-
-        # Draw image on PDF (full page, no margins)
-        c.drawImage(
-            ImageReader(image),
-            0,
-            0,
-            width=pdf_width,
-            height=pdf_height,
-            preserveAspectRatio=True,
-            mask="auto",
+        title: str,
+        jpeg: bytes | None = None,
+        output_profile: bytes | None = None,
+    ) -> Tuple[IO[bytes], str]:
+        """Convert image to PDF format, for print with an `output_profile`"""
+        for page in conversion_request.pages or []:
+            if page.x + page.width > image.width or page.y + page.height > image.height:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Page {page.model_dump()} is outside the {image.width}x{image.height} image.",
+                )
+
+        # The image is embedded as an encoded stream, either the JPEG as it is or
+        # compressed with zlib, which release the GIL, so a thread suffices.
+        pdf_buffer = spooled_output()
+        await self.image_executor.run(
+            _render_pdf,
+            image,
+            conversion_request,
+            jpeg,
+            output_profile,
+            title,
+            pdf_buffer,
         )
-
-        c.save()
-        pdf_buffer.seek(0)
-
         return pdf_buffer, ".pdf"
 
 
-def get_image_format_conversion_service() -> ImageFormatConversionService:
-    return ImageFormatConversionService()
+def get_image_format_conversion_service(
+    image_executor: ImageProcessingExecutor = Depends(get_image_executor),
+) -> ImageFormatConversionService:
+    return ImageFormatConversionService(image_executor=image_executor)
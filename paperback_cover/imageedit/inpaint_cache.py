@@ -0,0 +1,190 @@
+import asyncio
+import datetime
+import hashlib
+import logging
+from io import BytesIO
+
+from PIL import Image
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import IntegrityError
+
+from paperback_cover.commons.db import get_async_session
+from paperback_cover.commons.executor import ImageProcessingExecutor, image_executor
+from paperback_cover.config import settings
+from paperback_cover.models.inpaint_cache import InpaintCacheEntry
+from paperback_cover.storage_service.service import (
+    delete_blobs_from_bucket,
+    download_blob_from_bucket,
+    upload_blob_to_bucket,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _hash_inputs(model: str, prompt: str, images: tuple[Image.Image, ...]) -> str:
+    digest = hashlib.sha256()
+    for part in (model, prompt):
+        digest.update(part.encode())
+        digest.update(b"\0")
+    for image in images:
+        digest.update(f"{image.mode}:{image.width}x{image.height}\0".encode())
+        digest.update(image.tobytes())
+    return digest.hexdigest()
+
+
+class InpaintCache:
+    """
+    Content addressed store of model outputs.
+
+    Keys hash the exact pixels sent to the model (the context crop, so the box is
+    part of it, and the mask) together with the model and prompt. Outputs are kept
+    in the bucket under `cache/inpaint` and indexed in Postgres, where
+    `last_used_at` drives expiry of entries unused for `ttl_seconds` and trimming
+    down to the `max_entries` most recently used.
+    """
+
+    def __init__(
+        self,
+        image_executor: ImageProcessingExecutor,
+        enabled: bool,
+        ttl_seconds: int,
+        max_entries: int,
+    ):
+        self.image_executor = image_executor
+        self.enabled = enabled
+        self.ttl = datetime.timedelta(seconds=ttl_seconds)
+        self.max_entries = max_entries
+
+    async def key(self, model: str, prompt: str, *images: Image.Image) -> str:
+        return await self.image_executor.run(_hash_inputs, model, prompt, images)
+
+    async def get(self, key: str) -> BytesIO | None:
+        if not self.enabled:
+            return None
+
+        now = datetime.datetime.now()
+        async with get_async_session() as session:
+            entry = await session.get(InpaintCacheEntry, key)
+        if entry is None or entry.last_used_at < now - self.ttl:
+            return None
+
+        data = await download_blob_from_bucket(entry.path)
+        if data is None:
+            logger.warning(f"Inpaint cache entry {key} lost its object, dropping it")
+            await self._delete_entries([key])
+            return None
+
+        async with get_async_session() as session:
+            async with session.begin():
+                await session.execute(
+                    update(InpaintCacheEntry)
+                    .where(InpaintCacheEntry.key == key)
+                    .values(last_used_at=now, hits=InpaintCacheEntry.hits + 1)
+                )
+        logger.info(f"Inpaint cache hit {key[:12]} ({entry.operation})")
+        return BytesIO(data)
+
+    async def put(self, key: str, operation: str, data: bytes):
+        """Stores a result. Failures are logged, a cache must not fail the caller."""
+        if not self.enabled:
+            return
+
+        path = f"cache/inpaint/{key[:2]}/{key}"
+        try:
+            if not await upload_blob_to_bucket(data, path, {}):
+                raise Exception(f"Failed to upload {path}")
+            async with get_async_session() as session:
+                session.add(
+                    InpaintCacheEntry(
+                        key=key,
+                        operation=operation,
+                        path=path,
+                        size_bytes=len(data),
+                        last_used_at=datetime.datetime.now(),
+                    )
+                )
+                await session.commit()
+        except IntegrityError:
+            # Computed concurrently by another request; both wrote the same object.
+            pass
+        except Exception as e:
+            logger.error(f"Failed to cache inpainting result {key[:12]}: {e}")
+
+    async def evict(self) -> int:
+        """Removes expired entries and trims the index to `max_entries`."""
+        expired_before = datetime.datetime.now() - self.ttl
+        async with get_async_session() as session:
+            result = await session.execute(
+                select(InpaintCacheEntry.key).where(
+                    InpaintCacheEntry.last_used_at < expired_before
+                )
+            )
+            keys = set(result.scalars().all())
+            result = await session.execute(
+                select(InpaintCacheEntry.key)
+                .order_by(InpaintCacheEntry.last_used_at.desc())
+                .offset(self.max_entries)
+            )
+            keys.update(result.scalars().all())
+
+        await self._delete_entries(list(keys))
+        logger.info(f"Evicted {len(keys)} inpaint cache entries")
+        return len(keys)
+
+    async def _delete_entries(self, keys: list[str]):
+        if not keys:
+            return
+        async with get_async_session() as session:
+            async with session.begin():
+                result = await session.execute(
+                    delete(InpaintCacheEntry)
+                    .where(InpaintCacheEntry.key.in_(keys))
+                    .returning(InpaintCacheEntry.path)
+                )
+                paths = result.scalars().all()
+        await delete_blobs_from_bucket(list(paths))
+
+
+class InpaintCacheEvictor:
+    """Runs `InpaintCache.evict` every `interval_seconds`, so the limits hold."""
+
+    def __init__(self, cache: InpaintCache, interval_seconds: float):
+        self.cache = cache
+        self.interval_seconds = interval_seconds
+        self._task: asyncio.Task | None = None
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.cache.evict()
+            except Exception as e:
+                logger.error(f"Inpaint cache eviction failed: {e}", exc_info=True)
+            await asyncio.sleep(self.interval_seconds)
+
+
+inpaint_cache = InpaintCache(
+    image_executor=image_executor,
+    enabled=settings.imageedit.inpaint_cache.enabled,
+    ttl_seconds=settings.imageedit.inpaint_cache.ttl_seconds,
+    max_entries=settings.imageedit.inpaint_cache.max_entries,
+)
+
+
+inpaint_cache_evictor = InpaintCacheEvictor(
+    inpaint_cache,
+    interval_seconds=settings.imageedit.inpaint_cache.evict_interval_seconds,
+)
+
+
+def get_inpaint_cache() -> InpaintCache:
+    return inpaint_cache
@@ -0,0 +1,414 @@
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from io import BytesIO
+
+import numpy as np
+from fastapi import Depends
+from PIL import Image
+
+from paperback_cover.commons.executor import (
+    ImageProcessingExecutor,
+    get_image_executor,
+)
+from paperback_cover.commons.http_client import DownloadClient, get_download_client
+from paperback_cover.commons.image_encoding import EncodingProfile, encode_image
+from paperback_cover.config import settings
+from paperback_cover.cover_art.replicate_artwork_service import (
+    CLARITY_UPSCALER_MODEL,
+    IDEOGRAM_INPAINT_MODEL,
+    REMOVE_OBJECT_MODEL,
+    ReplicateArtworkService,
+    get_replicate_artwork_service,
+)
+from paperback_cover.cover_art.schema import OcrResult
+from paperback_cover.imageedit.inpaint_cache import InpaintCache, get_inpaint_cache
+from paperback_cover.openai.background_analyser_service import (
+    BackgroundAnalyserService,
+    get_background_analyser_service,
+)
+from paperback_cover.storage_service.intermediate import IntermediateImageTransport
+
+logger = logging.getLogger(__name__)
+
+
+class InpaintingBackend(ABC):
+    """
+    The model calls behind an image extension.
+
+    Images are handed over through the request's `IntermediateImageTransport`, and
+    image results come back encoded, the way a provider returns them. The model
+    names identify the results in the inpaint cache.
+    """
+
+    inpaint_model: str
+    remove_objects_model: str
+    upscale_model: str
+
+    @abstractmethod
+    async def publish(
+        self,
+        transport: IntermediateImageTransport,
+        image: Image.Image,
+        profile: EncodingProfile = EncodingProfile.INTERMEDIATE,
+    ) -> str:
+        """Returns a URL the backend's models can read `image` from."""
+
+    @abstractmethod
+    async def analyse_background(self, image_url: str) -> str | None:
+        """Returns a prompt describing the background, or None if that failed."""
+
+    @abstractmethod
+    async def detect_text(self, image_url: str) -> OcrResult:
+        """Returns the text regions found in the image at `image_url`."""
+
+    @abstractmethod
+    async def inpaint(
+        self,
+        transport: IntermediateImageTransport,
+        image: Image.Image,
+        mask: Image.Image,
+        prompt: str,
+    ) -> BytesIO:
+        """Regenerates the areas of `image` selected by `mask`, following `prompt`."""
+
+    @abstractmethod
+    async def remove_objects(
+        self,
+        transport: IntermediateImageTransport,
+        image: Image.Image,
+        mask: Image.Image,
+        image_url: str,
+    ) -> BytesIO:
+        """Removes the white areas of `mask` from `image`, published at `image_url`."""
+
+    @abstractmethod
+    async def upscale(
+        self,
+        transport: IntermediateImageTransport,
+        image: Image.Image,
+        resemblance: float,
+    ) -> BytesIO:
+        """Upscales `image`, staying closer to it the higher `resemblance` is."""
+
+
+class ReplicateInpaintingBackend(InpaintingBackend):
+    """Hosted models on Replicate, and the background analyser."""
+
+    inpaint_model = IDEOGRAM_INPAINT_MODEL
+    remove_objects_model = REMOVE_OBJECT_MODEL
+    upscale_model = CLARITY_UPSCALER_MODEL
+
+    def __init__(
+        self,
+        replicate_artwork_service: ReplicateArtworkService,
+        background_analyser_service: BackgroundAnalyserService,
+        download_client: DownloadClient,
+    ):
+        self.replicate_artwork_service = replicate_artwork_service
+        self.background_analyser_service = background_analyser_service
+        self.download_client = download_client
+
+    async def publish(
+        self,
+        transport: IntermediateImageTransport,
+        image: Image.Image,
+        profile: EncodingProfile = EncodingProfile.INTERMEDIATE,
+    ) -> str:
+        return await transport.publish(image, profile)
+
+    async def analyse_background(self, image_url: str) -> str | None:
+        result = await self.background_analyser_service.anlayse_background(image_url)
+        return result.background_prompt if result is not None else None
+
+    async def detect_text(self, image_url: str) -> OcrResult:
+        return await self.replicate_artwork_service.detect_text_with_region(
+            image_url=image_url
+        )
+
+    async def inpaint(
+        self,
+        transport: IntermediateImageTransport,
+        image: Image.Image,
+        mask: Image.Image,
+        prompt: str,
+    ) -> BytesIO:
+        mask_url = await transport.publish(mask, EncodingProfile.MASK)
+        image_url = await transport.publish(image)
+
+        logger.info("Invoking inpainting service...")
+        inpainted_image_url = (
+            await self.replicate_artwork_service.inpaint_image_using_ideogram(
+                image_url=image_url,
+                mask_url=mask_url,
+                model=self.inpaint_model,
+                prompt=prompt,
+            )
+        )
+        return await self.download_client.download(inpainted_image_url)
+
+    async def remove_objects(
+        self,
+        transport: IntermediateImageTransport,
+        image: Image.Image,
+        mask: Image.Image,
+        image_url: str,
+    ) -> BytesIO:
+        mask_url = await transport.publish(mask, EncodingProfile.MASK)
+        removed_image_url = (
+            await self.replicate_artwork_service.remove_object_using_mask(
+                input_image_url=image_url,
+                mask_image_url=mask_url,
+            )
+        )
+        return await self.download_client.download(removed_image_url)
+
+    async def upscale(
+        self,
+        transport: IntermediateImageTransport,
+        image: Image.Image,
+        resemblance: float,
+    ) -> BytesIO:
+        image_url = await transport.publish(image)
+        logger.info("Invoking upscaling service...")
+        upscaled_image_url = (
+            await self.replicate_artwork_service.upscale_image_with_creativity_control(
+                input_image_url=image_url, resemblance=resemblance
+            )
+        )
+        return await self.download_client.download(upscaled_image_url)
+
+
+def _fill_rows(pixels: np.ndarray, valid: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Replaces invalid pixels with the nearest valid pixel of the same row. Rows
+    without any valid pixel are left as they are.
+    """
+    height, width = valid.shape
+    columns = np.arange(width)
+    left = np.maximum.accumulate(np.where(valid, columns, -1), axis=1)
+    right = np.minimum.accumulate(np.where(valid, columns, width)[:, ::-1], axis=1)[
+        :, ::-1
+    ]
+    use_left = (left >= 0) & ((right >= width) | (columns - left <= right - columns))
+    source = np.where(use_left, left, right)
+
+    has_valid = valid.any(axis=1)[:, None]
+    source = np.where(has_valid, source, columns)
+    filled = pixels[np.arange(height)[:, None], source]
+    return filled, valid | has_valid
+
+
+def _edge_fill(image: Image.Image, mask: Image.Image | None = None) -> Image.Image:
+    """
+    Fills the transparent pixels of `image`, and the white pixels of `mask`, by
+    replicating the nearest remaining pixel along rows, then along columns.
+    """
+    rgba = np.asarray(image.convert("RGBA"))
+    valid = rgba[..., 3] > 0
+    if mask is not None:
+        valid &= np.asarray(mask.convert("L")) < 128
+    if not valid.any():
+        return Image.new("RGB", image.size, (128, 128, 128))
+
+    pixels, valid = _fill_rows(rgba[..., :3], valid)
+    pixels, _ = _fill_rows(pixels.transpose(1, 0, 2), valid.T)
+    return Image.fromarray(np.ascontiguousarray(pixels.transpose(1, 0, 2)))
+
+
+class LocalInpaintingBackend(InpaintingBackend):
+    """
+    Deterministic stand-in for the hosted models, for load testing offline.
+
+    Inpainting and object removal replicate the edge pixels into the gaps, and
+    upscaling resizes by the same factor as the hosted upscaler. Every call waits
+    `latency_seconds` first, like a provider round-trip would, and nothing is
+    published, so no request leaves the machine.
+    """
+
+    inpaint_model = "local-edge-fill"
+    remove_objects_model = "local-edge-fill"
+    upscale_model = "local-resize"
+
+    UPSCALE_FACTOR = 2
+
+    def __init__(self, image_executor: ImageProcessingExecutor, latency_seconds: float):
+        self.image_executor = image_executor
+        self.latency_seconds = latency_seconds
+
+    async def publish(
+        self,
+        transport: IntermediateImageTransport,
+        image: Image.Image,
+        profile: EncodingProfile = EncodingProfile.INTERMEDIATE,
+    ) -> str:
+        return f"local://{image.width}x{image.height}"
+
+    async def analyse_background(self, image_url: str) -> str | None:
+        await asyncio.sleep(self.latency_seconds)
+        return "extend background"
+
+    async def detect_text(self, image_url: str) -> OcrResult:
+        await asyncio.sleep(self.latency_seconds)
+        return OcrResult(regions=[])
+
+    async def inpaint(
+        self,
+        transport: IntermediateImageTransport,
+        image: Image.Image,
+        mask: Image.Image,
+        prompt: str,
+    ) -> BytesIO:
+        # The area to fill is transparent on the canvas, whichever way the mask
+        # is inverted.
+        await asyncio.sleep(self.latency_seconds)
+        return await self._encode(await self.image_executor.run(_edge_fill, image))
+
+    async def remove_objects(
+        self,
+        transport: IntermediateImageTransport,
+        image: Image.Image,
+        mask: Image.Image,
+        image_url: str,
+    ) -> BytesIO:
+        await asyncio.sleep(self.latency_seconds)
+        return await self._encode(
+            await self.image_executor.run(_edge_fill, image, mask)
+        )
+
+    async def upscale(
+        self,
+        transport: IntermediateImageTransport,
+        image: Image.Image,
+        resemblance: float,
+    ) -> BytesIO:
+        await asyncio.sleep(self.latency_seconds)
+        size = (image.width * self.UPSCALE_FACTOR, image.height * self.UPSCALE_FACTOR)
+        return await self._encode(
+            await self.image_executor.run(image.resize, size, Image.Resampling.LANCZOS)
+        )
+
+    async def _encode(self, image: Image.Image) -> BytesIO:
+        encoded = await self.image_executor.run(
+            encode_image, image, EncodingProfile.INTERMEDIATE
+        )
+        return BytesIO(encoded.data)
+
+
+class CachedInpaintingBackend(InpaintingBackend):
+    """Serves repeated inpainting, object removal and upscaling from the cache."""
+
+    def __init__(self, backend: InpaintingBackend, inpaint_cache: InpaintCache):
+        self.backend = backend
+        self.inpaint_cache = inpaint_cache
+        self.inpaint_model = backend.inpaint_model
+        self.remove_objects_model = backend.remove_objects_model
+        self.upscale_model = backend.upscale_model
+
+    async def publish(
+        self,
+        transport: IntermediateImageTransport,
+        image: Image.Image,
+        profile: EncodingProfile = EncodingProfile.INTERMEDIATE,
+    ) -> str:
+        return await self.backend.publish(transport, image, profile)
+
+    async def analyse_background(self, image_url: str) -> str | None:
+        return await self.backend.analyse_background(image_url)
+
+    async def detect_text(self, image_url: str) -> OcrResult:
+        return await self.backend.detect_text(image_url)
+
+    async def inpaint(
+        self,
+        transport: IntermediateImageTransport,
+        image: Image.Image,
+        mask: Image.Image,
+        prompt: str,
+    ) -> BytesIO:
+        # The context crop carries the box, so keys differ per region.
+        key = await self.inpaint_cache.key(self.inpaint_model, prompt, image, mask)
+        result = await self.inpaint_cache.get(key)
+        if result is None:
+            result = await self.backend.inpaint(transport, image, mask, prompt)
+            await self.inpaint_cache.put(key, self.inpaint_model, result.getvalue())
+        return result
+
+    async def remove_objects(
+        self,
+        transport: IntermediateImageTransport,
+        image: Image.Image,
+        mask: Image.Image,
+        image_url: str,
+    ) -> BytesIO:
+        key = await self.inpaint_cache.key(self.remove_objects_model, "", image, mask)
+        result = await self.inpaint_cache.get(key)
+        if result is None:
+            result = await self.backend.remove_objects(
+                transport, image, mask, image_url
+            )
+            await self.inpaint_cache.put(
+                key, self.remove_objects_model, result.getvalue()
+            )
+        return result
+
+    async def upscale(
+        self,
+        transport: IntermediateImageTransport,
+        image: Image.Image,
+        resemblance: float,
+    ) -> BytesIO:
+        key = await self.inpaint_cache.key(
+            self.upscale_model, f"resemblance={resemblance}", image
+        )
+        result = await self.inpaint_cache.get(key)
+        if result is None:
+            result = await self.backend.upscale(transport, image, resemblance)
+            await self.inpaint_cache.put(key, self.upscale_model, result.getvalue())
+        return result
+
+
+def create_inpainting_backend(
+    kind: str,
+    replicate_artwork_service: ReplicateArtworkService,
+    background_analyser_service: BackgroundAnalyserService,
+    download_client: DownloadClient,
+    image_executor: ImageProcessingExecutor,
+    inpaint_cache: InpaintCache,
+) -> InpaintingBackend:
+    if kind == "replicate":
+        backend = ReplicateInpaintingBackend(
+            replicate_artwork_service=replicate_artwork_service,
+            background_analyser_service=background_analyser_service,
+            download_client=download_client,
+        )
+        return CachedInpaintingBackend(backend, inpaint_cache)
+    if kind == "local":
+        # Not cached: the cache lives in the bucket, and a load test should measure
+        # the pipeline rather than cache hits.
+        return LocalInpaintingBackend(
+            image_executor=image_executor,
+            latency_seconds=settings.imageedit.inpainting.local.latency_seconds,
+        )
+    raise ValueError(f"Unknown inpainting backend: {kind}")
+
+
+def get_inpainting_backend(
+    replicate_artwork_service: ReplicateArtworkService = Depends(
+        get_replicate_artwork_service
+    ),
+    background_analyser_service: BackgroundAnalyserService = Depends(
+        get_background_analyser_service
+    ),
+    download_client: DownloadClient = Depends(get_download_client),
+    image_executor: ImageProcessingExecutor = Depends(get_image_executor),
+    inpaint_cache: InpaintCache = Depends(get_inpaint_cache),
+) -> InpaintingBackend:
+    return create_inpainting_backend(
+        settings.imageedit.inpainting.backend,
+        replicate_artwork_service=replicate_artwork_service,
+        background_analyser_service=background_analyser_service,
+        download_client=download_client,
+        image_executor=image_executor,
+        inpaint_cache=inpaint_cache,
+    )
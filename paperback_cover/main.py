@@ -9,13 +9,22 @@ from fastapi_pagination import add_pagination
 from paperback_cover.auth.routes import router as auth_router
 from paperback_cover.billing.dodopayments.routes import router as dodopayments_router
 from paperback_cover.commons.db import test_db_connection
+from paperback_cover.commons.executor import image_executor
+from paperback_cover.commons.http_client import download_client
 from paperback_cover.config import settings
 from paperback_cover.credit.routes import router as credit_router
 from paperback_cover.feedback.routes import router as feedback_router
+from paperback_cover.imageedit.extend_image.jobs import extend_image_job_service
 from paperback_cover.imageedit.extend_image.routes import router as extend_image_router
+from paperback_cover.imageedit.format_conversion.print_export import (
+    warn_missing_profiles,
+)
 from paperback_cover.imageedit.format_conversion.routes import (
     router as format_conversion_router,
 )
+from paperback_cover.imageedit.inpaint_cache import inpaint_cache_evictor
+from paperback_cover.storage_service.service import uploader
+from paperback_cover.storage_service.temp_objects import temp_object_sweeper
 from paperback_cover.user.routes import router as user_router
 
 logger = logging.getLogger(__name__)
@@ -54,7 +63,17 @@ async def lifespan(app: FastAPI):
         )
     else:
         logger.info("Database connection successful")
+    warn_missing_profiles()
+    await extend_image_job_service.start()
+    await temp_object_sweeper.start()
+    await inpaint_cache_evictor.start()
     yield
+    await inpaint_cache_evictor.stop()
+    await temp_object_sweeper.stop()
+    await extend_image_job_service.stop()
+    await download_client.aclose()
+    image_executor.shutdown()
+    uploader.shutdown()
 
 
 doc_url = "/api/docs"
@@ -69,7 +88,7 @@ register_exception(app)
 
 @app.get("/health")
 async def health():
-    return {"status": "ok"}
+    return {"status": "ok", "image_executor": image_executor.stats().model_dump()}
 
 
 app.include_router(auth_router)
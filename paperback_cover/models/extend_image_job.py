@@ -0,0 +1,56 @@
+from uuid import UUID, uuid4
+
+from sqlalchemy import JSON
+from sqlalchemy import Enum as SQLAlchemyEnum
+from sqlalchemy import String, Text, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+
+from paperback_cover.imageedit.extend_image.schema import (
+    CoverArtSchema,
+    ExtendImageJobSchema,
+    ExtendImageJobStatus,
+    ExtendImageProgress,
+    ExtendImageStage,
+)
+from paperback_cover.models.base import Modifiable, UserGenerated
+
+
+class ExtendImageJob(UserGenerated, Modifiable):
+    __tablename__ = "extend_image_job"
+    __table_args__ = (UniqueConstraint("owner", "idempotency_key"),)
+
+    id: Mapped[UUID] = mapped_column(primary_key=True, default=uuid4)
+    status: Mapped[ExtendImageJobStatus] = mapped_column(
+        SQLAlchemyEnum(ExtendImageJobStatus),
+        default=ExtendImageJobStatus.QUEUED,
+        index=True,
+    )
+    # ExtendImageRequest as JSON
+    request: Mapped[dict] = mapped_column(JSON)
+    # Bucket path of the uploaded source image
+    source_path: Mapped[str]
+    idempotency_key: Mapped[str] = mapped_column(String(255), nullable=True)
+    stage: Mapped[str] = mapped_column(nullable=True)
+    step: Mapped[int] = mapped_column(default=0)
+    total_steps: Mapped[int] = mapped_column(default=0)
+    # CoverArtSchema as JSON once the job succeeded
+    result: Mapped[dict] = mapped_column(JSON, nullable=True)
+    error: Mapped[str] = mapped_column(Text, nullable=True)
+
+    def to_pydantic(self) -> ExtendImageJobSchema:
+        progress = None
+        if self.stage is not None:
+            progress = ExtendImageProgress(
+                stage=ExtendImageStage(self.stage),
+                step=self.step,
+                total_steps=self.total_steps,
+            )
+        return ExtendImageJobSchema(
+            id=self.id,
+            status=self.status,
+            progress=progress,
+            result=CoverArtSchema(**self.result) if self.result else None,
+            error=self.error,
+            created_at=self.created_at,
+            updated_at=self.updated_at,
+        )
@@ -0,0 +1,28 @@
+from uuid import UUID, uuid4
+
+from sqlalchemy import JSON, String, Text, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+
+from paperback_cover.models.base import Modifiable, UserGenerated
+
+
+class ExtendImageRun(UserGenerated, Modifiable):
+    """Checkpointed state of one image extension, keyed by the client's idempotency key."""
+
+    __tablename__ = "extend_image_run"
+    __table_args__ = (UniqueConstraint("owner", "idempotency_key"),)
+
+    id: Mapped[UUID] = mapped_column(primary_key=True, default=uuid4)
+    idempotency_key: Mapped[str] = mapped_column(String(255))
+    # ExtendImageRequest as JSON, and the SHA-256 of the uploaded image
+    request: Mapped[dict] = mapped_column(JSON)
+    source_sha256: Mapped[str] = mapped_column(String(64))
+    background_prompt: Mapped[str] = mapped_column(Text, nullable=True)
+    # OCR regions of the source image as a list of TextRegion JSON
+    text_regions: Mapped[list] = mapped_column(JSON, nullable=True)
+    # Inpainting steps completed, and the filled box and canvas after the last one
+    step: Mapped[int] = mapped_column(default=0)
+    current_box: Mapped[list] = mapped_column(JSON, nullable=True)
+    canvas_path: Mapped[str] = mapped_column(nullable=True)
+    # CoverArtSchema as JSON once the run completed
+    result: Mapped[dict] = mapped_column(JSON, nullable=True)
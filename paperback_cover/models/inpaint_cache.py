@@ -0,0 +1,22 @@
+from datetime import datetime
+
+from sqlalchemy import DateTime, String
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.sql import func
+
+from paperback_cover.models.base import Timestamped
+
+
+class InpaintCacheEntry(Timestamped):
+    """Index of inpainting results stored in the bucket, keyed by their inputs."""
+
+    __tablename__ = "inpaint_cache_entry"
+
+    key: Mapped[str] = mapped_column(String(64), primary_key=True)
+    operation: Mapped[str] = mapped_column(String(100))
+    path: Mapped[str]
+    size_bytes: Mapped[int]
+    hits: Mapped[int] = mapped_column(default=0)
+    last_used_at: Mapped[datetime] = mapped_column(
+        DateTime, default=func.now(), index=True
+    )
@@ -0,0 +1,75 @@
+import base64
+import hashlib
+import logging
+
+from PIL import Image
+
+from paperback_cover.commons.executor import ImageProcessingExecutor
+from paperback_cover.commons.image_encoding import EncodingProfile, encode_image
+from paperback_cover.config import settings
+from paperback_cover.storage_service.service import (
+    get_user_generated_url_for_object,
+    upload_temp_file_to_bucket,
+)
+from paperback_cover.storage_service.temp_objects import TempObjectRegistry
+
+logger = logging.getLogger(__name__)
+
+
+class IntermediateImageTransport:
+    """
+    Hands intermediate images to model providers for the duration of one request.
+
+    Payloads up to `data_uri_max_bytes` are inlined as data URIs and never touch the
+    bucket; larger ones are uploaded to the temp area. Identical payloads are only
+    published once per transport. Used as an async context manager, the uploaded
+    images are deleted once the request is done with them.
+    """
+
+    def __init__(
+        self,
+        image_executor: ImageProcessingExecutor,
+        data_uri_max_bytes: int | None = None,
+    ):
+        self.image_executor = image_executor
+        if data_uri_max_bytes is None:
+            data_uri_max_bytes = settings.storage.intermediate.data_uri_max_bytes
+        self.data_uri_max_bytes = data_uri_max_bytes
+        self._published: dict[str, str] = {}
+        self.temp_objects = TempObjectRegistry()
+
+    async def __aenter__(self) -> "IntermediateImageTransport":
+        return self
+
+    async def __aexit__(self, exc_type, exc, traceback):
+        await self.temp_objects.delete_all()
+
+    async def publish(
+        self,
+        image: Image.Image,
+        profile: EncodingProfile = EncodingProfile.INTERMEDIATE,
+    ) -> str:
+        """Returns a URL (or data URI) the providers can read `image` from."""
+        encoded = await self.image_executor.run(encode_image, image, profile)
+        return await self.publish_bytes(
+            encoded.data, encoded.content_type, encoded.suffix
+        )
+
+    async def publish_bytes(self, data: bytes, content_type: str, suffix: str) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        if digest in self._published:
+            logger.info(f"Reusing published intermediate image {digest[:12]}")
+            return self._published[digest]
+
+        if len(data) <= self.data_uri_max_bytes:
+            encoded = base64.b64encode(data).decode("ascii")
+            url = f"data:{content_type};base64,{encoded}"
+        else:
+            object_name = await upload_temp_file_to_bucket(data, suffix=suffix)
+            if not object_name:
+                raise Exception("Failed to upload image to storage")
+            self.temp_objects.add(object_name)
+            url = get_user_generated_url_for_object(object_name)
+
+        self._published[digest] = url
+        return url
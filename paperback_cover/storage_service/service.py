@@ -1,10 +1,15 @@
+import asyncio
 import enum
+import io
 import logging
 import uuid
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, TypeVar
 
 import boto3
 from botocore.client import Config
-from botocore.exceptions import NoCredentialsError
+from botocore.exceptions import BotoCoreError, ClientError, NoCredentialsError
 from cloudflare import Cloudflare
 
 from paperback_cover.commons.annotations import timing
@@ -13,6 +18,16 @@ from paperback_cover.storage_service.schema import UploadMetadata
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
+# Part limits of S3 multipart uploads
+MIN_PART_SIZE = 5 * 1024 * 1024
+MAX_PARTS = 10000
+# Most keys a single delete_objects request takes
+DELETE_BATCH_SIZE = 1000
+
+TEMP_PREFIX = "temp/"
+
 
 class S3ContentType(enum.Enum):
     IMAGE_JPEG = "image/jpeg"
@@ -24,106 +39,304 @@ class S3ContentType(enum.Enum):
     APPLICATION_X_TAR = "application/x-tar"
 
 
+class _BufferReader(io.RawIOBase):
+    """
+    A seekable file reading from `view`, so that parts are sent without copying
+    them out of the object first.
+    """
+
+    def __init__(self, view: memoryview):
+        self._view = view
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        base = {
+            io.SEEK_SET: 0,
+            io.SEEK_CUR: self._position,
+            io.SEEK_END: len(self._view),
+        }[whence]
+        self._position = max(0, base + offset)
+        return self._position
+
+    def readinto(self, buffer) -> int:
+        chunk = self._view[self._position : self._position + len(buffer)]
+        buffer[: len(chunk)] = chunk
+        self._position += len(chunk)
+        return len(chunk)
+
+
 class S3Uploader:
-    def __init__(self, bucket_name, access_key, secret_key, region_name, endpoint):
+    """
+    Stores objects in an S3 compatible bucket.
+
+    boto3 only offers blocking calls, so every call runs on a thread pool of its
+    own, sized together with the client's connection pool; a slow upload never
+    holds up the event loop, and requests only queue once all connections are busy.
+    """
+
+    def __init__(
+        self,
+        bucket_name,
+        access_key,
+        secret_key,
+        region_name,
+        endpoint,
+        workers,
+        multipart_threshold,
+        max_part_size,
+        part_concurrency,
+        part_retries,
+        backoff_seconds,
+    ):
         self.bucket_name = bucket_name
+        self.workers = workers
+        self.multipart_threshold = multipart_threshold
+        self.max_part_size = max_part_size
+        self.part_concurrency = part_concurrency
+        self.part_retries = part_retries
+        self.backoff_seconds = backoff_seconds
         self.s3_client = boto3.client(
             "s3",
             aws_access_key_id=access_key,
             aws_secret_access_key=secret_key,
             region_name=region_name,
             endpoint_url=endpoint,
-            config=Config(signature_version="s3v4"),
+            config=Config(signature_version="s3v4", max_pool_connections=workers),
         )
+        self._executor: ThreadPoolExecutor | None = None
+
+    async def _call(self, fn: Callable[..., T], **kwargs: Any) -> T:
+        """Runs the blocking client call `fn` on the storage thread pool."""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="storage"
+            )
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(fn, **kwargs))
+
+    def _get_object_body(self, object_name) -> bytes:
+        response = self.s3_client.get_object(Bucket=self.bucket_name, Key=object_name)
+        return response["Body"].read()
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
 
-    async def upload_image_multipart(self, image_data, object_name, metadata):
+    async def upload_object(self, data, object_name, metadata):
         """
-        Uploads an image in parts to an S3 bucket using multipart upload.
+        Uploads an object to an S3 bucket, in a single request when it is small and
+        in parts uploaded concurrently otherwise.
 
         Parameters:
-            image_data (bytes): The binary data of the image.
-            object_name (str): The S3 object name under which the image will be stored.
-            metadata (dict): A dictionary containing the metadata for the image.
+            data (bytes): The binary data to be uploaded.
+            object_name (str): The name of the object under which the data will be stored.
+            metadata (dict): A dictionary containing the metadata for the data.
         """
-        # Create a multipart upload
-        multipart = self.s3_client.create_multipart_upload(
-            Bucket=self.bucket_name, Key=object_name, Metadata=metadata
-        )
-        upload_id = multipart["UploadId"]
+        if len(data) < self.multipart_threshold:
+            return await self._put_object(data, object_name, metadata)
+        return await self._upload_multipart(data, object_name, metadata)
+
+    async def _put_object(self, data, object_name, metadata):
         try:
+            await self._call(
+                self.s3_client.put_object,
+                Bucket=self.bucket_name,
+                Key=object_name,
+                Body=data,
+                Metadata=metadata,
+            )
+            logger.info(f"Object uploaded successfully: {object_name}")
+            return object_name
+        except NoCredentialsError:
+            logger.error("Credentials are not available.")
+        except Exception as e:
+            logger.error(f"An error occurred: {str(e)}")
 
-            # Split the file into chunks
-            part_size = 5 * 1024 * 1024  # 5 MB per part
-            parts = [
-                image_data[i : i + part_size]
-                for i in range(0, len(image_data), part_size)
-            ]
+    def _get_part_size(self, size: int) -> int:
+        """
+        Spreads `size` over the concurrent part uploads, within the part size
+        limits of S3.
+        """
+        part_size = -(-size // self.part_concurrency)
+        part_size = min(max(part_size, MIN_PART_SIZE), self.max_part_size)
+        return max(part_size, -(-size // MAX_PARTS))
 
-            part_info = {"Parts": []}
+    async def _upload_multipart(self, data, object_name, metadata):
+        """
+        Uploads `data` with a multipart upload. Parts are uploaded concurrently
+        from slices of `data`, and a failed part is retried on its own.
+        """
+        multipart = await self._call(
+            self.s3_client.create_multipart_upload,
+            Bucket=self.bucket_name,
+            Key=object_name,
+            Metadata=metadata,
+        )
+        upload_id = multipart["UploadId"]
+        view = memoryview(data)
+        part_size = self._get_part_size(len(view))
+        semaphore = asyncio.Semaphore(self.part_concurrency)
+
+        async def upload_part(part_number: int, start: int) -> dict:
+            async with semaphore:
+                response = await self._upload_part(
+                    view[start : start + part_size], object_name, upload_id, part_number
+                )
+            return {"PartNumber": part_number, "ETag": response["ETag"]}
 
-            # Upload parts
-            for part_number, part in enumerate(parts, start=1):
-                response = self.s3_client.upload_part(
-                    Body=part,
+        tasks = [
+            asyncio.create_task(upload_part(part_number, start))
+            for part_number, start in enumerate(range(0, len(view), part_size), start=1)
+        ]
+        try:
+            parts = await asyncio.gather(*tasks)
+            await self._call(
+                self.s3_client.complete_multipart_upload,
+                Bucket=self.bucket_name,
+                Key=object_name,
+                UploadId=upload_id,
+                MultipartUpload={"Parts": parts},
+            )
+            logger.info(
+                f"Object uploaded successfully: {object_name} | parts: {len(parts)}"
+            )
+            return object_name
+        except BaseException as e:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            if isinstance(e, NoCredentialsError):
+                logger.error("Credentials are not available.")
+            else:
+                logger.error(f"An error occurred: {str(e)}, aborting upload.")
+            await self._call(
+                self.s3_client.abort_multipart_upload,
+                Bucket=self.bucket_name,
+                Key=object_name,
+                UploadId=upload_id,
+            )
+            if not isinstance(e, Exception):
+                raise
+
+    async def _upload_part(
+        self, part: memoryview, object_name, upload_id, part_number: int
+    ) -> dict:
+        attempt = 0
+        while True:
+            try:
+                return await self._call(
+                    self.s3_client.upload_part,
+                    Body=_BufferReader(part),
                     Bucket=self.bucket_name,
                     Key=object_name,
                     PartNumber=part_number,
                     UploadId=upload_id,
                 )
-                part_info["Parts"].append(
-                    {"PartNumber": part_number, "ETag": response["ETag"]}
+            except (ClientError, BotoCoreError) as e:
+                if isinstance(e, NoCredentialsError) or attempt >= self.part_retries:
+                    raise
+                delay = self.backoff_seconds * (2**attempt)
+                attempt += 1
+                logger.warning(
+                    f"Upload of part {part_number} of {object_name} failed ({e}), retrying in {delay:.1f}s | attempt {attempt}/{self.part_retries}"
                 )
+                await asyncio.sleep(delay)
 
-            # Complete multipart upload
-            self.s3_client.complete_multipart_upload(
-                Bucket=self.bucket_name,
-                Key=object_name,
-                UploadId=upload_id,
-                MultipartUpload=part_info,
-            )
-            logger.info(f"Image uploaded successfully: {object_name}")
+    async def download_object(self, object_name) -> bytes | None:
+        """
+        Downloads an object from an S3 bucket.
 
-            return get_user_generated_url_for_object(object_name)
+        Parameters:
+            object_name (str): The name of the object to be downloaded.
+        """
+        try:
+            return await self._call(self._get_object_body, object_name=object_name)
         except NoCredentialsError:
             logger.error("Credentials are not available.")
         except Exception as e:
-            logger.error(f"An error occurred: {str(e)}, aborting upload.")
-
-            # Aborting upload in case of exception
-            self.s3_client.abort_multipart_upload(
-                Bucket=self.bucket_name, Key=object_name, UploadId=upload_id
-            )
+            logger.error(f"An error occurred: {str(e)}")
 
-    async def upload_object(self, data, object_name, metadata):
+    async def delete_object(self, object_name):
         """
-        Uploads an object to an S3 bucket.
+        Deletes an object from an S3 bucket.
 
         Parameters:
-            data (bytes): The binary data to be uploaded.
-            object_name (str): The name of the object under which the data will be stored.
-            metadata (dict): A dictionary containing the metadata for the data.
+            object_name (str): The name of the object to be deleted.
         """
         try:
-            response = self.s3_client.put_object(
-                Bucket=self.bucket_name, Key=object_name, Body=data, Metadata=metadata
+            await self._call(
+                self.s3_client.delete_object, Bucket=self.bucket_name, Key=object_name
             )
-            logger.info(f"Object uploaded successfully: {object_name}")
-            return object_name
+            logger.info(f"Object deleted successfully: {object_name}")
         except NoCredentialsError:
             logger.error("Credentials are not available.")
         except Exception as e:
             logger.error(f"An error occurred: {str(e)}")
 
-    async def delete_object(self, object_name):
+    async def delete_objects(self, object_names: list[str]) -> int:
         """
-        Deletes an object from an S3 bucket.
+        Deletes objects from an S3 bucket, up to 1000 per request.
 
         Parameters:
-            object_name (str): The name of the object to be deleted.
+            object_names (list[str]): The names of the objects to be deleted.
+
+        Returns the number of objects deleted.
+        """
+        deleted = 0
+        for start in range(0, len(object_names), DELETE_BATCH_SIZE):
+            batch = object_names[start : start + DELETE_BATCH_SIZE]
+            try:
+                response = await self._call(
+                    self.s3_client.delete_objects,
+                    Bucket=self.bucket_name,
+                    Delete={"Objects": [{"Key": key} for key in batch], "Quiet": True},
+                )
+            except NoCredentialsError:
+                logger.error("Credentials are not available.")
+                break
+            except Exception as e:
+                logger.error(f"An error occurred: {str(e)}")
+                continue
+            errors = response.get("Errors", [])
+            for error in errors:
+                logger.error(
+                    f"Failed to delete object {error.get('Key')}: {error.get('Message')}"
+                )
+            deleted += len(batch) - len(errors)
+        logger.info(f"Objects deleted successfully: {deleted}/{len(object_names)}")
+        return deleted
+
+    def _list_objects_before(self, prefix, cutoff) -> list[str]:
+        paginator = self.s3_client.get_paginator("list_objects_v2")
+        return [
+            item["Key"]
+            for page in paginator.paginate(Bucket=self.bucket_name, Prefix=prefix)
+            for item in page.get("Contents", [])
+            if item["LastModified"] < cutoff
+        ]
+
+    async def list_objects_before(self, prefix, cutoff) -> list[str] | None:
+        """
+        Lists the objects under a prefix last modified before a point in time.
+
+        Parameters:
+            prefix (str): The prefix of the object names.
+            cutoff (datetime.datetime): Timezone aware time the objects are older than.
         """
         try:
-            self.s3_client.delete_object(Bucket=self.bucket_name, Key=object_name)
-            logger.info(f"Object deleted successfully: {object_name}")
+            return await self._call(
+                self._list_objects_before, prefix=prefix, cutoff=cutoff
+            )
         except NoCredentialsError:
             logger.error("Credentials are not available.")
         except Exception as e:
@@ -139,12 +352,15 @@ class S3Uploader:
         """
         try:
             copy_source = {"Bucket": self.bucket_name, "Key": object_name}
-            self.s3_client.copy_object(
+            await self._call(
+                self.s3_client.copy_object,
                 CopySource=copy_source,
                 Bucket=self.bucket_name,
                 Key=new_object_name,
             )
-            self.s3_client.delete_object(Bucket=self.bucket_name, Key=object_name)
+            await self._call(
+                self.s3_client.delete_object, Bucket=self.bucket_name, Key=object_name
+            )
             logger.info(
                 f"Object moved successfully: {object_name} -> {new_object_name}"
             )
@@ -160,6 +376,12 @@ uploader = S3Uploader(
     secret_key=settings.storage.user_generated.secret_key,
     region_name=settings.storage.user_generated.region,
     endpoint=settings.storage.user_generated.endpoint,
+    workers=settings.storage.user_generated.workers,
+    multipart_threshold=settings.storage.user_generated.upload.multipart_threshold,
+    max_part_size=settings.storage.user_generated.upload.max_part_size,
+    part_concurrency=settings.storage.user_generated.upload.part_concurrency,
+    part_retries=settings.storage.user_generated.upload.part_retries,
+    backoff_seconds=settings.storage.user_generated.upload.backoff_seconds,
 )
 
 
@@ -180,9 +402,12 @@ async def upload_image_to_bucket(
         object_name (str): The S3 object name under which the image will be stored.
         metadata (UploadMetadata): The metadata for the image.
     """
-    return await uploader.upload_image_multipart(
+    object_name = await uploader.upload_object(
         image_data, image_name, metadata.model_dump(mode="json")
     )
+    if object_name is None:
+        return None
+    return get_user_generated_url_for_object(object_name)
 
 
 def get_user_generated_url_for_object(object_name: str) -> str:
@@ -213,10 +438,22 @@ async def upload_blob_to_bucket(
 
 @timing
 async def upload_temp_file_to_bucket(blob_data: bytes, suffix: str = "") -> str | None:
-    temp_path = "temp/" + str(uuid.uuid4()) + suffix
+    temp_path = TEMP_PREFIX + str(uuid.uuid4()) + suffix
     return await upload_blob_to_bucket(blob_data, temp_path, {})
 
 
+@timing
+async def download_blob_from_bucket(path: str) -> bytes | None:
+    """
+    Downloads a blob from an S3 bucket.
+
+    Parameters:
+        path (str): The path of the blob to be downloaded.
+    """
+    logger.info(f"Downloading blob from bucket: {path}")
+    return await uploader.download_object(path)
+
+
 @timing
 async def delete_blob_from_bucket(path: str) -> None:
     """
@@ -227,3 +464,15 @@ async def delete_blob_from_bucket(path: str) -> None:
     """
     logger.info(f"Deleting blob from bucket: {path}")
     await uploader.delete_object(path)
+
+
+@timing
+async def delete_blobs_from_bucket(paths: list[str]) -> int:
+    """
+    Deletes blobs from an S3 bucket in batches.
+
+    Parameters:
+        paths (list[str]): The paths of the blobs to be deleted.
+    """
+    logger.info(f"Deleting {len(paths)} blobs from bucket")
+    return await uploader.delete_objects(paths)
@@ -0,0 +1,88 @@
+import asyncio
+import datetime
+import logging
+
+from paperback_cover.config import settings
+from paperback_cover.storage_service.service import (
+    TEMP_PREFIX,
+    delete_blobs_from_bucket,
+    uploader,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class TempObjectRegistry:
+    """
+    Temp objects created for one request or job, deleted together once it is done.
+
+    Use it as an async context manager, or call `delete_all` when finished.
+    """
+
+    def __init__(self):
+        self._object_names: list[str] = []
+
+    def add(self, object_name: str):
+        self._object_names.append(object_name)
+
+    def __len__(self) -> int:
+        return len(self._object_names)
+
+    async def delete_all(self):
+        object_names, self._object_names = self._object_names, []
+        if object_names:
+            await delete_blobs_from_bucket(object_names)
+
+    async def __aenter__(self) -> "TempObjectRegistry":
+        return self
+
+    async def __aexit__(self, exc_type, exc, traceback):
+        await self.delete_all()
+
+
+class TempObjectSweeper:
+    """
+    Periodically deletes temp objects older than `ttl_seconds`, the ones left
+    behind by requests that never finished. Results delivered to clients are
+    never stored under the temp prefix.
+    """
+
+    def __init__(self, ttl_seconds: float, interval_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self.interval_seconds = interval_seconds
+        self._task: asyncio.Task | None = None
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def sweep(self) -> int:
+        """Deletes the expired temp objects, returning how many were deleted."""
+        cutoff = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(
+            seconds=self.ttl_seconds
+        )
+        object_names = await uploader.list_objects_before(TEMP_PREFIX, cutoff)
+        if not object_names:
+            return 0
+        logger.info(f"Sweeping {len(object_names)} expired temp objects")
+        return await delete_blobs_from_bucket(object_names)
+
+    async def _run(self):
+        while True:
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.error(f"Temp object sweep failed: {e}", exc_info=True)
+            await asyncio.sleep(self.interval_seconds)
+
+
+temp_object_sweeper = TempObjectSweeper(
+    ttl_seconds=settings.storage.temp_objects.ttl_seconds,
+    interval_seconds=settings.storage.temp_objects.sweep_interval_seconds,
+)
@@ -5,7 +5,6 @@ from typing import Optional
 from fastapi import HTTPException, UploadFile
 from fastapi_pagination import Page
 from fastapi_pagination.ext.sqlalchemy import paginate
-from filetype import guess_extension
 from sqlalchemy import func, select
 
 from paperback_cover.commons.db import get_async_session
@@ -72,10 +71,10 @@ async def upload_asset(
     await check_user_asset_count(user, uploadSchema.type, 20)
 
     # Validate the file
-    await validate_image_file(asset)
+    upload = await validate_image_file(asset)
 
     # Get file extension
-    file_extension = guess_extension(asset.file)
+    file_extension = upload.extension
     if not file_extension or file_extension not in ["jpg", "jpeg", "png"]:
         raise HTTPException(
             status_code=400, detail="Only JPG, JPEG, and PNG files are allowed."
@@ -89,7 +88,7 @@ async def upload_asset(
             try:
                 logger.info(f"Uploading asset to bucket: {object_name}")
                 await upload_blob_to_bucket(
-                    await asset.read(),  # Read file content
+                    upload.content,
                     path=object_name,
                     metadata=uploadSchema.model_dump(mode="json"),
                 )
@@ -0,0 +1,7 @@
+import os
+
+# The storage client is created on import; tests never talk to the configured
+# bucket, storage tests run against moto instead.
+os.environ["STORAGE__USER_GENERATED__ENDPOINT"] = "@none"
+# The webhook client is created on import too, and needs a base64 secret.
+os.environ["BILLING__DODOPAYMENTS__WEBHOOK_SECRET"] = "whsec_dGVzdHNlY3JldA=="
@@ -0,0 +1,41 @@
+import numpy as np
+
+from paperback_cover.imageedit.extend_image.compositor import (
+    ring_blend_mask,
+    tile_blend_mask,
+)
+
+
+def test_ring_mask_fades_across_the_band():
+    mask = np.asarray(ring_blend_mask((20, 20), [5, 5, 15, 15], (4, 0, 0, 0)))
+    row = mask[10]
+    # Inpainted outside the keep box, fading out over the 4 pixel left band.
+    assert row[4] == 255
+    assert list(row[5:10]) == [204, 153, 102, 51, 0]
+    # Kept up to the right edge of the keep box, which has no band.
+    assert row[14] == 0
+    assert row[15] == 255
+
+
+def test_ring_mask_without_bands_keeps_the_whole_box():
+    mask = np.asarray(ring_blend_mask((20, 20), [5, 5, 15, 15], (0, 0, 0, 0)))
+    assert (mask[5:15, 5:15] == 0).all()
+    assert (mask[:5] == 255).all()
+    assert (mask[:, 15:] == 255).all()
+
+
+def test_ring_mask_bands_meet_in_the_corners():
+    mask = np.asarray(ring_blend_mask((20, 20), [5, 5, 15, 15], (4, 4, 4, 4)))
+    # The stronger of the two fades wins where bands cross.
+    assert mask[5, 5] == 204
+    assert mask[5, 8] == 204
+    assert mask[8, 8] == 51
+    assert mask[9, 9] == 0
+    assert mask[14, 14] == 204
+
+
+def test_tile_mask_fades_into_existing_pixels():
+    mask = np.asarray(tile_blend_mask((20, 10), [0, 0, 10, 10], [[0, 0, 14, 10]]))
+    assert (mask[:, :10] == 255).all()
+    assert list(mask[5, 10:15]) == [204, 153, 102, 51, 0]
+    assert (mask[:, 14:] == 0).all()
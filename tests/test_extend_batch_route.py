@@ -0,0 +1,84 @@
+import json
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+
+# Imported first: the app loads the user modules in an order fastapi-users resolves.
+from paperback_cover import main
+from paperback_cover.auth.service import verify_active_user
+from paperback_cover.commons import annotations
+from paperback_cover.imageedit.extend_image.service import get_extend_image_service
+from paperback_cover.models.user import User
+
+TARGET = {
+    "target_width": 600,
+    "target_height": 600,
+    "original_box": {"x": 100, "y": 100, "width": 400, "height": 400},
+}
+
+
+class RecordingService:
+    def __init__(self):
+        self.requests = None
+
+    async def extend_images(self, requests, file, user):
+        self.requests = requests
+        return [None] * len(requests)
+
+
+@pytest.fixture
+def charges(monkeypatch):
+    charges = []
+
+    async def reduce_user_credits(user, amount):
+        charges.append(amount)
+        return 100 - amount
+
+    monkeypatch.setattr(annotations, "reduce_user_credits", reduce_user_credits)
+    return charges
+
+
+@pytest.fixture
+def service():
+    return RecordingService()
+
+
+@pytest.fixture
+def client(service):
+    # Without entering the client the lifespan, and its database, is not started.
+    main.app.dependency_overrides[verify_active_user] = lambda: User(id=uuid.uuid4())
+    main.app.dependency_overrides[get_extend_image_service] = lambda: service
+    yield TestClient(main.app)
+    main.app.dependency_overrides.clear()
+
+
+def _post(client: TestClient, data: str):
+    return client.post(
+        "/imageedit/extend/batch",
+        data={"data": data},
+        files={"file": ("cover.png", b"png", "image/png")},
+    )
+
+
+def test_batch_charges_one_credit_per_target(client, service, charges):
+    response = _post(client, json.dumps({"targets": [TARGET, TARGET]}))
+    assert response.status_code == 200
+    assert charges == [2]
+    assert len(service.requests) == 2
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        json.dumps({"targets": []}),
+        json.dumps({"targets": [TARGET] * 10}),
+        json.dumps({"targets": [{"target_width": 600}]}),
+        "not json",
+    ],
+)
+def test_invalid_batch_is_rejected_before_charging(client, service, charges, data):
+    response = _post(client, data)
+    assert response.status_code == 400
+    assert charges == []
+    assert service.requests is None
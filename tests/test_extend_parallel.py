@@ -0,0 +1,56 @@
+import asyncio
+
+import pytest
+from PIL import Image
+
+from paperback_cover.commons.executor import ImageProcessingExecutor
+from paperback_cover.imageedit.extend_image.schema import ExtensionMode
+from paperback_cover.imageedit.extend_image.service import ExtendImageService
+from paperback_cover.imageedit.inpainting_backend import LocalInpaintingBackend
+from tests.test_planner import _request
+
+
+class FailingCallBackend(LocalInpaintingBackend):
+    """Edge fills every region except the `fail_on`-th inpainting call."""
+
+    def __init__(self, image_executor: ImageProcessingExecutor, fail_on: int):
+        super().__init__(image_executor, latency_seconds=0)
+        self.fail_on = fail_on
+        self.calls = 0
+
+    async def inpaint(self, transport, image, mask, prompt):
+        self.calls += 1
+        if self.calls == self.fail_on:
+            raise RuntimeError("inpainting failed")
+        return await super().inpaint(transport, image, mask, prompt)
+
+
+@pytest.fixture
+def executor():
+    executor = ImageProcessingExecutor(thread_workers=2, process_workers=0)
+    yield executor
+    executor.shutdown()
+
+
+def _extend(executor: ImageProcessingExecutor, fail_on: int) -> tuple[bool, int]:
+    # Two phases: the four side strips, then the four corners.
+    request = _request((600, 600), (100, 100, 400, 400), ExtensionMode.PARALLEL)
+    canvas = Image.new("RGBA", (600, 600))
+    canvas.paste(Image.new("RGBA", (400, 400), (200, 40, 40, 255)), (100, 100))
+    backend = FailingCallBackend(executor, fail_on)
+    service = ExtendImageService(backend, executor, memory_budget=None)
+    reached = asyncio.run(service._extend_canvas(None, canvas, request, "prompt"))
+    return reached, canvas.getpixel((0, 0))[3]
+
+
+def test_parallel_extension_reaches_target(executor):
+    reached, corner_alpha = _extend(executor, fail_on=0)
+    assert reached
+    assert corner_alpha == 255
+
+
+def test_failed_corner_tile_does_not_reach_target(executor):
+    # The side strips alone span the target, the fifth call is the first corner.
+    reached, corner_alpha = _extend(executor, fail_on=5)
+    assert not reached
+    assert corner_alpha == 0
@@ -0,0 +1,64 @@
+import asyncio
+import struct
+import zlib
+from io import BytesIO
+
+import pytest
+from fastapi import HTTPException, UploadFile
+from PIL import Image
+
+from paperback_cover.commons.file_validator import validate_image_file
+from paperback_cover.commons.pixel_budget import decode_image
+
+
+def _png_chunk(kind: bytes, data: bytes) -> bytes:
+    checksum = zlib.crc32(kind + data)
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", checksum)
+
+
+def _declared_png(width: int, height: int) -> bytes:
+    """A tiny PNG whose header declares `width` x `height` grey pixels."""
+    header = struct.pack(">IIBBBBB", width, height, 8, 0, 0, 0, 0)
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + _png_chunk(b"IHDR", header)
+        + _png_chunk(b"IDAT", zlib.compress(b"\0" * (width + 1)))
+        + _png_chunk(b"IEND", b"")
+    )
+
+
+def _upload(data: bytes) -> UploadFile:
+    return UploadFile(file=BytesIO(data), size=len(data), filename="cover.png")
+
+
+def _validate(data: bytes):
+    return asyncio.run(validate_image_file(_upload(data)))
+
+
+@pytest.mark.parametrize("size", [(15000, 13000), (60000, 60000)])
+def test_huge_declared_size_is_rejected_with_413(size):
+    data = _declared_png(*size)
+    assert len(data) < 200_000
+
+    with pytest.raises(HTTPException) as error:
+        _validate(data)
+    assert error.value.status_code == 413
+
+    with pytest.raises(HTTPException) as error:
+        decode_image(BytesIO(data))
+    assert error.value.status_code == 413
+
+
+def test_image_within_budget_is_validated():
+    buffer = BytesIO()
+    Image.new("RGB", (40, 30)).save(buffer, "PNG")
+
+    upload = _validate(buffer.getvalue())
+    assert upload.size == (40, 30)
+    assert upload.mime == "image/png"
+
+
+def test_non_image_is_rejected_with_400():
+    with pytest.raises(HTTPException) as error:
+        _validate(b"%PDF-1.4\n" + b"\0" * 512)
+    assert error.value.status_code == 400
@@ -0,0 +1,43 @@
+import asyncio
+from uuid import uuid4
+
+from paperback_cover.imageedit.extend_image.jobs import (
+    ExtendImageJobService,
+    InProcessJobQueue,
+)
+from paperback_cover.imageedit.extend_image.schema import ExtendImageJobStatus
+
+
+class RecordingJobService(ExtendImageJobService):
+    """Keeps job states in memory and runs jobs until they are cancelled."""
+
+    def __init__(self):
+        super().__init__(None, InProcessJobQueue(workers=1), stale_after_seconds=600)
+        self.statuses: dict = {}
+        self.started = asyncio.Event()
+
+    async def _update_job(self, job_id, values, status=None):
+        if status is not None and self.statuses.get(job_id) != status:
+            return False
+        self.statuses[job_id] = values.get("status", self.statuses.get(job_id))
+        return True
+
+    async def _run_claimed_job(self, job_id):
+        self.started.set()
+        await asyncio.Event().wait()
+
+
+def test_stopping_requeues_running_jobs():
+    async def run():
+        service = RecordingJobService()
+        job_id = uuid4()
+        service.statuses[job_id] = ExtendImageJobStatus.QUEUED
+        await service.queue.start(service.run_job)
+        await service.queue.enqueue(job_id)
+        await asyncio.wait_for(service.started.wait(), timeout=5)
+        assert service.statuses[job_id] == ExtendImageJobStatus.RUNNING
+
+        await service.stop()
+        return service.statuses[job_id]
+
+    assert asyncio.run(run()) == ExtendImageJobStatus.QUEUED
@@ -0,0 +1,57 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from paperback_cover.commons.memory_budget import MemoryBudget, rgba_bytes
+
+
+def test_request_larger_than_the_limit_is_rejected():
+    budget = MemoryBudget(total_bytes=1000, max_request_bytes=600, wait_seconds=1)
+
+    async def run():
+        async with budget.reserve(601):
+            pass
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(run())
+    assert error.value.status_code == 413
+    assert budget.reserved == 0
+
+
+def test_request_is_queued_then_times_out():
+    budget = MemoryBudget(total_bytes=1000, max_request_bytes=1000, wait_seconds=0.05)
+
+    async def run():
+        async with budget.reserve(800):
+            async with budget.reserve(300):
+                pass
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(run())
+    assert error.value.status_code == 503
+    assert budget.reserved == 0
+
+
+def test_queued_request_runs_once_memory_is_released():
+    budget = MemoryBudget(total_bytes=1000, max_request_bytes=1000, wait_seconds=5)
+    order = []
+
+    async def hold(name: str, nbytes: int, seconds: float):
+        async with budget.reserve(nbytes):
+            order.append((name, budget.reserved))
+            await asyncio.sleep(seconds)
+
+    async def run():
+        first = asyncio.create_task(hold("first", 800, 0.05))
+        await asyncio.sleep(0)
+        await hold("second", 300, 0)
+        await first
+
+    asyncio.run(run())
+    assert order == [("first", 800), ("second", 300)]
+    assert budget.reserved == 0
+
+
+def test_rgba_bytes():
+    assert rgba_bytes(100, 50) == 20000
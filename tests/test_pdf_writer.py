@@ -0,0 +1,118 @@
+import re
+import zlib
+from io import BytesIO
+
+from PIL import Image
+
+from paperback_cover.imageedit.format_conversion.pdf_writer import write_image_pdf
+
+
+def _parse(pdf: bytes) -> dict[int, bytes]:
+    """
+    Reads every object through the cross-reference table, checking that each
+    offset points at the start of its object.
+    """
+    assert pdf.startswith(b"%PDF-1.4\n")
+    assert pdf.endswith(b"%%EOF\n")
+    xref = int(re.search(rb"startxref\n(\d+)\n%%EOF\n$", pdf).group(1))
+    assert pdf[xref:].startswith(b"xref\n")
+
+    table, trailer = pdf[xref:].split(b"trailer\n")
+    lines = table.decode().splitlines()
+    first, count = map(int, lines[1].split())
+    assert (first, lines[2]) == (0, "0000000000 65535 f ")
+    assert int(re.search(rb"/Size (\d+)", trailer).group(1)) == count
+
+    objects = {}
+    for number, line in enumerate(lines[3:], start=1):
+        offset, generation, kind = line.split()
+        assert (generation, kind) == ("00000", "n")
+        start = int(offset)
+        header = f"{number} 0 obj\n".encode()
+        assert pdf[start : start + len(header)] == header
+        end = pdf.index(b"\nendobj\n", start)
+        objects[number] = pdf[start + len(header) : end]
+    assert len(objects) == count - 1
+    return objects
+
+
+def _stream(objects: dict[int, bytes], number: int) -> bytes:
+    body = objects[number]
+    length_number = int(re.search(rb"/Length (\d+) 0 R", body).group(1))
+    length = int(objects[length_number])
+    data = body[body.index(b"stream\n") + len(b"stream\n") :]
+    assert data[length:] == b"\nendstream"
+    return data[:length]
+
+
+def _pages(objects: dict[int, bytes]) -> list[bytes]:
+    return [body for body in objects.values() if b"/Type /Page " in body]
+
+
+def _box(page: bytes, name: str) -> list[float]:
+    values = re.search(rf"/{name} \[([^\]]*)\]".encode(), page).group(1)
+    return [float(value) for value in values.split()]
+
+
+def _write(image: Image.Image, **kwargs) -> bytes:
+    output = BytesIO()
+    write_image_pdf(output, image, **kwargs)
+    return output.getvalue()
+
+
+def test_single_page_pdf_embeds_the_pixels():
+    image = Image.linear_gradient("L").resize((300, 150)).convert("RGB")
+    objects = _parse(_write(image, dpi=300))
+
+    (page,) = _pages(objects)
+    assert _box(page, "MediaBox") == [0, 0, 72, 36]
+    assert _box(page, "TrimBox") == [0, 0, 72, 36]
+
+    image_number = int(re.search(rb"/Im0 (\d+) 0 R", page).group(1))
+    assert b"/Width 300 /Height 150 /ColorSpace /DeviceRGB" in objects[image_number]
+    assert zlib.decompress(_stream(objects, image_number)) == image.tobytes()
+
+
+def test_wrap_pages_get_trim_and_bleed_boxes():
+    image = Image.new("RGB", (700, 300), (10, 20, 30))
+    pages = [(0, 0, 300, 300), (300, 0, 100, 300), (400, 0, 300, 300)]
+    objects = _parse(_write(image, dpi=100, pages=pages, bleed=10))
+
+    back, spine, front = _pages(objects)
+    assert _box(back, "MediaBox") == [0, 0, 216, 216]
+    assert _box(back, "BleedBox") == [0, 0, 216, 216]
+    assert _box(back, "TrimBox") == [7.2, 7.2, 216, 208.8]
+    assert _box(spine, "MediaBox") == [0, 0, 72, 216]
+    assert _box(spine, "TrimBox") == [0, 7.2, 72, 208.8]
+    assert _box(front, "TrimBox") == [0, 7.2, 208.8, 208.8]
+    # Every page shows the one image, shifted to its own region.
+    images = {re.search(rb"/Im0 (\d+) 0 R", page).group(1) for page in _pages(objects)}
+    assert len(images) == 1
+
+
+def test_print_export_carries_the_output_intent():
+    image = Image.new("CMYK", (100, 100), (0, 50, 100, 0))
+    profile = b"icc profile bytes"
+    objects = _parse(_write(image, dpi=100, output_profile=profile, title="Cover"))
+
+    catalog = next(body for body in objects.values() if b"/Type /Catalog" in body)
+    intent_number = int(re.search(rb"/OutputIntents \[(\d+) 0 R\]", catalog).group(1))
+    profile_number = int(
+        re.search(rb"/DestOutputProfile (\d+) 0 R", objects[intent_number]).group(1)
+    )
+    assert zlib.decompress(_stream(objects, profile_number)) == profile
+    info = next(body for body in objects.values() if b"/GTS_PDFXVersion" in body)
+    assert b"/Title (Cover)" in info
+
+
+def test_jpeg_is_embedded_as_it_is():
+    image = Image.new("RGB", (64, 32), (200, 100, 50))
+    encoded = BytesIO()
+    image.save(encoded, format="JPEG")
+    jpeg = encoded.getvalue()
+    objects = _parse(_write(Image.open(BytesIO(jpeg)), dpi=72, jpeg=jpeg))
+
+    (page,) = _pages(objects)
+    image_number = int(re.search(rb"/Im0 (\d+) 0 R", page).group(1))
+    assert b"/Filter /DCTDecode" in objects[image_number]
+    assert _stream(objects, image_number) == jpeg
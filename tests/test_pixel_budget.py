@@ -0,0 +1,21 @@
+from io import BytesIO
+
+import pytest
+from PIL import Image
+
+from paperback_cover.commons.pixel_budget import decode_image
+
+
+@pytest.mark.parametrize("mode", ["P", "1"])
+def test_palette_and_bilevel_images_are_downsampled_smoothly(mode):
+    # Alternating black and white columns average to grey when resampled, but
+    # stay black and white when Pillow falls back to NEAREST.
+    stripes = Image.new("L", (400, 400))
+    stripes.putdata([255 * (x % 2) for _ in range(400) for x in range(400)])
+    buffer = BytesIO()
+    stripes.convert(mode).save(buffer, "PNG")
+
+    image = decode_image(BytesIO(buffer.getvalue()), (100, 100))
+    assert image.size == (100, 100)
+    assert image.mode == "RGB"
+    assert image.convert("L").getextrema()[1] < 200
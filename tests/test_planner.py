@@ -0,0 +1,74 @@
+from paperback_cover.book_cover.schema import BoundingBoxSchema
+from paperback_cover.imageedit.extend_image.planner import (
+    MAX_ITERATIONS,
+    _plan_boxes,
+    build_extension_plan,
+    get_filled_box,
+    get_initial_box,
+    get_max_extension_area,
+    plan_sequential_extension,
+)
+from paperback_cover.imageedit.extend_image.schema import (
+    ExtendImageRequest,
+    ExtensionMode,
+)
+
+
+def _request(target, box, mode=ExtensionMode.SEQUENTIAL) -> ExtendImageRequest:
+    x, y, width, height = box
+    return ExtendImageRequest(
+        target_width=target[0],
+        target_height=target[1],
+        original_box=BoundingBoxSchema(x=x, y=y, width=width, height=height),
+        mode=mode,
+    )
+
+
+def test_parallel_plan_is_capped_by_inpaint_calls():
+    plan = build_extension_plan(
+        _request((5000, 1000), (2250, 250, 500, 500), ExtensionMode.PARALLEL)
+    )
+    assert plan.inpaint_calls <= MAX_ITERATIONS
+    assert len(plan.steps) <= MAX_ITERATIONS
+    assert not plan.reaches_target
+
+
+def test_parallel_plan_runs_side_and_corner_phases():
+    plan = build_extension_plan(
+        _request((3000, 3000), (1000, 1000, 1000, 1000), ExtensionMode.PARALLEL)
+    )
+    assert [len(step.boxes) for step in plan.steps[:2]] == [4, 4]
+
+
+def test_kdp_wrap_takes_two_sequential_calls():
+    # Front cover on the right of a 6x9" wrap, the back cover and spine missing.
+    plan = build_extension_plan(_request((3800, 2700), (2000, 0, 1800, 2700)))
+    assert plan.inpaint_calls == 2
+    assert plan.reaches_target
+
+
+def test_alignment_never_adds_sequential_calls():
+    for target, box in [
+        ((3800, 2700), (2000, 0, 1800, 2700)),
+        ((3000, 3000), (1000, 1000, 1000, 1000)),
+        ((2550, 3300), (600, 900, 1350, 1500)),
+        ((5000, 1000), (2250, 250, 500, 500)),
+    ]:
+        request = _request(target, box)
+        initial_box = get_initial_box(request)
+        max_area = get_max_extension_area(request)
+        unaligned = _plan_boxes(initial_box, *target, max_area, MAX_ITERATIONS, False)
+        planned = plan_sequential_extension(initial_box, *target, max_area)
+        assert len(planned) <= len(unaligned)
+
+
+def test_filled_box_waits_for_the_corners():
+    box = [100, 100, 500, 500]
+    sides = [[0, 100, 100, 500], [500, 100, 600, 500]]
+    sides += [[100, 0, 500, 100], [100, 500, 500, 600]]
+    corners = [[0, 0, 100, 100], [0, 500, 100, 600]]
+    corners += [[500, 0, 600, 100], [500, 500, 600, 600]]
+    assert get_filled_box(box, sides) == box
+    assert get_filled_box(box, sides + corners[:3]) == box
+    assert get_filled_box(box, sides + corners) == [0, 0, 600, 600]
+    assert get_filled_box(box, sides[:2]) == [0, 100, 600, 500]
@@ -0,0 +1,29 @@
+import pytest
+from fastapi import HTTPException
+from PIL import Image
+
+from paperback_cover.imageedit.format_conversion import print_export
+from paperback_cover.imageedit.format_conversion.schema import PrintExport
+
+
+@pytest.fixture
+def no_profiles(monkeypatch):
+    monkeypatch.setattr(print_export.os.path, "isfile", lambda path: False)
+    print_export._load_output_profile.cache_clear()
+    yield
+    print_export._load_output_profile.cache_clear()
+
+
+def test_missing_profile_is_not_configured(no_profiles):
+    assert "us_web_coated_swop" in print_export.get_missing_profiles()
+    with pytest.raises(HTTPException) as error:
+        print_export.prepare_for_print(Image.new("RGB", (8, 8)), PrintExport())
+    assert error.value.status_code == 501
+
+
+def test_unknown_profile_is_rejected():
+    with pytest.raises(HTTPException) as error:
+        print_export.prepare_for_print(
+            Image.new("RGB", (8, 8)), PrintExport(profile="unknown")
+        )
+    assert error.value.status_code == 400
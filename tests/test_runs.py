@@ -0,0 +1,61 @@
+import asyncio
+import hashlib
+import uuid
+
+import pytest
+from fastapi import HTTPException
+
+from paperback_cover.imageedit.extend_image import runs
+
+# Models refer to each other by name, so all of them are loaded before any is built.
+from paperback_cover.models import (  # noqa: F401
+    asset,
+    auth,
+    credit,
+    dodopayments,
+    extend_image_job,
+    extend_image_run,
+    feedback,
+    inpaint_cache,
+    user,
+)
+from paperback_cover.models.extend_image_run import ExtendImageRun
+from paperback_cover.models.user import User
+from tests.test_planner import _request
+
+REQUEST = _request((600, 600), (100, 100, 400, 400))
+
+
+@pytest.fixture
+def owner(monkeypatch) -> User:
+    owner = User(id=uuid.uuid4())
+    run = ExtendImageRun(
+        owner=owner.id,
+        idempotency_key="key",
+        request=REQUEST.model_dump(mode="json"),
+        source_sha256=hashlib.sha256(b"first image").hexdigest(),
+    )
+
+    async def get_run(owner, idempotency_key):
+        return run
+
+    monkeypatch.setattr(runs, "get_run", get_run)
+    return owner
+
+
+def test_run_is_reused_for_the_same_upload(owner):
+    run = asyncio.run(runs.get_or_create_run(owner, "key", REQUEST, b"first image"))
+    assert run.idempotency_key == "key"
+
+
+def test_run_key_is_rejected_for_another_upload(owner):
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(runs.get_or_create_run(owner, "key", REQUEST, b"second image"))
+    assert error.value.status_code == 409
+
+
+def test_run_key_is_rejected_for_other_parameters(owner):
+    request = _request((800, 600), (100, 100, 400, 400))
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(runs.get_or_create_run(owner, "key", request, b"first image"))
+    assert error.value.status_code == 409
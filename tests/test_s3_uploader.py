@@ -0,0 +1,76 @@
+import asyncio
+import os
+
+import boto3
+import pytest
+from botocore.exceptions import ClientError
+from moto import mock_aws
+
+from paperback_cover.storage_service.service import MIN_PART_SIZE, S3Uploader
+
+BUCKET = "paperback-cover-test"
+REGION = "us-east-1"
+# Three parts: two of the minimum part size and a shorter last one.
+DATA = os.urandom(2 * MIN_PART_SIZE + 1024)
+
+
+@pytest.fixture
+def s3():
+    with mock_aws():
+        client = boto3.client("s3", region_name=REGION)
+        client.create_bucket(Bucket=BUCKET)
+        yield client
+
+
+@pytest.fixture
+def uploader(s3):
+    uploader = S3Uploader(
+        bucket_name=BUCKET,
+        access_key="testing",
+        secret_key="testing",
+        region_name=REGION,
+        endpoint=None,
+        workers=4,
+        multipart_threshold=MIN_PART_SIZE,
+        max_part_size=MIN_PART_SIZE,
+        part_concurrency=4,
+        part_retries=1,
+        backoff_seconds=0,
+    )
+    yield uploader
+    uploader.shutdown()
+
+
+def _fail_part(monkeypatch, uploader: S3Uploader, part_number: int, times: int):
+    """Makes the upload of `part_number` fail `times` times, recording every call."""
+    calls = []
+    upload_part = uploader.s3_client.upload_part
+
+    def flaky_upload_part(**kwargs):
+        calls.append(kwargs["PartNumber"])
+        if kwargs["PartNumber"] == part_number and calls.count(part_number) <= times:
+            raise ClientError(
+                {"Error": {"Code": "SlowDown", "Message": "Slow down"}}, "UploadPart"
+            )
+        return upload_part(**kwargs)
+
+    monkeypatch.setattr(uploader.s3_client, "upload_part", flaky_upload_part)
+    return calls
+
+
+def test_failed_part_is_retried(s3, uploader, monkeypatch):
+    calls = _fail_part(monkeypatch, uploader, part_number=2, times=1)
+
+    assert asyncio.run(uploader.upload_object(DATA, "covers/a", {})) == "covers/a"
+    assert sorted(calls) == [1, 2, 2, 3]
+    body = s3.get_object(Bucket=BUCKET, Key="covers/a")["Body"].read()
+    assert body == DATA
+
+
+def test_persistent_failure_aborts_the_upload(s3, uploader, monkeypatch):
+    calls = _fail_part(monkeypatch, uploader, part_number=2, times=2)
+
+    assert asyncio.run(uploader.upload_object(DATA, "covers/a", {})) is None
+    assert calls.count(2) == 2
+    assert s3.list_multipart_uploads(Bucket=BUCKET).get("Uploads", []) == []
+    assert s3.list_objects_v2(Bucket=BUCKET).get("Contents", []) == []
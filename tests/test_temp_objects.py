@@ -0,0 +1,129 @@
+import asyncio
+import datetime
+
+import boto3
+import pytest
+from moto import mock_aws
+from moto.core import DEFAULT_ACCOUNT_ID
+from moto.s3.models import s3_backends
+from PIL import Image
+
+from paperback_cover.commons.executor import ImageProcessingExecutor
+from paperback_cover.storage_service import service, temp_objects
+from paperback_cover.storage_service.intermediate import IntermediateImageTransport
+from paperback_cover.storage_service.service import S3Uploader
+from paperback_cover.storage_service.temp_objects import (
+    TempObjectRegistry,
+    TempObjectSweeper,
+)
+
+BUCKET = "paperback-cover-test"
+REGION = "us-east-1"
+
+
+@pytest.fixture
+def s3():
+    with mock_aws():
+        client = boto3.client("s3", region_name=REGION)
+        client.create_bucket(Bucket=BUCKET)
+        yield client
+
+
+@pytest.fixture
+def uploader(s3, monkeypatch):
+    uploader = S3Uploader(
+        bucket_name=BUCKET,
+        access_key="testing",
+        secret_key="testing",
+        region_name=REGION,
+        endpoint=None,
+        workers=4,
+        multipart_threshold=8 * 1024 * 1024,
+        max_part_size=16 * 1024 * 1024,
+        part_concurrency=4,
+        part_retries=0,
+        backoff_seconds=0,
+    )
+    monkeypatch.setattr(service, "uploader", uploader)
+    monkeypatch.setattr(temp_objects, "uploader", uploader)
+    yield uploader
+    uploader.shutdown()
+
+
+def _keys(s3, prefix: str = "") -> list[str]:
+    paginator = s3.get_paginator("list_objects_v2")
+    return [
+        item["Key"]
+        for page in paginator.paginate(Bucket=BUCKET, Prefix=prefix)
+        for item in page.get("Contents", [])
+    ]
+
+
+def _put(s3, *keys: str):
+    for key in keys:
+        s3.put_object(Bucket=BUCKET, Key=key, Body=b"x")
+
+
+def _backdate(key: str, age: datetime.timedelta):
+    stored = s3_backends[DEFAULT_ACCOUNT_ID]["aws"].buckets[BUCKET].keys[key]
+    stored.last_modified -= age
+
+
+def test_delete_objects_batches_by_1000(s3, uploader, monkeypatch):
+    keys = [f"temp/{index}" for index in range(2500)]
+    _put(s3, *keys)
+    batches = []
+    delete_objects = uploader.s3_client.delete_objects
+
+    def record_batch(**kwargs):
+        batches.append(len(kwargs["Delete"]["Objects"]))
+        return delete_objects(**kwargs)
+
+    monkeypatch.setattr(uploader.s3_client, "delete_objects", record_batch)
+
+    assert asyncio.run(uploader.delete_objects(keys)) == 2500
+    assert batches == [1000, 1000, 500]
+    assert _keys(s3) == []
+
+
+def test_registry_deletes_its_objects_on_exit(s3, uploader):
+    _put(s3, "temp/a", "temp/b", "temp/other")
+
+    async def run():
+        async with TempObjectRegistry() as registry:
+            registry.add("temp/a")
+            registry.add("temp/b")
+
+    asyncio.run(run())
+    assert _keys(s3) == ["temp/other"]
+
+
+def test_transport_deletes_temp_objects_when_the_request_fails(s3, uploader):
+    executor = ImageProcessingExecutor(thread_workers=1, process_workers=0)
+    published = []
+
+    async def run():
+        async with IntermediateImageTransport(
+            executor, data_uri_max_bytes=0
+        ) as transport:
+            published.append(await transport.publish(Image.new("RGB", (64, 64))))
+            assert len(_keys(s3, "temp/")) == 1
+            raise RuntimeError("inpainting failed")
+
+    try:
+        with pytest.raises(RuntimeError):
+            asyncio.run(run())
+    finally:
+        executor.shutdown()
+    assert published[0].startswith(service.get_user_generated_url_for_object("temp/"))
+    assert _keys(s3, "temp/") == []
+
+
+def test_sweeper_deletes_only_expired_temp_objects(s3, uploader):
+    _put(s3, "temp/expired", "temp/fresh", "users/u/expired")
+    _backdate("temp/expired", datetime.timedelta(hours=2))
+    _backdate("users/u/expired", datetime.timedelta(hours=2))
+
+    sweeper = TempObjectSweeper(ttl_seconds=3600, interval_seconds=3600)
+    assert asyncio.run(sweeper.sweep()) == 1
+    assert sorted(_keys(s3)) == ["temp/fresh", "users/u/expired"]